@@ -1,2 +1,13 @@
 from .autodiff import *
-from .functions import *
\ No newline at end of file
+from .primitives import *
+from .functions import *
+from .tensor import *
+from .tape import *
+from .compiled import *
+from .codegen import *
+from .dual import *
+from .checkpoint import *
+from .parallel import *
+from .aio import *
+from .optimize import *
+from .profiling import *
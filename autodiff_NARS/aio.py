@@ -0,0 +1,162 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+# batchers of each AutoDiff instance, keyed by method, latency window and batch size
+_batchers = weakref.WeakKeyDictionary()
+
+# worker thread of each AutoDiff instance, shared by its batchers so batches never run concurrently
+_executors = weakref.WeakKeyDictionary()
+
+
+class GradientBatcher:
+    """
+    Coalesces concurrent asynchronous derivative requests into batches
+
+    ...
+
+    Requests arriving within max_delay seconds of the first request of a batch, or
+    until max_batch requests are queued, are evaluated together by a single call of
+    df_batch. Batches run one at a time on a worker thread, so the event loop keeps
+    queueing the next batch while the previous one is evaluated, and no request waits
+    more than max_delay before its batch is submitted. Batchers given the same executor
+    share its worker thread, so their batches do not run concurrently either.
+
+    Attributes
+    ----------
+    ad: AutoDiff
+    method: str
+        'forward', 'backward' or 'auto'
+    max_delay: float
+        latency window in seconds
+    max_batch: int
+        maximal number of requests per batch
+    stats: dict
+        number of requests and of batches evaluated
+
+    Methods
+    -------
+    df
+        returns the derivative at x once its batch is evaluated
+    """
+
+    def __init__(self, ad, method="forward", max_delay=0.001, max_batch=256, executor=None):
+        """
+        Create a batcher of the derivative requests of ad, evaluating its batches on
+        executor, or on a worker thread of its own if executor is None
+        """
+        assert max_delay >= 0, "The latency window must be non-negative"
+        assert isinstance(max_batch, int) and max_batch > 0, "The batch size must be a positive integer"
+        self.ad = ad
+        self.method = method
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.stats = {"requests": 0, "batches": 0}
+        self._pending = {}
+        self._tasks = set()
+        self._owns_executor = executor is None
+        self._executor = ThreadPoolExecutor(max_workers=1) if executor is None else executor
+
+    async def df(self, x):
+        """
+        Queues a derivative request at x and waits for its batch to be evaluated
+
+        :return: derivative value, as returned by AutoDiff.df
+        """
+        assert isinstance(x, (float, int, list, np.ndarray))
+        x = np.asarray([x] if isinstance(x, (float, int)) else x, dtype=float)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.stats["requests"] += 1
+
+        # requests are batched with requests of the same input dimension
+        pending = self._pending.setdefault(len(x), [])
+        pending.append((x, future))
+        if len(pending) >= self.max_batch:
+            self._flush(len(x), pending)
+        elif len(pending) == 1:
+            loop.call_later(self.max_delay, self._flush, len(x), pending)
+        return await future
+
+    def _flush(self, x_dim, pending):
+        """
+        Starts the evaluation of a batch, unless it was already started when it became full
+        """
+        if self._pending.get(x_dim) is not pending:
+            return
+        del self._pending[x_dim]
+        task = asyncio.get_running_loop().create_task(self._evaluate(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _evaluate(self, pending):
+        """
+        Evaluates a batch on the worker thread and resolves the future of each request
+        """
+        X = np.stack([x for x, _ in pending])
+        self.stats["batches"] += 1
+        try:
+            output = await asyncio.get_running_loop().run_in_executor(self._executor, self._jacobians, X)
+        except Exception as error:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), output_i in zip(pending, output):
+            if not future.done():  # request was cancelled
+                future.set_result(output_i)
+
+    def _jacobians(self, X):
+        """
+        Computes the derivatives at the rows of X, shaped as AutoDiff.df does
+
+        :return: derivative value of each row
+        """
+        output = self.ad.df_batch(X, method=self.method)
+        if X.shape[1] == 1 and self.ad.f_dim == 1:
+            return output[:, 0, 0]  # flatten output
+        return output
+
+    def close(self):
+        """
+        Shuts down the worker thread of this batcher, unless it is shared, once the
+        running batch is evaluated
+
+        :return: None
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+
+
+def batcher(ad, method="forward", max_delay=0.001, max_batch=256):
+    """
+    Batcher of ad with the given method, latency window and batch size, created on first use.
+    All batchers of ad evaluate their batches on the same worker thread, since concurrent
+    evaluations on the same AutoDiff instance are not thread safe.
+
+    :return: GradientBatcher
+    """
+    batchers = _batchers.setdefault(ad, {})
+    key = (method, max_delay, max_batch)
+    if key not in batchers:
+        # the batcher refers to ad weakly, so ad and its batchers are freed together
+        if ad not in _executors:
+            _executors[ad] = ThreadPoolExecutor(max_workers=1)
+        batchers[key] = GradientBatcher(weakref.proxy(ad), method=method, max_delay=max_delay, max_batch=max_batch,
+                                        executor=_executors[ad])
+    return batchers[key]
+
+
+def release_batchers(ad):
+    """
+    Shuts down and drops the batchers of ad and their worker thread
+
+    :return: None
+    """
+    for gradient_batcher in _batchers.pop(ad, {}).values():
+        gradient_batcher.close()
+    executor = _executors.pop(ad, None)
+    if executor is not None:
+        executor.shutdown(wait=False)
@@ -1,7 +1,111 @@
-import copy
-import random
+import contextlib
+import contextvars
+import functools
+import inspect
+import itertools
+import os
+from collections import OrderedDict
 from typing import Union, Callable
 import numpy as np
+from .tape import record_tape
+from .compiled import CompiledGraph, graph_key
+from .dual import Dual
+from .tensor import TensorNode
+from .parallel import parallel_df
+from .aio import batcher, release_batchers
+
+
+# cost of the work done per operation, relative to evaluating the operation, used by method="auto"
+TANGENT_COST = 0.0025  # propagating one forward mode tangent
+NODE_COST = 0.25  # visiting a node in the topological sort of the reverse sweep
+EDGE_COST = 0.1  # accumulating one adjoint along an edge
+TAPE_SWEEP_COST = 0.1  # visiting a tape entry in the reverse sweep of one output
+
+# nodes built while hash consing is enabled, keyed by operation and operands, None when disabled
+_cons_table = contextvars.ContextVar('cons_table', default=None)
+
+
+@contextlib.contextmanager
+def hash_consing():
+    """
+    Enables hash consing of nodes: within the context, an operation applied to the same
+    operands (the same Node objects) and constants as before returns the node built the
+    first time, so repeated subexpressions share a single node
+
+    :return: None
+    """
+    token = _cons_table.set({})
+    try:
+        yield
+    finally:
+        _cons_table.reset(token)
+
+
+def hash_consed(op, commutative=False):
+    """
+    Decorator of the Node operations and elementary functions, looking up op applied to
+    the same operands and constants while hash consing is enabled. Decorated functions
+    take one operand, two operands, or an operand and a constant with a default value
+    (the base of exp and log).
+
+    :return: decorator
+    """
+    def key(var, other):
+        if isinstance(other, Node):
+            if commutative:
+                return op, min(id(var), id(other)), max(id(var), id(other))
+            return op, id(var), id(other)
+        if isinstance(other, np.ndarray):
+            # arrays are not hashable, they are keyed on their contents
+            return op, id(var), other.dtype.str, other.shape, other.tobytes()
+        return op, id(var), other
+
+    def lookup(table, key, function, *args):
+        node = table.get(key)
+        if node is None:
+            # the table keeps the node, hence its operands, alive so their ids stay unique
+            node = table[key] = function(*args)
+        return node
+
+    def decorator(function):
+        # one wrapper per signature, since packing *args costs more than the lookup
+        if function.__code__.co_argcount == 1:
+            def wrapper(var):
+                table = _cons_table.get()
+                if table is None or not isinstance(var, Node):
+                    return function(var)
+                return lookup(table, (op, id(var)), function, var)
+        elif not function.__defaults__:
+            def wrapper(var, other):
+                table = _cons_table.get()
+                if table is None or not isinstance(var, Node):
+                    return function(var, other)
+                return lookup(table, key(var, other), function, var, other)
+        else:
+            wrapper = _constant_wrapper(function, lookup, key)
+        return functools.wraps(function)(wrapper)
+    return decorator
+
+
+def _constant_wrapper(function, lookup, key):
+    """
+    Hash consing wrapper of a function of an operand and a constant, generated so the
+    constant keeps the name of its parameter (e.g. base, or the parameter of the rule of
+    a primitive) and can be passed by keyword
+
+    :return: wrapper
+    """
+    parameter = list(inspect.signature(function).parameters)[1]
+    source = (f"def make(function, lookup, key, default):\n"
+              f"    def wrapper(var, {parameter}=default):\n"
+              f"        table = _cons_table.get()\n"
+              f"        if table is None or not isinstance(var, Node):\n"
+              f"            return function(var, {parameter})\n"
+              f"        return lookup(table, key(var, {parameter}), function, var, {parameter})\n"
+              f"    return wrapper\n")
+    namespace = {}
+    exec(compile(source, f'<autodiff_NARS.autodiff {function.__name__}>', 'exec'), globals(), namespace)
+    return namespace['make'](function, lookup, key, function.__defaults__[0])
 
 
 class AutoDiff:
@@ -18,6 +122,10 @@ class AutoDiff:
         x - list of the values of the independent variable x
     seed: list
         seed vector
+    diagnostics: dict
+        graph size, estimated costs and method chosen by the last method="auto" call
+    stats: Profile, None
+        counters of the last profile context of this instance
 
     Methods
     -------
@@ -27,10 +135,32 @@ class AutoDiff:
         returns the function value of f(x) evaluated at the input parameters(x)
     """
 
-    def __init__(self, functions: list):
+    def __init__(self, functions: list, tape=False, cache_size=0, hash_consing=False, tensor=False):
         """
         Instantiate autodiff class with function and its dimension
+
+        If tape is True, backward mode records the functions on a flat tape
+        instead of building a graph of Node objects. If cache_size is positive,
+        the results of f, df and value_and_jacobian are memoized for the
+        cache_size most recently used inputs. If hash_consing is True, the
+        functions share their input nodes and repeated subexpressions, within
+        and across functions, are built as a single node. If tensor is True, each
+        function is called on the whole input as a single TensorNode, so that vector
+        operations (@, dot, sum, indexing) build one node per array operation instead
+        of one node per coordinate; functions must then return scalars.
         """
+        assert isinstance(cache_size, int) and cache_size >= 0, "The cache size must be a non-negative integer"
+        self.tape = tape
+        self.tensor = tensor
+        self.hash_consing = hash_consing
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self.diagnostics = {}
+        self.stats = None
+        self._graph_sizes = {}
+        self._methods = {}
         if isinstance(functions, Callable):
             self.f_dim = 1
             self.function = [functions]
@@ -53,109 +183,485 @@ class AutoDiff:
         if isinstance(x, (list, np.ndarray)):
             assert len(x) != 1, "Scalar input x must not be an array or list."
 
+        if self.cache_size:
+            key = self._cache_key('f', x)
+            if self._cache_lookup(key):
+                return _copy(self._cache[key])
+
+        if self.tensor:
+            x = np.asarray([x] if isinstance(x, (float, int)) else x, dtype=float)
         f = np.array([f_i(x) for f_i in self.function])
 
         if self.f_dim == 1:
-            return f[0]  # flatten output
+            f = f[0]  # flatten output
+        if self.cache_size:
+            self._cache_store(key, _copy(f))
         return f
 
-    def df(self, x, method="forward", seed=None):
+    def f_batch(self, X):
+        """
+        Evaluates function at every row of X, each function being called once on arrays
+        holding one coordinate of all points
+
+        :return: function values of shape (N, f_dim), or (N,) for a single function
+        """
+        X = self._batch_input(X)
+        if self.tensor:
+            # tensor functions act on a whole input vector, so they are called once per point
+            f = np.array([[f_i(x) for f_i in self.function] for x in X], dtype=float)
+            return f[:, 0] if self.f_dim == 1 else f
+        n_points, x_dim = X.shape
+        x = X[:, 0] if x_dim == 1 else X.T
+
+        f = np.stack([np.broadcast_to(f_i(x), (n_points,)) for f_i in self.function], axis=1)
+
+        if self.f_dim == 1:
+            return f[:, 0]  # flatten output
+        return f
+
+    def df(self, x, method="forward", seed=None, chunk_size=None):
         """
         Computes derivative using either forward or backward mode AD
 
+        In forward mode every input is a dual number carrying a vector of tangents, so a
+        single evaluation of the functions, recording no graph, yields all columns of the
+        Jacobian. chunk_size
+        limits the number of tangents (columns) propagated per evaluation. With
+        method="auto" the cheaper mode is chosen by a cost model, see select_method.
+
         :return: derivative value
         """
+        return self.value_and_jacobian(x, method=method, seed=seed, chunk_size=chunk_size)[1]
+
+    def value_and_jacobian(self, x, method="forward", seed=None, chunk_size=None):
+        """
+        Computes the function value and its derivative at x, the value being read from the
+        same evaluation of the functions that produces the derivative
+
+        :return:
+        f:
+            Function value at x
+        df:
+            Derivative value at x
+        """
         assert isinstance(x, (float, int, list, np.ndarray))
         if isinstance(x, (float, int)):
             input_vector = [x]
         else:
             input_vector = x
 
-        self.x_dim = len(input_vector)
-        self.output_nodes = []
+        if self.cache_size:
+            key = self._cache_key('jacobian', x, method, seed)
+            if self._cache_lookup(key):
+                f, output = self._cache[key]
+                return _copy(f), _copy(output)
+
+        x_dim = len(input_vector)
+
+        if seed is not None:
+            assert len(seed) == x_dim, "The seed vector must be the same shape as the input x"
+            tangents = np.asarray(seed, dtype=float).reshape(x_dim, 1)
+        else:
+            tangents = None
+
+        if method == "auto":
+            method = self.select_method(input_vector, x_dim if seed is None else 1, chunk_size)
+        if tangents is None and method == "forward":
+            # the identity is only needed by forward mode, it dominates the memory of large inputs
+            tangents = np.identity(x_dim)
+        f, output = self._jacobian(input_vector, method, tangents, chunk_size)
+
+        # if seed given, calculate directional derivative
+        if seed is not None:
+            output = output[:, 0] if method == "forward" else output @ np.asarray(seed)
+
+        if self.f_dim == 1:
+            f = f[0]  # flatten output
+        if x_dim == 1 and self.f_dim == 1:
+            output = output.flatten()[0]  # flatten output
+
+        if self.cache_size:
+            # the Jacobian is stored last, so it is the most recently used entry
+            self._cache_store(self._cache_key('f', x), _copy(f))
+            self._cache_store(key, (_copy(f), _copy(output)))
+        return f, output
+
+    @staticmethod
+    def _cache_key(kind, x, method=None, seed=None):
+        """
+        Key of a cached result, holding the bytes of the input and seed as float arrays
+
+        :return: hashable key
+        """
+        x = np.asarray(x, dtype=float)
+        seed = None if seed is None else np.asarray(seed, dtype=float).tobytes()
+        return kind, x.shape, x.tobytes(), method, seed
+
+    def _cache_lookup(self, key):
+        """
+        Looks up a key in the cache, marking it as most recently used and counting hits and misses
+
+        :return: True if the key is cached
+        """
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._cache_hits += 1
+            return True
+        self._cache_misses += 1
+        return False
+
+    def _cache_store(self, key, value):
+        """
+        Stores a result in the cache, evicting the least recently used results beyond cache_size
+
+        :return: None
+        """
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def cache_info(self):
+        """
+        Statistics of the result cache
+
+        :return: dict of hits, misses, current size and maximal size
+        """
+        return {"hits": self._cache_hits, "misses": self._cache_misses, "size": len(self._cache),
+                "maxsize": self.cache_size}
+
+    def cache_clear(self):
+        """
+        Empties the result cache and resets its statistics
+
+        :return: None
+        """
+        self._cache.clear()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def df_batch(self, X, method="forward", chunk_size=None):
+        """
+        Computes the Jacobian at every row of X. Node values and derivatives hold
+        the whole batch, so each operation is a single NumPy call per batch.
+
+        :return: stacked Jacobians of shape (N, f_dim, x_dim)
+        """
+        X = self._batch_input(X)
+        x_dim = X.shape[1]
+        if method == "auto":
+            method = self.select_method(X[0], x_dim, chunk_size)
+        output = self._jacobian(X.T, method, np.identity(x_dim), chunk_size)[1]
+        return np.moveaxis(output, -1, 0)
+
+    def map_df(self, points, workers=None, method="forward", chunk_size=None):
+        """
+        Computes the Jacobian at every row of points on a pool of worker processes, each
+        worker computing df_batch on blocks of points. Falls back to df_batch in this
+        process if the functions cannot be pickled.
+
+        :return: stacked Jacobians of shape (N, f_dim, x_dim)
+        """
+        return parallel_df(self, points, workers=workers, method=method, chunk_size=chunk_size)
+
+    async def adf(self, x, method="forward", max_delay=0.001, max_batch=256):
+        """
+        Computes derivative at x without blocking the event loop. Concurrent requests
+        arriving within max_delay seconds, up to max_batch of them, are evaluated
+        together by df_batch on a worker thread.
+
+        :return: derivative value
+        """
+        return await batcher(self, method=method, max_delay=max_delay, max_batch=max_batch).df(x)
+
+    def _jacobian(self, input_vector, method, tangents, chunk_size=None):
+        """
+        Computes the function value and the Jacobian at input_vector, the Jacobian being
+        multiplied by the tangents in forward mode. If the entries of input_vector are
+        arrays of points, the batch is the last axis.
+
+        :return: function value, derivative value
+        """
+        if self.tensor:
+            return self._tensor_jacobian(input_vector, method, tangents, chunk_size)
+        batch_shape = np.shape(input_vector[0])
 
         # compute Jacobian using forward mode
         if method == "forward":
-            output = np.zeros((self.f_dim, self.x_dim))
-            jac_seed_matrix = np.identity(self.x_dim)
-            for i in range(self.x_dim):
-                jac_seed = jac_seed_matrix[i, :]
-                self.input_nodes = self._create_input_nodes(input_vector, jac_seed)
-                output[:, i] = self._forward()
-                self.output_nodes = []
+            n_tangents = tangents.shape[1]
+            if chunk_size is None:
+                chunk_size = n_tangents
+            assert chunk_size > 0, "The chunk size must be a positive integer"
+
+            output = np.zeros((self.f_dim, n_tangents) + batch_shape)
+            for start in range(0, n_tangents, chunk_size):
+                seed = tangents[:, start:start + chunk_size]
+                if batch_shape:
+                    seed = np.broadcast_to(seed[..., None], seed.shape + batch_shape)
+                f, output[:, start:start + chunk_size] = self._forward(input_vector, seed)
 
         # compute Jacobian using backward mode
+        elif method == "backward" and self.tape and not batch_shape:
+            f, output = self._tape_backward(input_vector)
         elif method == "backward":
-            self.input_nodes = self._create_input_nodes(input_vector)
-            output = self._backward()
+            output_nodes, output = self._backward(self._create_input_nodes(input_vector))
+            f = self._output_values(output_nodes, batch_shape)
         else:
-            raise TypeError("Method supported is either 'forward' or 'backward'")
+            raise TypeError("Method supported is 'forward', 'backward' or 'auto'")
+        return f, output
 
-        # if seed given, calculate directional derivative
-        if seed:
-            assert len(seed) == self.x_dim, "The seed vector must be the same shape as the input x"
-            output = output @ np.asarray(seed)
+    def select_method(self, input_vector, n_tangents, chunk_size=None):
+        """
+        Chooses the cheaper of forward and backward mode for computing n_tangents columns
+        of the Jacobian. The cost of each mode is estimated from the number of operations
+        and edges of the graph, in units of evaluating one operation:
 
-        if self.x_dim == 1 and self.f_dim == 1:
-            return output.flatten()[0]  # flatten output
+        forward: n_chunks * n_ops + TANGENT_COST * n_ops * n_tangents
+        backward: n_ops + NODE_COST * n_ops + EDGE_COST * n_edges
+                  (n_ops + TAPE_SWEEP_COST * f_dim * n_ops if tape is True)
 
-        return output
+        The graph is measured once per input dimension and the decision is cached per
+        number of tangents and chunk size. Both are recorded in diagnostics.
 
-    def _forward(self):
+        :return: 'forward' or 'backward'
+        """
+        key = (len(input_vector), n_tangents, chunk_size)
+        if key not in self._methods:
+            if len(input_vector) not in self._graph_sizes:
+                self._graph_sizes[len(input_vector)] = self._graph_size(input_vector)
+            n_ops, n_edges = self._graph_sizes[len(input_vector)]
+
+            n_chunks = -(-n_tangents // (chunk_size or n_tangents))
+            forward_cost = n_chunks * n_ops + TANGENT_COST * n_ops * n_tangents
+            if self.tape:
+                backward_cost = n_ops + TAPE_SWEEP_COST * self.f_dim * n_ops
+            else:
+                backward_cost = n_ops + NODE_COST * n_ops + EDGE_COST * n_edges
+            method = "forward" if forward_cost <= backward_cost else "backward"
+            self._methods[key] = {"method": method, "n_ops": n_ops, "n_edges": n_edges,
+                                  "n_tangents": n_tangents, "forward_cost": forward_cost,
+                                  "backward_cost": backward_cost}
+        self.diagnostics = self._methods[key]
+        return self.diagnostics["method"]
+
+    def _graph_size(self, input_vector):
         """
-        Computes derivative using forward mode AD
+        Evaluates the functions once to count the operations and edges of their graphs
 
-        :return: derivative value
+        :return: number of operations, number of edges
+        """
+        if self.tensor:
+            input_node = TensorNode(np.asarray(input_vector, dtype=float))
+            output_nodes = [output_node for output_node in (f_i(input_node) for f_i in self.function)
+                            if isinstance(output_node, TensorNode)]
+        else:
+            output_nodes = [output_node for output_node in self._evaluate(self._create_input_nodes(input_vector))
+                            if isinstance(output_node, Node)]
+
+        visited = set()
+        n_ops = n_edges = 0
+        for output_node in output_nodes:
+            for node in self._topological_order(output_node):
+                if id(node) not in visited and node.parents:
+                    n_ops += 1
+                    n_edges += len(node.parents)
+                visited.add(id(node))
+        return n_ops, n_edges
+
+    @staticmethod
+    def _output_values(output_nodes, batch_shape):
+        """
+        Reads the function value from the output nodes
+
+        :return: function value
         """
+        return np.array([np.broadcast_to(output_node.value if isinstance(output_node, Node) else output_node,
+                                         batch_shape) for output_node in output_nodes], dtype=float)
 
-        for function_i, input_node in zip(self.function, self.input_nodes):
+    @staticmethod
+    def _batch_input(X):
+        """
+        Validates a batch of input points, one point per row
+
+        :return: float array of shape (N, x_dim)
+        """
+        assert isinstance(X, (list, np.ndarray))
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[:, None]  # batch of scalar inputs
+        assert X.ndim == 2, "Batch of input points must be of shape (N, x_dim)"
+        return X
+
+    def _evaluate(self, input_nodes):
+        """
+        Evaluates each function on its input nodes, building the computational graph.
+        The graph is only referenced by the returned output nodes, so it is freed as
+        soon as the caller drops them.
 
-            if self.x_dim == 1: # and self.f_dim > 1
-                input_node = input_node[0]
+        :return: output nodes
+        """
+        output_nodes = []
+        with hash_consing() if self.hash_consing else contextlib.nullcontext():
+            for function_i, input_node in zip(self.function, input_nodes):
 
-            output_node = function_i(input_node)
-            self.output_nodes.append(output_node)
+                if len(input_node) == 1: # and self.f_dim > 1
+                    input_node = input_node[0]
 
-        for_deriv = []
+                output_node = function_i(input_node)
+                if isinstance(output_node, Node):  # outputs not depending on the input are constants
+                    output_node.adjoint = 1
+                output_nodes.append(output_node)
+        return output_nodes
 
-        for output_node in self.output_nodes:
-            output_node.adjoint = 1
-            for_deriv.append(output_node.for_deriv)
-        for_deriv = np.array(for_deriv)
-        if self.f_dim == 1:
-            return for_deriv[0]
-        return for_deriv
+    def _forward(self, input_vector, seed):
+        """
+        Computes derivative using forward mode AD. The functions are evaluated on dual
+        numbers, input i carrying row i of seed as its tangents, so no graph is recorded.
 
-    def _backward(self):
+        :return: function value, derivative value
+        """
+        duals = [Dual(x_i, seed[i]) for i, x_i in enumerate(input_vector)]
+        argument = duals[0] if len(duals) == 1 else duals
+        outputs = [function_i(argument) for function_i in self.function]
+
+        # outputs not depending on the input are constants, with zero tangents
+        batch_shape = np.shape(input_vector[0])
+        tangent_shape = np.shape(seed)[1:2] + batch_shape
+        f = np.array([np.broadcast_to(output.value if isinstance(output, Dual) else output, batch_shape)
+                      for output in outputs], dtype=float)
+        derivs = np.array([np.broadcast_to(output.tangent, tangent_shape) if isinstance(output, Dual)
+                           else np.zeros(tangent_shape) for output in outputs])
+        return f, derivs
+
+    def _backward(self, input_nodes):
         """
         Computes derivative using reverse mode AD
 
 
-        :return: derivative value
+        :return: output nodes, derivative value
         """
-        # function to recursively update adjoints
-        def recur_update(node):
-            if node.parents:
-                for parent in node.parents:
-                    parent.adjoint += node.adjoint * node.back_deriv[parent.name]
-                    recur_update(parent)
-
         # forward pass
-        self._forward()
+        output_nodes = self._evaluate(input_nodes)
+
+        # extract adjoints from input nodes, broadcasting adjoints that stayed constant over a batch
+        batch_shape = np.shape(input_nodes[0][0].value)
+        adjoints = np.zeros((self.f_dim, len(input_nodes[0])) + batch_shape)
+        for i, input_adjoints in enumerate(self._propagate_adjoints(input_nodes, output_nodes)):
+            for j, adjoint in enumerate(input_adjoints):
+                adjoints[i, j] = adjoint
+        return output_nodes, adjoints
 
-        # update adjoints
-        for output_node in self.output_nodes:
-            recur_update(output_node)
+    def _propagate_adjoints(self, input_nodes, output_nodes):
+        """
+        Propagates the adjoint of each output node back to the input nodes of its function,
+        visiting each node of its graph exactly once. With hash consing the functions share
+        nodes, so the adjoints are reset before each output is swept.
 
-        # extract adjoints from output nodes
-        adjoints = np.zeros((self.f_dim, self.x_dim))
-        for i, input_node in zip(range(self.f_dim), self.input_nodes):
-            adjoints[i] = np.array([input_parameter_xi.adjoint for input_parameter_xi in input_node])
+        :return: adjoints of the input nodes of each function
+        """
+        adjoints = []
+        for input_node, output_node in zip(input_nodes, output_nodes):
+            if not isinstance(output_node, Node):
+                # constant output, with zero adjoints
+                adjoints.append([0.0] * len(input_node))
+                continue
+            order = self._topological_order(output_node)
+            if self.hash_consing:
+                for node in itertools.chain(input_node, order):
+                    node.adjoint = 0
+                output_node.adjoint = 1
+            for node in reversed(order):
+                for parent, back_deriv in zip(node.parents, node.back_deriv):
+                    parent.adjoint += node.adjoint * back_deriv
+            adjoints.append([input_parameter_xj.adjoint for input_parameter_xj in input_node])
         return adjoints
 
+    def _tensor_jacobian(self, input_vector, method, tangents, chunk_size=None):
+        """
+        Computes the function value and the Jacobian at input_vector, calling each function
+        on a single TensorNode holding the whole input. Forward mode propagates the tangents
+        (columns of tangents) as one array per node; backward mode sweeps the adjoints of
+        each function with the reverse rules of the tensor operations. Batches of points,
+        one per column of input_vector, are evaluated point by point.
+
+        :return: function value, derivative value
+        """
+        x = np.asarray(input_vector, dtype=float)
+        if x.ndim == 2:
+            results = [self._tensor_jacobian(x[:, n], method, tangents, chunk_size) for n in range(x.shape[1])]
+            return np.stack([f for f, _ in results], axis=-1), np.stack([output for _, output in results], axis=-1)
+
+        f = np.zeros(self.f_dim)
+        if method == "forward":
+            n_tangents = tangents.shape[1]
+            if chunk_size is None:
+                chunk_size = n_tangents
+            assert chunk_size > 0, "The chunk size must be a positive integer"
+
+            output = np.zeros((self.f_dim, n_tangents))
+            for start in range(0, n_tangents, chunk_size):
+                # the functions share the input node, forward mode leaving it unchanged
+                input_node = TensorNode(x, tangents[:, start:start + chunk_size].T)
+                for i, function_i in enumerate(self.function):
+                    output_node = function_i(input_node)
+                    f[i] = _scalar(output_node)
+                    if isinstance(output_node, TensorNode) and output_node.tangent is not None:
+                        output[i, start:start + chunk_size] = output_node.tangent.reshape(-1)
+        elif method == "backward":
+            output = np.zeros((self.f_dim, len(x)))
+            for i, function_i in enumerate(self.function):
+                input_node = TensorNode(x)
+                output_node = function_i(input_node)
+                f[i] = _scalar(output_node)
+                if not isinstance(output_node, TensorNode):
+                    continue
+                output_node.adjoint = np.ones(output_node.shape)
+                for node in reversed(self._topological_order(output_node)):
+                    for parent, vjp in zip(node.parents, node.vjps):
+                        parent.adjoint = parent.adjoint + vjp(node.adjoint)
+                output[i] = input_node.adjoint
+        else:
+            raise TypeError("Method supported is 'forward', 'backward' or 'auto'")
+        return f, output
+
+    def _tape_backward(self, input_vector):
+        """
+        Computes derivative using reverse mode AD on a flat tape
+
+        :return: function value, derivative value
+        """
+        tape, _, outputs = record_tape(self.function, input_vector)
+        x_dim = len(input_vector)
+        adjoints = np.zeros((self.f_dim, x_dim))
+        for i, output in enumerate(outputs):
+            adjoints[i] = tape.gradient(output.index)[:x_dim]
+        return np.array([output.value for output in outputs]), adjoints
+
+    @staticmethod
+    def _topological_order(output_node):
+        """
+        Orders the graph ending in output_node so that every node comes after all of its parents
+
+        :return: list of nodes in topological order
+        """
+        order = []
+        visited = {id(output_node)}
+        stack = [(output_node, iter(output_node.parents))]
+        while stack:
+            node, parents = stack[-1]
+            for parent in parents:
+                if id(parent) not in visited:
+                    visited.add(id(parent))
+                    stack.append((parent, iter(parent.parents)))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+        return order
+
     def __call__(self, x, method='forward', seed=None):
         """
-        Computes the function value and its derivative at x
+        Computes the function value and its derivative at x, evaluating the functions only once
 
         :return:
         f:
@@ -163,29 +669,186 @@ class AutoDiff:
         df:
             Derivative value at x
         """
-        if method == 'forward' or method == 'backward':
-            df = self.df(x, method=method, seed=seed)
+        if method in ('forward', 'backward', 'auto'):
+            return self.value_and_jacobian(x, method=method, seed=seed)
         else:
-            raise TypeError("Method supported is either 'forward' or 'backward'")
-        return self.f(x), df
+            raise TypeError("Method supported is 'forward', 'backward' or 'auto'")
+
+    def hvp(self, x, v):
+        """
+        Computes the product of the Hessian of each function at x with the vector v, using
+        forward mode over reverse mode: node values are dual numbers carrying the direction
+        v, so one reverse sweep yields the gradient and its derivative in the direction v.
+
+        :return: Hessian-vector product
+        """
+        input_vector = [x] if isinstance(x, (float, int)) else x
+        x_dim = len(input_vector)
+        v = [v] if isinstance(v, (float, int)) else v
+        assert len(v) == x_dim, "The vector v must be the same shape as the input x"
+
+        output = self._second_order(input_vector, np.asarray(v, dtype=float).reshape(x_dim, 1))[..., 0]
+
+        if x_dim == 1 and self.f_dim == 1:
+            return output.flatten()[0]  # flatten output
+        if self.f_dim == 1:
+            return output[0]  # flatten output
+        return output
+
+    def hessian(self, x, chunk_size=None):
+        """
+        Computes the Hessian of each function at x, using forward mode over reverse mode
+        with chunk_size directions (Hessian columns) per sweep. The Hessian is symmetric,
+        so the result is averaged with its transpose, which removes the rounding
+        differences between mixed partial derivatives.
+
+        :return: Hessian of shape (x_dim, x_dim), or (f_dim, x_dim, x_dim)
+        """
+        assert isinstance(x, (float, int, list, np.ndarray))
+        input_vector = [x] if isinstance(x, (float, int)) else x
+        x_dim = len(input_vector)
+        if chunk_size is None:
+            chunk_size = x_dim
+        assert chunk_size > 0, "The chunk size must be a positive integer"
+
+        tangents = np.identity(x_dim)
+        output = np.zeros((self.f_dim, x_dim, x_dim))
+        for start in range(0, x_dim, chunk_size):
+            output[:, :, start:start + chunk_size] = self._second_order(input_vector,
+                                                                        tangents[:, start:start + chunk_size])
+        output = (output + np.swapaxes(output, 1, 2)) / 2
+
+        if x_dim == 1 and self.f_dim == 1:
+            return output.flatten()[0]  # flatten output
+        if self.f_dim == 1:
+            return output[0]  # flatten output
+        return output
+
+    def _second_order(self, input_vector, tangents):
+        """
+        Evaluates the graph on dual numbers, input i carrying row i of tangents, and
+        propagates the adjoints back to the inputs
+
+        :return: derivative of the gradient in each tangent direction, shape (f_dim, x_dim, n_tangents)
+        """
+        if self.tensor:
+            raise TypeError("Second order derivatives are not supported for tensor functions")
+        duals = [Dual(x_i, tangents[i]) for i, x_i in enumerate(input_vector)]
+        input_nodes = self._create_input_nodes(duals)
+
+        output = np.zeros((self.f_dim, len(input_vector), tangents.shape[1]))
+        for i, input_adjoints in enumerate(self._propagate_adjoints(input_nodes, self._evaluate(input_nodes))):
+            for j, adjoint in enumerate(input_adjoints):
+                if isinstance(adjoint, Dual):  # constant adjoints have no derivative
+                    output[i, j] = adjoint.tangent
+        return output
+
+    def release(self):
+        """
+        Drops the state cached by this instance between calls: the graph sizes and the
+        method decisions of method="auto", the batchers of adf and the result cache.
+        Graphs themselves are never kept after a call returns.
+
+        :return: None
+        """
+        release_batchers(self)
+        self.cache_clear()
+        self.diagnostics = {}
+        self._graph_sizes.clear()
+        self._methods.clear()
+
+    def profile(self, memory=False):
+        """
+        Profiling context, counting the calls and the time of every operator and of the
+        phases of the calls of this instance, see profiling.profile. The counters are
+        yielded by the context and kept as stats.
+
+        :return: context manager
+        """
+        from .profiling import profile
+        return profile(self, memory=memory)
+
+    def compile(self, x_example, cache_dir=None):
+        """
+        Records the operations of the functions once at x_example. The returned graph
+        replays them to evaluate values and derivatives at new inputs of the same
+        dimension, without calling the functions again. Functions must not branch
+        on the values of their input.
+
+        If cache_dir is given, the graph is saved there under the key of the functions
+        and input dimension (see compiled.graph_key), and later compilations, in any
+        process, load it with memory-mapped arrays instead of recording the functions.
+
+        :return: compiled graph
+        """
+        assert isinstance(x_example, (float, int, list, np.ndarray))
+        if self.tensor:
+            raise TypeError("Tensor functions cannot be compiled")
+        input_vector = [x_example] if isinstance(x_example, (float, int)) else x_example
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, graph_key(self.function, len(input_vector)))
+            if os.path.isdir(path):
+                return CompiledGraph.load(path)
+            os.makedirs(cache_dir, exist_ok=True)
+
+        tape, _, outputs = record_tape(self.function, input_vector)
+        graph = CompiledGraph.from_tape(tape, outputs, len(input_vector))
+        if cache_dir is not None:
+            graph.save(path)
+        return graph
+
+    def sparse_jacobian(self, x, method="forward"):
+        """
+        Computes the Jacobian at x as a scipy.sparse matrix. The sparsity pattern is detected
+        from the operations recorded at x, and structurally orthogonal columns (forward mode)
+        or rows (backward mode) share a single pass. Functions must not branch on the values
+        of their input.
+
+        :return: Jacobian as a scipy.sparse CSC (forward mode) or CSR (backward mode) matrix
+        """
+        return self.compile(x).sparse_jacobian(x, method=method)
 
     def _create_input_nodes(self, input_vector, seed=None):
         """
-        Creates input nodes for each pass of forward
+        Creates input nodes for each pass of forward, row i of seed being the
+        tangent(s) carried by input i
 
         :return: input nodes
         """
+        x_dim = len(input_vector)
         if seed is None:
-            seed = np.ones(self.x_dim)
-        input_nodes = []
-        for i in range(self.x_dim):
-            node = Node((i + 1) - self.x_dim, input_vector[i], for_deriv=seed[i])  # create single input node
-            input_nodes.append(node)
-        input_nodes = [copy.deepcopy(input_nodes) for _ in range(self.f_dim)]  # duplicate input nodes for each function
+            seed = np.ones(x_dim)
+        if self.hash_consing:
+            # all functions share the input nodes, so their common subexpressions are shared too
+            input_node = [Node((i + 1) - x_dim, input_vector[i], for_deriv=seed[i]) for i in range(x_dim)]
+            return [input_node] * self.f_dim
+        # create a separate set of input nodes for each function
+        input_nodes = [[Node((i + 1) - x_dim, input_vector[i], for_deriv=seed[i]) for i in range(x_dim)]
+                       for _ in range(self.f_dim)]
         return input_nodes
 
 
 
+def _scalar(output):
+    """
+    Value of a function returning a scalar, as a tensor node or a number
+
+    :return: float
+    """
+    value = output.value if isinstance(output, TensorNode) else output
+    assert np.size(value) == 1, "Functions of a tensor input must return scalars"
+    return float(np.reshape(value, ()))
+
+
+def _copy(value):
+    """
+    Copy of a cached array, so callers cannot modify the cache
+
+    :return: copy of value
+    """
+    return value.copy() if isinstance(value, np.ndarray) else value
+
+
 class Node:
     """
     Node data structure
@@ -195,15 +858,19 @@ class Node:
     Attributes
     ----------
     name: int
-    value: int, float
-    child: list
-    parents: list
-    for_deriv: int, float
-    back_deriv: dict
+    value: int, float, np.ndarray, Dual
+    parents: tuple
+    for_deriv: int, float, np.ndarray
+    back_deriv: tuple
+        local partial derivative wrt each of the parents, in the same order
+    adjoint: int, float, np.ndarray
     """
 
-    def __init__(self, name: int, value, child=None, parents=[],
-                 for_deriv=1, back_deriv={}):
+    __slots__ = ('name', 'value', 'parents', 'for_deriv', 'back_deriv', 'adjoint')
+
+    _names = itertools.count(1)
+
+    def __init__(self, name: int, value, parents=(), for_deriv=1, back_deriv=()):
         """
         Create a new node
         """
@@ -212,37 +879,70 @@ class Node:
         else:
             raise TypeError("Node name must be an integer")
             
-        try:
-            float(value)
-        except:
-            raise TypeError("Node value must be float or integer")
+        if not isinstance(value, (np.ndarray, Dual)):
+            try:
+                float(value)
+            except:
+                raise TypeError("Node value must be float, integer, dual number or array of values")
         self.value = value
 
-        if isinstance(parents, list):
+        if isinstance(parents, (list, tuple)):
             assert all([isinstance(parent, Node) for parent in parents]), 'Parents of Node must be list of Nodes'
-            self.parents = parents
+            self.parents = tuple(parents)
         elif isinstance(parents, Node):
-            self.parents = parents
+            self.parents = (parents,)
         else:
             raise TypeError('Parents of Node must either be list of Nodes or Node')
 
-        if child:
-            self.child = child
-        else:
-            self.child = []
-
-        try:
-            float(for_deriv)
-        except:
-            raise TypeError("Forward mode derivative must be float or integer")
+        if not isinstance(for_deriv, np.ndarray):
+            try:
+                float(for_deriv)
+            except:
+                raise TypeError("Forward mode derivative must be float, integer or array of tangents")
         self.for_deriv = for_deriv
 
-        if isinstance(back_deriv, dict):
-            self.back_deriv = back_deriv
+        if isinstance(back_deriv, (list, tuple)):
+            assert len(back_deriv) == len(self.parents), 'Provide one backward mode derivative per parent'
+            self.back_deriv = tuple(back_deriv)
         else:
-            raise TypeError("Backward mode derivative must be float or integer")
+            raise TypeError("Backward mode derivative must be list of floats or integers, one per parent")
         self.adjoint = 0
 
+    @classmethod
+    def _make(cls, name, value, parents, for_deriv, back_deriv):
+        """
+        Create a new node resulting from an operation, skipping the validation of __init__
+
+        Returns
+        -------
+        new_node: Node
+        """
+        new_node = object.__new__(cls)
+        new_node.name = name
+        new_node.value = value
+        new_node.parents = parents
+        new_node.for_deriv = for_deriv
+        new_node.back_deriv = back_deriv
+        new_node.adjoint = 0
+        return new_node
+
+    def release(self):
+        """
+        Detaches every node of the graph ending in this node from its parents, so the
+        graph is freed at once even while some of its nodes are still referenced
+
+        Returns
+        -------
+        None
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.parents)
+            node.parents = ()
+            node.back_deriv = ()
+
+    @hash_consed('add', commutative=True)
     def __add__(self, other):
         """
         sum of node with other
@@ -261,23 +961,19 @@ class Node:
             new_name = self._new_name()
             value = self.value + other.value
             for_deriv = self.for_deriv + other.for_deriv
-            back_deriv = {self.name: 1, other.name: 1}
-            parents = [self, other]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
-            other.child.append(new_node)
+            back_deriv = (1, 1)
+            parents = (self, other)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
 
         elif isinstance(other, (float, int)):
             new_name = self._new_name()
             value = self.value + other
             for_deriv = self.for_deriv
-            back_deriv = {self.name: 1}
-            parents = [self]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
+            back_deriv = (1,)
+            parents = (self,)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         else:
             raise TypeError
-        self.child.append(new_node)
         return new_node
 
     def __radd__(self, other):
@@ -296,6 +992,7 @@ class Node:
         """
         return self.__add__(other)
 
+    @hash_consed('sub')
     def __sub__(self, other):
         """
         difference between node and other
@@ -314,25 +1011,22 @@ class Node:
             new_name = self._new_name()
             value = self.value - other.value
             for_deriv = self.for_deriv - other.for_deriv
-            back_deriv = {self.name: 1, other.name: -1}
-            parents = [self, other]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
-            other.child.append(new_node)
+            back_deriv = (1, -1)
+            parents = (self, other)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
 
         elif isinstance(other, (float, int)):
             new_name = self._new_name()
             value = self.value - other
             for_deriv = self.for_deriv
-            back_deriv = {self.name: 1}
-            parents = [self]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
+            back_deriv = (1,)
+            parents = (self,)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         else:
             raise TypeError
-        self.child.append(new_node)
         return new_node
 
+    @hash_consed('rsub')
     def __rsub__(self, other):
         """
         difference between other and node
@@ -352,15 +1046,14 @@ class Node:
             new_name = self._new_name()
             value = other - self.value
             for_deriv = - self.for_deriv
-            back_deriv = {self.name: -1}
-            parents = [self]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
+            back_deriv = (-1,)
+            parents = (self,)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         else:
             raise TypeError
-        self.child.append(new_node)
         return new_node
 
+    @hash_consed('mul', commutative=True)
     def __mul__(self, other):
         """
         multiplication between node and other
@@ -379,23 +1072,19 @@ class Node:
             new_name = self._new_name()
             value = self.value * other.value
             for_deriv = self.for_deriv * other.value + other.for_deriv * self.value
-            back_deriv = {self.name: other.value, other.name: self.value}
-            parents = [self, other]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
-            other.child.append(new_node)
+            back_deriv = (other.value, self.value)
+            parents = (self, other)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
 
         elif isinstance(other, (float, int)):
             new_name = self._new_name()
             value = self.value * other
             for_deriv = self.for_deriv * other
-            back_deriv = {self.name: other}
-            parents = [self]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
+            back_deriv = (other,)
+            parents = (self,)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         else:
             raise TypeError
-        self.child.append(new_node)
         return new_node
 
     def __rmul__(self, other):
@@ -414,6 +1103,7 @@ class Node:
         """
         return self.__mul__(other)
 
+    @hash_consed('pow')
     def __pow__(self, other):
         """
         power between node and other
@@ -433,37 +1123,33 @@ class Node:
             value = self.value ** other.value
             for_deriv = other.value*self.value**(other.value-1)*self.for_deriv + \
                         np.log(self.value)*self.value**other.value*other.for_deriv
-            back_deriv = {self.name: other.value*self.value ** (other.value-1),
-                          other.name: np.log(self.value)*self.value**other.value}
-            parents = [self, other]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
-            other.child.append(new_node)
+            back_deriv = (other.value*self.value ** (other.value-1),
+                          np.log(self.value)*self.value**other.value)
+            parents = (self, other)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
 
         elif isinstance(other, (float, int)):
             new_name = self._new_name()
             value = self.value ** other
             for_deriv = other*self.value ** (other-1)*self.for_deriv
-            back_deriv = {self.name: other*self.value ** (other-1)}
-            parents = [self]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
+            back_deriv = (other*self.value ** (other-1),)
+            parents = (self,)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         else:
             raise TypeError
-        self.child.append(new_node)
         return new_node
 
+    @hash_consed('rpow')
     def __rpow__(self, other):
         new_name = self._new_name()
         value = other ** self.value
         for_deriv = self.for_deriv * np.log(other) * other ** self.value
-        back_deriv = {self.name: np.log(other) * other ** self.value}
-        parents = [self]
-        new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                        parents=parents)
-        self.child.append(new_node)
+        back_deriv = (np.log(other) * other ** self.value,)
+        parents = (self,)
+        new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         return new_node
 
+    @hash_consed('div')
     def __truediv__(self, other):
         """
         division between other and node
@@ -482,25 +1168,22 @@ class Node:
             new_name = self._new_name()
             value = self.value / other.value
             for_deriv = (self.for_deriv * other.value - self.value * other.for_deriv) / (other.value * other.value)
-            back_deriv = {self.name: 1 / other.value, other.name: -self.value / (other.value * other.value)}
-            parents = [self, other]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
-            other.child.append(new_node)
+            back_deriv = (1 / other.value, -self.value / (other.value * other.value))
+            parents = (self, other)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
 
         elif isinstance(other, (float, int)):
             new_name = self._new_name()
             value = self.value / other
             for_deriv = self.for_deriv / other
-            back_deriv = {self.name: 1/other}
-            parents = [self]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
+            back_deriv = (1/other,)
+            parents = (self,)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         else:
             raise TypeError
-        self.child.append(new_node)
         return new_node
 
+    @hash_consed('rdiv')
     def __rtruediv__(self, other):
         """
         division between node and other
@@ -518,25 +1201,23 @@ class Node:
         if isinstance(other, (float, int)):
             new_name = self._new_name()
             value = other / self.value
-            for_deriv = -other / (self.value * self.value)
-            back_deriv = {self.name: -other / (self.value * self.value)}
-            parents = [self]
-            new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                            parents=parents)
+            for_deriv = -other / (self.value * self.value) * self.for_deriv
+            back_deriv = (-other / (self.value * self.value),)
+            parents = (self,)
+            new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         else:
             raise TypeError
-        self.child.append(new_node)
         return new_node
 
     def _new_name(self):
         """
-        Compute the name of the new node
+        Compute the name of the new node, names being allocated sequentially
         Return
         ------
         new_name: int
             name for new node
         """
-        return random.getrandbits(64)
+        return next(Node._names)
 
     def __eq__(self, other):
         """
@@ -554,17 +1235,17 @@ class Node:
         """
         if isinstance(other, Node):
             s1 = self.name == other.name
-            s2 = self.value == other.value
+            s2 = np.array_equal(self.value, other.value)
             s3 = self.parents == other.parents
-            s4 = self.child == other.child
-            s5 = self.for_deriv == other.for_deriv
-            s6 = self.back_deriv == other.back_deriv
-            s7 = self.adjoint == other.adjoint
-            if all([s1, s2, s3, s4, s5, s6, s7]):
+            s4 = np.array_equal(self.for_deriv, other.for_deriv)
+            s5 = self.back_deriv == other.back_deriv
+            s6 = self.adjoint == other.adjoint
+            if all([s1, s2, s3, s4, s5, s6]):
                 return True
             return False
         raise TypeError("Node can only be equated with another Node")
 
+    @hash_consed('neg')
     def __neg__(self):
         """
         negation of node
@@ -577,9 +1258,7 @@ class Node:
         new_name = self._new_name()
         value = - self.value
         for_deriv = - self.for_deriv
-        back_deriv = {self.name: -1}
-        parents = [self]
-        new_node = Node(new_name, value, for_deriv=for_deriv, back_deriv=back_deriv,
-                        parents=parents)
-        self.child.append(new_node)
+        back_deriv = (-1,)
+        parents = (self,)
+        new_node = Node._make(new_name, value, parents, for_deriv, back_deriv)
         return new_node
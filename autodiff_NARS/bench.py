@@ -0,0 +1,241 @@
+"""
+Benchmark suite of AutoDiff, covering the scaling of forward and backward mode in the
+input dimension, the number of functions and the depth of the graph.
+
+Every case is timed with timeit, repeating a number of calls long enough to be measured
+reliably, and reports the best and median time of one call. Results are written as JSON
+and can be compared against a baseline written by an earlier run: a case is a regression
+if its best time exceeds the baseline by more than the tolerance.
+
+Usage: python -m autodiff_NARS.bench [--quick] [--filter TEXT] [--output FILE]
+                                     [--baseline FILE] [--tolerance FRACTION]
+
+Exits with status 1 if a case regressed against the baseline.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import numpy as np
+from .autodiff import AutoDiff
+from .functions import sin, cos, exp, log, sinh
+
+METHODS = ["forward", "backward"]
+
+
+def _demo_scalar(method):
+    """Scenario 1 of the demo: single function of a scalar"""
+    ad = AutoDiff(lambda x: log(x) + sin(x))
+    return lambda: ad.df(1.0, method=method)
+
+
+def _demo_system(method):
+    """Scenario 4 of the demo: three functions of three inputs"""
+    ad = AutoDiff([lambda x: log(x[0]) + sin(x[1]) + x[2],
+                   lambda x: sinh(x[0]) * exp(x[1]) - x[2],
+                   lambda x: x[0] * sin(x[1]) / x[2]])
+    return lambda: ad.df([1.0, 3.0, 5.0], method=method)
+
+
+def _newton_scalar(method):
+    """Newton iterations to the root of x ** 2 - 3, as in the demo"""
+    ad = AutoDiff(lambda x: x ** 2 - 3)
+
+    def solve():
+        x = 10.0
+        for _ in range(20):
+            f, df = ad.value_and_jacobian(x, method=method)
+            if abs(f) < 1e-12:
+                break
+            x -= f / df
+        return x
+    return solve
+
+
+def _newton_system(method):
+    """Newton iterations on a system of two nonlinear equations"""
+    ad = AutoDiff([lambda x: x[0] ** 2 + x[1] ** 2 - 4, lambda x: exp(x[0]) + x[1] - 1])
+
+    def solve():
+        x = np.array([1.0, -1.0])
+        for _ in range(20):
+            f, df = ad.value_and_jacobian(x, method=method)
+            if np.max(np.abs(f)) < 1e-12:
+                break
+            x = x - np.linalg.solve(df, f)
+        return x
+    return solve
+
+
+def _wide(method, x_dim):
+    """Single function summing a term of each of x_dim inputs"""
+    def f(x):
+        total = 0.0
+        for x_i in x:
+            total = total + x_i * sin(x_i)
+        return total
+    ad = AutoDiff(f)
+    x = np.linspace(0.1, 1.0, x_dim)
+    return lambda: ad.df(x, method=method)
+
+
+def _wide_tensor(method, x_dim):
+    """Least-squares function of x_dim inputs, as a single tensor input"""
+    rng = np.random.default_rng(0)
+    A = rng.normal(size=(10, x_dim))
+    y = rng.normal(size=10)
+    ad = AutoDiff(lambda w: ((A @ w - y) ** 2).sum(), tensor=True)
+    x = np.linspace(0.1, 1.0, x_dim)
+    return lambda: ad.df(x, method=method)
+
+
+def _chain(method, depth):
+    """Chain of depth operations, each depending only on the previous one"""
+    def f(x):
+        for _ in range(depth):
+            x = sin(x) + 1
+        return x
+    ad = AutoDiff(f)
+    return lambda: ad.df(0.5, method=method)
+
+
+def _diamond(method, depth, hash_consing=False):
+    """Stack of depth diamonds, each node feeding both branches of the next one"""
+    def f(x):
+        for _ in range(depth):
+            x = sin(x) * cos(x) + sin(x)
+        return x
+    ad = AutoDiff(f, hash_consing=hash_consing)
+    return lambda: ad.df(0.5, method=method)
+
+
+def _diamond_consed(method, depth):
+    """Stack of depth diamonds, built with hash consing"""
+    return _diamond(method, depth, hash_consing=True)
+
+
+def _system(method, f_dim, x_dim=10):
+    """f_dim functions of x_dim inputs, each coupling three neighbouring inputs"""
+    def residual(i):
+        return lambda x: sin(x[i % x_dim]) * x[(i + 1) % x_dim] - exp(x[(i + 2) % x_dim], 2) / (i + 1)
+    ad = AutoDiff([residual(i) for i in range(f_dim)])
+    x = np.linspace(0.1, 1.0, x_dim)
+    return lambda: ad.df(x, method=method)
+
+
+def cases():
+    """
+    Benchmark cases, each a dict of its name, group, method, parameters, whether it is part
+    of the quick suite, and a setup function returning the callable to time
+
+    :return: list of cases
+    """
+    grid = [("demo_scalar", _demo_scalar, {}, True), ("demo_system", _demo_system, {}, True),
+            ("newton_scalar", _newton_scalar, {}, True), ("newton_system", _newton_system, {}, True)]
+    grid += [("wide", _wide, {"x_dim": x_dim}, x_dim <= 100) for x_dim in [10, 100, 1000, 10000]]
+    grid += [("wide_tensor", _wide_tensor, {"x_dim": x_dim}, x_dim <= 100) for x_dim in [10, 100, 1000, 10000]]
+    grid += [("chain", _chain, {"depth": depth}, depth <= 1000) for depth in [100, 1000, 10000]]
+    grid += [("diamond", _diamond, {"depth": depth}, depth <= 1000) for depth in [100, 1000, 10000]]
+    grid += [("diamond_consed", _diamond_consed, {"depth": depth}, depth <= 1000) for depth in [100, 1000]]
+    grid += [("system", _system, {"f_dim": f_dim}, f_dim <= 10) for f_dim in [2, 10, 100]]
+
+    result = []
+    for group, setup, params, quick in grid:
+        for method in METHODS:
+            # forward mode on 10^4 inputs propagates 10^4 tangents through every operation
+            if method == "forward" and params.get("x_dim", 0) > 1000:
+                continue
+            name = "/".join([group, method] + [f"{key}={value}" for key, value in params.items()])
+            result.append({"name": name, "group": group, "method": method, "params": params, "quick": quick,
+                           "setup": lambda setup=setup, method=method, params=params: setup(method, **params)})
+    return result
+
+
+def measure(function, repeat=5, min_time=0.05):
+    """
+    Times function, calling it enough times per repetition to last at least min_time seconds
+
+    :return: dict of the best and median time of one call in seconds, calls per repetition, repetitions
+    """
+    function()  # warm up
+    number = 1
+    while True:
+        elapsed = timeit.timeit(function, number=number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+    times = [elapsed / number] + [timeit.timeit(function, number=number) / number for _ in range(repeat - 1)]
+    return {"best": min(times), "median": float(np.median(times)), "number": number, "repeat": repeat}
+
+
+def run(quick=False, pattern=None, repeat=5, min_time=0.05, stream=None):
+    """
+    Runs the benchmark cases, all of them or the quick suite, whose names contain pattern
+
+    :return: results as a JSON serializable dict
+    """
+    results = {}
+    for benchmark in cases():
+        if (quick and not benchmark["quick"]) or (pattern and pattern not in benchmark["name"]):
+            continue
+        timing = measure(benchmark["setup"](), repeat=repeat, min_time=min_time)
+        results[benchmark["name"]] = dict(group=benchmark["group"], method=benchmark["method"],
+                                          params=benchmark["params"], **timing)
+        if stream is not None:
+            print(f"{benchmark['name']:<40} {timing['best'] * 1e3:>12.4f} ms", file=stream)
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__,
+                     "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results}
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compares the best time of each case against the baseline, cases missing from either
+    side being skipped
+
+    :return: dict of the time ratio to the baseline of each case, names of the regressed cases
+    """
+    ratios = {}
+    for name, timing in results["results"].items():
+        if name in baseline["results"]:
+            ratios[name] = timing["best"] / baseline["results"][name]["best"]
+    regressions = [name for name, ratio in ratios.items() if ratio > 1 + tolerance]
+    return ratios, regressions
+
+
+def main(argv=None):
+    """
+    Command line entry point
+
+    :return: exit status, 1 if a case regressed against the baseline
+    """
+    parser = argparse.ArgumentParser(prog="python -m autodiff_NARS.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="run the small cases only")
+    parser.add_argument("--filter", default=None, help="run the cases whose name contains this text")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare the results against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown tolerated before a case is a regression")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of each case")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick, pattern=args.filter, repeat=args.repeat, stream=sys.stdout)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    ratios, regressions = compare(results, baseline, tolerance=args.tolerance)
+    print(f"\n{'case':<40} {'vs baseline':>12}")
+    for name, ratio in ratios.items():
+        print(f"{name:<40} {ratio:>11.2f}x" + ("  REGRESSION" if name in regressions else ""))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import numpy as np
+from .autodiff import Node
+
+
+def checkpoint(fn):
+    """
+        Checkpoint wrapper, evaluating fn without keeping its computational graph.
+
+        The wrapped function returns nodes linked directly to the nodes it was called
+        on. Their local derivatives are recomputed from the stored inputs when the
+        reverse sweep first needs them, by evaluating fn once more with forward mode
+        tangents, and are released once every output has used them.
+
+        Parameters
+        ----------
+        fn: function
+            Function of a state (Node, float, or list/tuple of those) returning a state
+
+        Returns
+        -------
+        wrapped: function
+            Function computing the same state as fn
+        """
+
+    def wrapped(state):
+        entries = list(state) if isinstance(state, (list, tuple)) else [state]
+        inputs = [entry for entry in entries if isinstance(entry, Node)]
+        if not inputs:
+            return fn(state)
+
+        # evaluate on fresh leaves carrying the forward mode tangents of the inputs, the graph
+        # built by fn is dropped once the outputs are copied
+        leaves = [Node._make(node._new_name(), node.value, (), node.for_deriv, ()) for node in inputs]
+        outputs = fn(_substitute(state, leaves))
+
+        segment = _Segment(fn, state, inputs)
+        out_entries = list(outputs) if isinstance(outputs, (list, tuple)) else [outputs]
+        result = []
+        for position, output in enumerate(out_entries):
+            if isinstance(output, Node):
+                output = CheckpointNode._make_output(output.value, output.for_deriv, segment, position)
+            result.append(output)
+        if isinstance(outputs, (list, tuple)):
+            return type(outputs)(result)
+        return result[0]
+
+    return wrapped
+
+
+def checkpoint_loop(step, state, n_steps, checkpoints=None):
+    """
+        Applies step n_steps times to state, storing only a limited number of states.
+
+        The steps are split into at most `checkpoints` segments of equal length, each
+        wrapped by checkpoint. The reverse sweep then holds the states at the segment
+        boundaries plus the graph of one segment being recomputed, i.e. memory for
+        about checkpoints + n_steps / checkpoints steps, at the cost of evaluating
+        every step once more. The default of sqrt(n_steps) checkpoints minimizes memory.
+
+        Parameters
+        ----------
+        step: function
+            Function of a state (Node, float, or list/tuple of those) returning a state
+        state: Node, float, list, tuple
+            Initial state
+        n_steps: int
+            Number of steps
+        checkpoints: int
+            Memory budget, maximal number of stored states
+
+        Returns
+        -------
+        state: Node, float, list, tuple
+            State after n_steps steps
+        """
+    if not isinstance(n_steps, int) or n_steps < 0:
+        raise TypeError("Number of steps must be a non-negative integer")
+    if checkpoints is None:
+        checkpoints = max(1, int(np.ceil(np.sqrt(n_steps))))
+    assert checkpoints > 0, "The number of checkpoints must be a positive integer"
+
+    length = max(1, -(-n_steps // checkpoints))
+    for start in range(0, n_steps, length):
+        state = checkpoint(_repeat(step, min(length, n_steps - start)))(state)
+    return state
+
+
+def _repeat(step, n_steps):
+    """
+    Function applying step n_steps times
+    """
+    def segment(state):
+        for _ in range(n_steps):
+            state = step(state)
+        return state
+    return segment
+
+
+def _substitute(state, nodes):
+    """
+    Replaces the nodes of a state by nodes, in order
+    """
+    if not isinstance(state, (list, tuple)):
+        return nodes[0] if isinstance(state, Node) else state
+    nodes = iter(nodes)
+    return type(state)([next(nodes) if isinstance(entry, Node) else entry for entry in state])
+
+
+class _Segment:
+    """
+    Checkpointed evaluation of fn, holding the nodes it was called on and, during the
+    reverse sweep, the Jacobian of its outputs wrt these nodes
+    """
+
+    __slots__ = ('fn', 'state', 'inputs', 'jacobian', 'pending')
+
+    def __init__(self, fn, state, inputs):
+        self.fn = fn
+        self.state = state
+        self.inputs = tuple(inputs)
+        self.jacobian = None
+        self.pending = 0
+
+    def jacobian_row(self, position):
+        """
+        Local derivatives of output position wrt the inputs, recomputing the Jacobian of
+        the segment if needed and releasing it once every output has read its row
+
+        :return: tuple of partial derivatives aligned with the inputs
+        """
+        if self.jacobian is None:
+            self.jacobian = self._recompute()
+            self.pending = sum(row is not None for row in self.jacobian)
+        row = self.jacobian[position]
+        self.pending -= 1
+        if self.pending <= 0:
+            self.jacobian = None
+        return row
+
+    def _recompute(self):
+        """
+        Evaluates fn again with one forward mode tangent per input
+
+        :return: rows of the Jacobian, None for outputs not depending on the inputs
+        """
+        n = len(self.inputs)
+        batch_shape = np.shape(self.inputs[0].value)
+        tangents = np.identity(n)
+        leaves = []
+        for j, node in enumerate(self.inputs):
+            tangent = np.broadcast_to(tangents[j][(...,) + (None,) * len(batch_shape)], (n,) + batch_shape)
+            leaves.append(Node._make(node._new_name(), node.value, (), tangent, ()))
+        outputs = self.fn(_substitute(self.state, leaves))
+        outputs = list(outputs) if isinstance(outputs, (list, tuple)) else [outputs]
+
+        jacobian = []
+        for output in outputs:
+            if isinstance(output, Node):
+                for_deriv = np.broadcast_to(output.for_deriv, (n,) + np.shape(output.for_deriv)[1:])
+                jacobian.append(tuple(for_deriv))
+            else:
+                jacobian.append(None)
+        return jacobian
+
+
+class CheckpointNode(Node):
+    """
+    Output node of a checkpointed function, whose back_deriv is recomputed on demand
+
+    ...
+
+    Attributes
+    ----------
+    segment: _Segment
+        checkpointed evaluation the node is an output of
+    position: int
+        index of the node among the outputs of the segment
+    """
+
+    __slots__ = ('segment', 'position')
+
+    @classmethod
+    def _make_output(cls, value, for_deriv, segment, position):
+        """
+        Create an output node of segment, whose parents are the segment inputs
+
+        Returns
+        -------
+        new_node: CheckpointNode
+        """
+        new_node = object.__new__(cls)
+        new_node.name = segment.inputs[0]._new_name()
+        new_node.value = value
+        new_node.parents = segment.inputs
+        new_node.for_deriv = for_deriv
+        new_node.adjoint = 0
+        new_node.segment = segment
+        new_node.position = position
+        return new_node
+
+    @property
+    def back_deriv(self):
+        if self.segment is None:
+            return ()
+        return self.segment.jacobian_row(self.position)
+
+    @back_deriv.setter
+    def back_deriv(self, back_deriv):
+        # only set to () when the node is released
+        self.segment = None
@@ -0,0 +1,314 @@
+import functools
+import numpy as np
+from .tape import BINARY_RULES, UNARY_RULES
+
+
+# source templates of the value and local partial derivatives of each recorded operation,
+# {a} and {b} being the operands and {c} the constant operand
+VALUE_SOURCE = {
+    'add': '{a} + {b}',
+    'sub': '{a} - {b}',
+    'mul': '{a} * {b}',
+    'div': '{a} / {b}',
+    'pow': '{a} ** {b}',
+    'add_const': '{a} + {c}',
+    'sub_const': '{a} - {c}',
+    'rsub_const': '{c} - {a}',
+    'mul_const': '{a} * {c}',
+    'div_const': '{a} / {c}',
+    'rdiv_const': '{c} / {a}',
+    'pow_const': '{a} ** {c}',
+    'rpow_const': '{c} ** {a}',
+    'neg': '-{a}',
+    'sin': 'np.sin({a})',
+    'cos': 'np.cos({a})',
+    'tan': 'np.tan({a})',
+    'arcsin': 'np.arcsin({a})',
+    'arccos': 'np.arccos({a})',
+    'arctan': 'np.arctan({a})',
+    'sinh': 'np.sinh({a})',
+    'cosh': 'np.cosh({a})',
+    'tanh': 'np.tanh({a})',
+    'sqrt': 'np.sqrt({a})',
+    'exp': '{c} ** {a}',
+    'log': 'np.log({a}) / np.log({c})',
+    'sigmoid': '1 / (1 + np.exp(-{a}))',
+}
+
+PARTIAL1_SOURCE = {
+    'add': '1.0',
+    'sub': '1.0',
+    'mul': '{b}',
+    'div': '1 / {b}',
+    'pow': '{b} * {a} ** ({b} - 1)',
+    'add_const': '1.0',
+    'sub_const': '1.0',
+    'rsub_const': '-1.0',
+    'mul_const': '{c}',
+    'div_const': '1 / {c}',
+    'rdiv_const': '-{c} / ({a} * {a})',
+    'pow_const': '{c} * {a} ** ({c} - 1)',
+    'rpow_const': 'np.log({c}) * {v}',
+    'neg': '-1.0',
+    'sin': 'np.cos({a})',
+    'cos': '-np.sin({a})',
+    'tan': '1 / np.cos({a}) ** 2',
+    'arcsin': '1 / np.sqrt(1 - {a} ** 2)',
+    'arccos': '-1 / np.sqrt(1 - {a} ** 2)',
+    'arctan': '1 / (1 + {a} ** 2)',
+    'sinh': 'np.cosh({a})',
+    'cosh': 'np.sinh({a})',
+    'tanh': '1 / np.cosh({a}) ** 2',
+    'sqrt': '0.5 / {v}',
+    'exp': 'np.log({c}) * {v}',
+    'log': '1 / (np.log({c}) * {a})',
+    'sigmoid': '{v} * (1 - {v})',
+}
+
+PARTIAL2_SOURCE = {
+    'add': '1.0',
+    'sub': '-1.0',
+    'mul': '{a}',
+    'div': '-{a} / ({b} * {b})',
+    'pow': 'np.log({a}) * {v}',
+}
+
+
+def _literal(c):
+    """
+    Python source of a constant, parenthesized if negative so the templates apply
+    ** and unary minus to the whole constant
+    """
+    c = float(c)
+    source = repr(c) if np.isfinite(c) else f"float('{c}')"
+    return f"({source})" if np.signbit(c) else source
+
+
+def generate_source(graph, jacobian=True):
+    """
+    Emits straight-line source of a function of the input vector x returning the outputs
+    of the graph and, if jacobian is True, the Jacobian computed by reverse sweeps.
+    Only entries the outputs depend on are emitted.
+
+    :return: source code
+    """
+    ops, arg1, arg2, const = graph._entries()
+
+    # entries reachable from each output, found by walking the graph backwards
+    reachable = []
+    for output in graph.outputs:
+        needed = {output}
+        for i in range(output, -1, -1):
+            if i in needed and arg1[i] >= 0:
+                needed.add(arg1[i])
+                if arg2[i] >= 0:
+                    needed.add(arg2[i])
+        reachable.append(needed)
+    live = set().union(*reachable)
+
+    name = 'kernel' if jacobian else 'value'
+    lines = [f'def {name}(x):']
+    for i in range(len(ops)):
+        if i not in live:
+            continue
+        fields = {'a': f'v{arg1[i]}', 'b': f'v{arg2[i]}', 'c': _literal(const[i]), 'v': f'v{i}'}
+        if ops[i] == 'input':
+            lines.append(f'    v{i} = x[{i}]')
+        elif ops[i] == 'const':
+            lines.append(f'    v{i} = {_literal(const[i])}')
+        elif ops[i] not in VALUE_SOURCE:
+            # registered primitive without source templates, its rule is called
+            if arg2[i] >= 0:
+                call = f'BINARY_RULES[{ops[i]!r}](v{arg1[i]}, v{arg2[i]})'
+                targets = f'v{i}, p{i}, q{i}'
+            else:
+                call = f'UNARY_RULES[{ops[i]!r}](v{arg1[i]}, {_literal(const[i])})'
+                targets = f'v{i}, p{i}'
+            lines.append(f'    {targets} = {call}' if jacobian else f'    v{i} = {call}[0]')
+        else:
+            lines.append(f'    v{i} = ' + VALUE_SOURCE[ops[i]].format(**fields))
+            if jacobian:
+                lines.append(f'    p{i} = ' + PARTIAL1_SOURCE[ops[i]].format(**fields))
+                if arg2[i] >= 0:
+                    lines.append(f'    q{i} = ' + PARTIAL2_SOURCE[ops[i]].format(**fields))
+    values = ', '.join(f'v{output}' for output in graph.outputs)
+    if not jacobian:
+        lines.append(f'    return [{values}]')
+        return '\n'.join(lines) + '\n'
+
+    rows = []
+    for k, (output, needed) in enumerate(zip(graph.outputs, reachable)):
+        # reverse sweep for output k, assigning each adjoint on its first contribution
+        assigned = {output}
+        lines.append(f'    a{k}_{output} = 1.0')
+        for i in range(output, graph.x_dim - 1, -1):
+            if i not in needed or arg1[i] < 0:
+                continue
+            for j, partial in ((arg1[i], f'p{i}'), (arg2[i], f'q{i}')):
+                if j < 0:
+                    continue
+                if j in assigned:
+                    lines.append(f'    a{k}_{j} = a{k}_{j} + a{k}_{i} * {partial}')
+                else:
+                    lines.append(f'    a{k}_{j} = a{k}_{i} * {partial}')
+                    assigned.add(j)
+        row = [f'a{k}_{j}' if j in assigned else '0.0' for j in range(graph.x_dim)]
+        rows.append('[' + ', '.join(row) + ']')
+    lines.append(f'    return [{values}], [{", ".join(rows)}]')
+    return '\n'.join(lines) + '\n'
+
+
+@functools.lru_cache(maxsize=128)
+def compile_source(source, name):
+    """
+    Executes generated source, cached so equal graphs share one function
+
+    :return: generated function
+    """
+    namespace = {'np': np, 'BINARY_RULES': BINARY_RULES, 'UNARY_RULES': UNARY_RULES}
+    exec(compile(source, f'<autodiff_NARS.codegen {name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+class GeneratedKernel:
+    """
+    Straight-line NumPy functions generated from a compiled graph
+
+    ...
+
+    The generated functions evaluate the values and the Jacobian without any Node
+    or tape, and accept either a single input point or a batch of points.
+
+    Attributes
+    ----------
+    x_dim: int
+        dimension of the input
+    f_dim: int
+        number of outputs
+    value_source: str
+        source of the function evaluating the outputs
+    jacobian_source: str
+        source of the function evaluating the outputs and the Jacobian
+
+    Methods
+    -------
+    f, f_batch
+        returns the function value at a point, at a batch of points
+    df, df_batch
+        returns the Jacobian at a point, at a batch of points
+    gradient
+        returns the gradient of a single function at a point
+    """
+
+    def __init__(self, graph):
+        """
+        Generate the functions of a compiled graph
+        """
+        self._graph = graph
+        self.x_dim = graph.x_dim
+        self.f_dim = graph.f_dim
+        self.value_source = generate_source(graph, jacobian=False)
+        self.jacobian_source = generate_source(graph, jacobian=True)
+        self._value = compile_source(self.value_source, 'value')
+        self._kernel = compile_source(self.jacobian_source, 'kernel')
+
+    def _input_vector(self, x):
+        """
+        Validates input x, as the compiled graph does
+
+        :return: list of input values
+        """
+        return self._graph._input_vector(x)
+
+    @staticmethod
+    def _batch_input(X):
+        """
+        Validates a batch of input points, one point per row, as AutoDiff does
+
+        :return: list of input coordinates, each an array over the batch
+        """
+        # imported here, since autodiff imports this module through compiled
+        from .autodiff import AutoDiff
+        return list(AutoDiff._batch_input(X).T)
+
+    def _evaluate(self, input_vector):
+        """
+        Runs the generated kernel, broadcasting constant entries over the batch
+
+        :return: function values of shape (f_dim, ...), Jacobian of shape (f_dim, x_dim, ...)
+        """
+        f, jacobian = self._kernel(input_vector)
+        shape = np.shape(input_vector[0])
+        if not shape:
+            return np.array(f, dtype=float), np.array(jacobian, dtype=float)
+        f = np.array([np.broadcast_to(f_i, shape) for f_i in f])
+        jacobian = np.array([[np.broadcast_to(d, shape) for d in row] for row in jacobian])
+        return f, jacobian
+
+    def f(self, x):
+        """
+        Evaluates function at x
+
+        :return: function value
+        """
+        f = np.array(self._value(self._input_vector(x)), dtype=float)
+        if self.f_dim == 1:
+            return f[0]  # flatten output
+        return f
+
+    def df(self, x):
+        """
+        Computes the Jacobian at x
+
+        :return: derivative value
+        """
+        jacobian = self._evaluate(self._input_vector(x))[1]
+        if self.x_dim == 1 and self.f_dim == 1:
+            return jacobian.flatten()[0]  # flatten output
+        return jacobian
+
+    def gradient(self, x):
+        """
+        Computes the gradient of a single function at x
+
+        :return: gradient of shape (x_dim,)
+        """
+        assert self.f_dim == 1, "The gradient is defined for a single function"
+        return self._evaluate(self._input_vector(x))[1][0]
+
+    def f_batch(self, X):
+        """
+        Evaluates function at every row of X
+
+        :return: function values of shape (N, f_dim), or (N,) for a single function
+        """
+        input_vector = self._batch_input(X)
+        f = np.array([np.broadcast_to(f_i, np.shape(input_vector[0])) for f_i in self._value(input_vector)]).T
+        if self.f_dim == 1:
+            return f[:, 0]  # flatten output
+        return f
+
+    def df_batch(self, X):
+        """
+        Computes the Jacobian at every row of X
+
+        :return: stacked Jacobians of shape (N, f_dim, x_dim)
+        """
+        return np.moveaxis(self._evaluate(self._batch_input(X))[1], -1, 0)
+
+    def __call__(self, x):
+        """
+        Computes the function value and the Jacobian at x
+
+        :return:
+        f:
+            Function value at x
+        df:
+            Derivative value at x
+        """
+        f, jacobian = self._evaluate(self._input_vector(x))
+        if self.f_dim == 1:
+            f = f[0]
+        if self.x_dim == 1 and self.f_dim == 1:
+            jacobian = jacobian.flatten()[0]
+        return f, jacobian
@@ -0,0 +1,457 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import types
+import numpy as np
+from .tape import BINARY_RULES, UNARY_RULES, OPS, OPCODES, forward_sweep, reverse_sweep
+from .codegen import GeneratedKernel
+from .optimize import simplify
+
+# version of the saved graph layout, part of the key of cached graphs
+GRAPH_FORMAT = 1
+_ARRAYS = ('op', 'arg1', 'arg2', 'const')
+
+
+class CompiledGraph:
+    """
+    Operation graph recorded once and replayed at new inputs
+
+    ...
+
+    Replaying the recorded operations gives the values, forward mode derivatives
+    and adjoints at a new input without calling the recorded functions again.
+    The graph is only valid for inputs taking the same path through the functions
+    as the input they were recorded at, i.e. for functions without branches on
+    the input values.
+
+    Attributes
+    ----------
+    x_dim: int
+        dimension of the input
+    f_dim: int
+        number of outputs
+    op, arg1, arg2, const: np.ndarray
+        opcodes, operand entry indices and constants of the recorded entries
+    outputs: list
+        entry index of each output
+
+    Methods
+    -------
+    f
+        returns the function value at x
+    df
+        returns the derivative at x, computed using forward or backward mode
+    sparsity
+        returns the structural sparsity pattern of the Jacobian
+    sparse_jacobian
+        returns the Jacobian at x as a scipy.sparse matrix, computed from compressed passes
+    optimize
+        returns an equivalent graph with folded constants, rewritten identities and no dead entries
+    codegen
+        returns straight-line NumPy functions generated from the graph
+    save
+        saves the graph to a directory, from which load reads it back
+    """
+
+    def __init__(self, op, arg1, arg2, const, outputs, x_dim):
+        """
+        Instantiate compiled graph from the arrays of a recorded tape
+        """
+        self.op = op
+        self.arg1 = arg1
+        self.arg2 = arg2
+        self.const = const
+        self.outputs = list(outputs)
+        self.x_dim = x_dim
+        self.f_dim = len(self.outputs)
+        self._entries_lists = None
+        self._kernel = None
+        self._pattern = None
+        self._colorings = {}
+
+    @classmethod
+    def from_tape(cls, tape, outputs, x_dim):
+        """
+        Compiles the entries of a tape, whose first x_dim entries are the inputs
+
+        :return: compiled graph
+        """
+        n = tape.size
+        return cls(tape.op[:n].copy(), tape.arg1[:n].copy(), tape.arg2[:n].copy(), tape.const[:n].copy(),
+                   [output.index for output in outputs], x_dim)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Loads a graph saved by save, memory-mapping its arrays unless mmap_mode is None,
+        so they are only read from disk once the graph is replayed.
+        Opcodes are translated through the saved operation names, reading them, since
+        primitives may have been registered in a different order.
+
+        :return: compiled graph
+        """
+        with open(os.path.join(path, 'meta.json')) as file:
+            meta = json.load(file)
+        assert meta['format'] == GRAPH_FORMAT, f"Graph saved in format {meta['format']}, expected {GRAPH_FORMAT}"
+        op, arg1, arg2, const = (np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode) for name in _ARRAYS)
+
+        saved_ops = meta['ops']
+        if saved_ops != OPS[:len(saved_ops)]:
+            codes = np.array([OPCODES.get(name, -1) for name in saved_ops], dtype=np.int16)
+            unknown = [saved_ops[code] for code in np.unique(op) if codes[code] < 0]
+            assert not unknown, f"Operations {unknown} of the saved graph are not registered"
+            op = codes[op]
+        return cls(op, arg1, arg2, const, meta['outputs'], meta['x_dim'])
+
+    def save(self, path):
+        """
+        Saves the graph to the directory path, as one .npy file per array and the operation
+        names in meta.json. The directory is written under a temporary name and renamed, so
+        concurrent writers and readers never see a partial graph; a graph already saved at
+        path is kept.
+
+        :return: None
+        """
+        temporary = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(temporary, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(temporary, name + '.npy'), getattr(self, name))
+        with open(os.path.join(temporary, 'meta.json'), 'w') as file:
+            json.dump({'format': GRAPH_FORMAT, 'x_dim': self.x_dim, 'outputs': [int(i) for i in self.outputs],
+                       'ops': OPS}, file)
+        try:
+            os.rename(temporary, path)
+        except OSError:
+            # another process saved the graph first
+            shutil.rmtree(temporary)
+
+    def __len__(self):
+        return len(self.op)
+
+    def _entries(self):
+        """
+        Lists of the operation names, operand indices and constants of the entries, converted
+        from the arrays on first use, so a memory-mapped graph is only read once it is replayed.
+        Python lists are faster than arrays to index one entry at a time.
+
+        :return: operation names, first operands, second operands, constants
+        """
+        if self._entries_lists is None:
+            self._entries_lists = ([OPS[code] for code in self.op.tolist()], self.arg1.tolist(),
+                                   self.arg2.tolist(), self.const.tolist())
+        return self._entries_lists
+
+    def _input_vector(self, x):
+        """
+        Validates input x
+
+        :return: list of input values
+        """
+        assert isinstance(x, (float, int, list, np.ndarray))
+        input_vector = list(np.asarray([x] if isinstance(x, (float, int)) else x, dtype=float))
+        assert len(input_vector) == self.x_dim, "Input x must have the dimension the graph was compiled for"
+        return input_vector
+
+    def _replay(self, input_vector):
+        """
+        Replays the recorded operations at input_vector
+
+        :return: values, partial derivatives wrt first and second operand, of every entry
+        """
+        ops, arg1, arg2, const = self._entries()
+        n = len(ops)
+        value = list(input_vector) + [0.0] * (n - self.x_dim)
+        partial1 = [0.0] * n
+        partial2 = [0.0] * n
+        for i in range(self.x_dim, n):
+            op = ops[i]
+            if op == 'const':
+                value[i] = const[i]
+            elif op in BINARY_RULES:
+                value[i], partial1[i], partial2[i] = BINARY_RULES[op](value[arg1[i]], value[arg2[i]])
+            else:
+                value[i], partial1[i] = UNARY_RULES[op](value[arg1[i]], const[i])
+        return value, partial1, partial2
+
+    def f(self, x):
+        """
+        Evaluates function at x by replaying the recorded operations
+
+        :return: function value
+        """
+        value = self._replay(self._input_vector(x))[0]
+        f = np.array([value[output] for output in self.outputs])
+        if self.f_dim == 1:
+            return f[0]  # flatten output
+        return f
+
+    def df(self, x, method="forward", seed=None):
+        """
+        Computes derivative at x by replaying the recorded operations, using either forward or backward mode AD
+
+        :return: derivative value
+        """
+        return self.value_and_jacobian(x, method=method, seed=seed)[1]
+
+    def value_and_jacobian(self, x, method="forward", seed=None):
+        """
+        Computes the function value and its derivative at x from a single replay of the recorded operations
+
+        :return:
+        f:
+            Function value at x
+        df:
+            Derivative value at x
+        """
+        if method not in ("forward", "backward"):
+            raise TypeError("Method supported is either 'forward' or 'backward'")
+        input_vector = self._input_vector(x)
+        if seed is not None:
+            assert len(seed) == self.x_dim, "The seed vector must be the same shape as the input x"
+        value, partial1, partial2 = self._replay(input_vector)
+        _, arg1, arg2, _ = self._entries()
+
+        if method == "forward":
+            tangents = np.identity(self.x_dim) if seed is None else np.asarray(seed, dtype=float).reshape(-1, 1)
+            tangent = forward_sweep(arg1, arg2, partial1, partial2, list(tangents))
+            output = np.array([np.broadcast_to(tangent[i], tangents.shape[1:]) for i in self.outputs])
+            if seed is not None:
+                output = output[:, 0]
+
+        else:
+            output = np.zeros((self.f_dim, self.x_dim))
+            for i, entry in enumerate(self.outputs):
+                output[i] = reverse_sweep(arg1, arg2, partial1, partial2, entry)[:self.x_dim]
+            if seed is not None:
+                output = output @ np.asarray(seed)
+
+        f = np.array([value[i] for i in self.outputs])
+        if self.f_dim == 1:
+            f = f[0]  # flatten output
+        if self.x_dim == 1 and self.f_dim == 1:
+            output = output.flatten()[0]  # flatten output
+        return f, output
+
+    def optimize(self):
+        """
+        Simplifies the graph by constant folding, identity and strength-reduction rewrites
+        (x + 0, x * 1, exp(log(x)), x ** 2 -> x * x, ...) and dead entry elimination, so
+        replays and reverse sweeps visit fewer entries. See optimize.simplify.
+
+        :return: optimized compiled graph
+        """
+        ops, arg1, arg2, const, outputs = simplify(*self._entries(), self.outputs, self.x_dim)
+        return CompiledGraph(np.array([OPCODES[op] for op in ops], dtype=np.int16), np.array(arg1, dtype=np.int32),
+                             np.array(arg2, dtype=np.int32), np.array(const, dtype=np.float64), outputs, self.x_dim)
+
+    def sparsity(self):
+        """
+        Finds the structural sparsity pattern of the Jacobian, propagating the set of inputs
+        each entry depends on through the graph. Computed once per graph.
+
+        :return: row and column indices of the structurally nonzero Jacobian entries
+        """
+        if self._pattern is None:
+            _, arg1, arg2, _ = self._entries()
+            dependencies = [{i} for i in range(self.x_dim)] + [set()] * (len(arg1) - self.x_dim)
+            for i in range(self.x_dim, len(arg1)):
+                j, k = arg1[i], arg2[i]
+                if j >= 0:
+                    dependencies[i] = dependencies[j] | dependencies[k] if k >= 0 else dependencies[j]
+            rows, cols = [], []
+            for row, output in enumerate(self.outputs):
+                for col in sorted(dependencies[output]):
+                    rows.append(row)
+                    cols.append(col)
+            self._pattern = (np.array(rows, dtype=int), np.array(cols, dtype=int))
+        return self._pattern
+
+    def coloring(self, method="forward"):
+        """
+        Greedily colors the Jacobian columns (forward mode) or rows (backward mode) such that
+        columns (rows) of the same color share no nonzero row (column), i.e. are structurally
+        orthogonal and can be computed in a single pass. Computed once per graph and method.
+
+        :return: color of each column (row), number of colors
+        """
+        if method not in ("forward", "backward"):
+            raise TypeError("Method supported is either 'forward' or 'backward'")
+        if method not in self._colorings:
+            rows, cols = self.sparsity()
+            if method == "backward":
+                rows, cols = cols, rows
+            n = self.x_dim if method == "forward" else self.f_dim
+
+            # lines (rows for column coloring) each colored item has a nonzero in
+            lines = [[] for _ in range(n)]
+            members = {}
+            for line, item in zip(rows.tolist(), cols.tolist()):
+                lines[item].append(line)
+                members.setdefault(line, []).append(item)
+
+            color = [-1] * n
+            for item in range(n):
+                forbidden = {color[other] for line in lines[item] for other in members[line]}
+                c = 0
+                while c in forbidden:
+                    c += 1
+                color[item] = c
+            self._colorings[method] = (np.array(color, dtype=int), max(color, default=-1) + 1)
+        return self._colorings[method]
+
+    def sparse_jacobian(self, x, method="forward"):
+        """
+        Computes the Jacobian at x as a sparse matrix. Structurally orthogonal columns (forward
+        mode) or rows (backward mode) are seeded together, so the number of passes is the
+        number of colors instead of x_dim (f_dim). Requires scipy, installed by the
+        sparse extra (pip install autodiff-NARS[sparse]).
+
+        :return: Jacobian as a scipy.sparse CSC (forward mode) or CSR (backward mode) matrix
+        """
+        from scipy import sparse
+
+        input_vector = self._input_vector(x)
+        rows, cols = self.sparsity()
+        color, n_colors = self.coloring(method)
+        value, partial1, partial2 = self._replay(input_vector)
+        _, arg1, arg2, _ = self._entries()
+        n = len(value)
+
+        if method == "forward":
+            # one tangent per color, each input seeding the tangent of its color
+            seed = np.zeros((self.x_dim, n_colors))
+            seed[np.arange(self.x_dim), color] = 1.0
+            tangent = forward_sweep(arg1, arg2, partial1, partial2, list(seed))
+            compressed = np.array([np.broadcast_to(tangent[i], (n_colors,)) for i in self.outputs])
+            data = compressed[rows, color[cols]] if len(rows) else np.zeros(0)
+            return sparse.csc_matrix((data, (rows, cols)), shape=(self.f_dim, self.x_dim))
+
+        # one reverse sweep per color, seeding the adjoints of all outputs of that color
+        compressed = np.zeros((n_colors, self.x_dim))
+        for c in range(n_colors):
+            adjoint = [0.0] * n
+            for output, output_color in zip(self.outputs, color.tolist()):
+                if output_color == c:
+                    adjoint[output] += 1.0
+            compressed[c] = reverse_sweep(arg1, arg2, partial1, partial2, n - 1, adjoint)[:self.x_dim]
+        data = compressed[color[rows], cols] if len(rows) else np.zeros(0)
+        return sparse.csr_matrix((data, (rows, cols)), shape=(self.f_dim, self.x_dim))
+
+    def codegen(self):
+        """
+        Generates straight-line NumPy source evaluating the values and the Jacobian of the
+        graph, for a single input point or a batch of points. Generated once per graph.
+
+        :return: generated kernel
+        """
+        if self._kernel is None:
+            self._kernel = GeneratedKernel(self)
+        return self._kernel
+
+    def __call__(self, x, method='forward', seed=None):
+        """
+        Computes the function value and its derivative at x
+
+        :return:
+        f:
+            Function value at x
+        df:
+            Derivative value at x
+        """
+        return self.value_and_jacobian(x, method=method, seed=seed)
+
+
+def graph_key(functions, x_dim):
+    """
+    Key of the graph compiled from functions for inputs of dimension x_dim, hashing the
+    bytecode, constants, defaults and closure values of each function, the numbers, strings
+    and arrays among the globals it reads, and the functions of its own module it calls.
+    Other functions and objects are identified by name, so changes to their state are not
+    detected.
+
+    :return: hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256(f"{GRAPH_FORMAT}:{x_dim}".encode())
+    memo = {}
+    for function in functions:
+        _fingerprint(function, digest, memo)
+    return digest.hexdigest()
+
+
+def _fingerprint(value, digest, memo, module=None):
+    """
+    Feeds digest with the bytes identifying value, functions being followed into their code,
+    closures and the globals they read; module is the module of the function reading value
+    as a global, None for constants and closure values. memo holds the functions already
+    visited and the digest and global names of each code object, shared by closures.
+
+    :return: None
+    """
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        digest.update(f"{type(value).__name__} {value!r};".encode())
+    elif isinstance(value, types.FunctionType):
+        if module is not None and value.__module__ != module:
+            digest.update(f"function {value.__module__}.{value.__qualname__};".encode())
+            return
+        if id(value) in memo:
+            digest.update(f"seen {value.__qualname__};".encode())
+            return
+        memo[id(value)] = value
+        code_digest, names = _code_fingerprint(value.__code__, memo)
+        digest.update(code_digest)
+        _fingerprint(value.__defaults__, digest, memo)
+        _fingerprint(value.__kwdefaults__, digest, memo)
+        for cell in value.__closure__ or ():
+            try:
+                _fingerprint(cell.cell_contents, digest, memo)
+            except ValueError:  # empty cell
+                digest.update(b"empty;")
+        for name in names:
+            if name in value.__globals__:
+                digest.update(f"global {name};".encode())
+                _fingerprint(value.__globals__[name], digest, memo, value.__module__)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__} {len(value)};".encode())
+        for item in value:
+            _fingerprint(item, digest, memo, module)
+    elif isinstance(value, np.ndarray):
+        digest.update(f"array {value.dtype} {value.shape};".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(f"dict {len(value)};".encode())
+        for key, item in value.items():
+            _fingerprint(key, digest, memo, module)
+            _fingerprint(item, digest, memo, module)
+    elif isinstance(value, functools.partial):
+        digest.update(b"partial;")
+        _fingerprint((value.func, value.args, value.keywords), digest, memo)
+    elif isinstance(value, types.ModuleType):
+        digest.update(f"module {value.__name__};".encode())
+    else:
+        # classes, builtins and other objects by name, as their repr may hold their address
+        name = getattr(value, '__qualname__', getattr(value, '__name__', type(value).__qualname__))
+        digest.update(f"object {getattr(value, '__module__', '')}.{name};".encode())
+
+
+def _code_fingerprint(code, memo):
+    """
+    Digest of the bytecode, names and constants of code and the code objects nested in it,
+    with the sorted names they read, some of which are globals
+
+    :return: digest, names
+    """
+    if id(code) not in memo:
+        digest = hashlib.sha256(code.co_code)
+        digest.update(repr(code.co_names).encode())
+        names = set(code.co_names)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                const_digest, const_names = _code_fingerprint(const, memo)
+                digest.update(const_digest)
+                names.update(const_names)
+            else:
+                _fingerprint(const, digest, memo)
+        memo[id(code)] = (code, digest.digest(), sorted(names))
+    return memo[id(code)][1:]
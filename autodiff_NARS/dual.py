@@ -0,0 +1,133 @@
+import numpy as np
+
+
+# rule(a) -> (value, derivative) of the NumPy functions applied to node values in functions.py
+_UFUNC_RULES = {
+    np.sin: lambda a: (np.sin(a), np.cos(a)),
+    np.cos: lambda a: (np.cos(a), -np.sin(a)),
+    np.tan: lambda a: (np.tan(a), 1 / np.cos(a) ** 2),
+    np.arcsin: lambda a: (np.arcsin(a), 1 / np.sqrt(1 - a ** 2)),
+    np.arccos: lambda a: (np.arccos(a), -1 / np.sqrt(1 - a ** 2)),
+    np.arctan: lambda a: (np.arctan(a), 1 / (1 + a ** 2)),
+    np.sinh: lambda a: (np.sinh(a), np.cosh(a)),
+    np.cosh: lambda a: (np.cosh(a), np.sinh(a)),
+    np.tanh: lambda a: (np.tanh(a), 1 / np.cosh(a) ** 2),
+    np.sqrt: lambda a: (np.sqrt(a), 0.5 / np.sqrt(a)),
+    np.exp: lambda a: (np.exp(a), np.exp(a)),
+    np.log: lambda a: (np.log(a), 1 / a),
+}
+
+_UFUNC_OPERATORS = {
+    np.add: lambda a, b: a + b,
+    np.subtract: lambda a, b: a - b,
+    np.multiply: lambda a, b: a * b,
+    np.true_divide: lambda a, b: a / b,
+    np.power: lambda a, b: a ** b,
+    np.negative: lambda a: -a,
+}
+
+
+class Dual:
+    """
+    Dual number, a value carrying the derivative (tangent) in one or more directions
+
+    ...
+
+    Forward mode evaluates the functions on duals directly, without recording a graph.
+    Duals can also be used as Node values: evaluating the Node graph and its reverse
+    sweep on duals computes the derivative of the adjoints in the tangent directions
+    (forward-over-reverse), i.e. Hessian-vector products.
+
+    Attributes
+    ----------
+    value: int, float
+    tangent: int, float, np.ndarray
+    """
+
+    __slots__ = ('value', 'tangent')
+
+    def __init__(self, value, tangent):
+        """
+        Create a new dual number
+        """
+        self.value = value
+        self.tangent = tangent
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        Applies the NumPy functions used on Node values to duals
+        """
+        if method != '__call__' or kwargs:
+            return NotImplemented
+        if ufunc in _UFUNC_RULES:
+            value, derivative = _UFUNC_RULES[ufunc](self.value)
+            return Dual(value, derivative * self.tangent)
+        if ufunc in _UFUNC_OPERATORS:
+            if any(isinstance(operand, np.ndarray) for operand in inputs):
+                return NotImplemented
+            operands = [float(operand) if isinstance(operand, np.generic) else operand for operand in inputs]
+            return _UFUNC_OPERATORS[ufunc](*operands)
+        return NotImplemented
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self.tangent + other.tangent)
+        elif isinstance(other, (float, int)):
+            return Dual(self.value + other, self.tangent)
+        return NotImplemented
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, self.tangent - other.tangent)
+        elif isinstance(other, (float, int)):
+            return Dual(self.value - other, self.tangent)
+        return NotImplemented
+
+    def __rsub__(self, other):
+        if isinstance(other, (float, int)):
+            return Dual(other - self.value, -self.tangent)
+        return NotImplemented
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, self.tangent * other.value + self.value * other.tangent)
+        elif isinstance(other, (float, int)):
+            return Dual(self.value * other, self.tangent * other)
+        return NotImplemented
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value / other.value,
+                        (self.tangent * other.value - self.value * other.tangent) / (other.value * other.value))
+        elif isinstance(other, (float, int)):
+            return Dual(self.value / other, self.tangent / other)
+        return NotImplemented
+
+    def __rtruediv__(self, other):
+        if isinstance(other, (float, int)):
+            return Dual(other / self.value, -other * self.tangent / (self.value * self.value))
+        return NotImplemented
+
+    def __pow__(self, other):
+        if isinstance(other, Dual):
+            value = self.value ** other.value
+            return Dual(value, other.value * self.value ** (other.value - 1) * self.tangent +
+                        np.log(self.value) * value * other.tangent)
+        elif isinstance(other, (float, int)):
+            return Dual(self.value ** other, other * self.value ** (other - 1) * self.tangent)
+        return NotImplemented
+
+    def __rpow__(self, other):
+        if isinstance(other, (float, int)):
+            value = other ** self.value
+            return Dual(value, np.log(other) * value * self.tangent)
+        return NotImplemented
+
+    def __neg__(self):
+        return Dual(-self.value, -self.tangent)
@@ -1,366 +1,247 @@
 import numpy as np
-from .autodiff import Node
+from .primitives import primitive
 
 
+@primitive
 def sin(var):
     """
         Sine operator returns the sine of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object which to apply the sine function
 
         Returns
         -------
-        new_node: Node, int, float
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the sine function  
         """
-
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = np.cos(var.value) * var.for_deriv
-        back_deriv = {var.name: np.cos(var.value)}
-        new_node = Node(new_name, np.sin(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.sin(var)
-    else:
-        raise TypeError
+    return np.sin(var), np.cos(var)
 
 
+@primitive
 def cos(var):
     """
         Cosine operator returns the cosine of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object which to apply the cosine function
 
         Returns
         -------
-        new_node: Node, int, float
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the cosine function
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = -np.sin(var.value) * var.for_deriv
-        back_deriv = {var.name: -np.sin(var.value)}
-        new_node = Node(new_name, np.cos(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.cos(var)
-    else:
-        raise TypeError
+    return np.cos(var), -np.sin(var)
 
 
+@primitive
 def tan(var):
     """
         Tangent operator returns the tangent of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object which to apply the tangent function
 
         Returns
         -------
-        new_node: Node, float, int
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the tangent function
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = (1 / np.cos(var.value) ** 2) * var.for_deriv
-        back_deriv = {var.name: 1 / np.cos(var.value) ** 2}
-        new_node = Node(new_name, np.tan(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.tan(var)
-    else:
-        raise TypeError
+    return np.tan(var), 1 / np.cos(var) ** 2
 
 
+@primitive
 def arcsin(var):
     """
         Arcsin operator returns the arcsin of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object which to apply the arcsin function
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the arcsin function
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = (1 / np.sqrt(1 - (var.value) ** 2)) * var.for_deriv
-        back_deriv = {var.name: 1 / np.sqrt(1 - (var.value) ** 2)}
-        new_node = Node(new_name, np.arcsin(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.arcsin(var)
-    else:
-        raise TypeError
+    return np.arcsin(var), 1 / np.sqrt(1 - var ** 2)
 
 
+@primitive
 def arccos(var):
     """
         Arccos operator returns the arcos of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the arcos function
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the arcos function   
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = (-1 / np.sqrt(1 - (var.value) ** 2)) * var.for_deriv
-        back_deriv = {var.name: -1 / np.sqrt(1 - (var.value) ** 2)}
-        new_node = Node(new_name, np.arccos(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.arccos(var)
-    else:
-        raise TypeError
+    return np.arccos(var), -1 / np.sqrt(1 - var ** 2)
 
 
+@primitive
 def arctan(var):
     """
         Arctan operator returns the arctan of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the arctan function
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the arctan function 
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = (1 / (1 + (var.value) ** 2)) * var.for_deriv
-        back_deriv = {var.name: 1 / (1 + (var.value) ** 2)}
-        new_node = Node(new_name, np.arctan(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.arctan(var)
-    else:
-        raise TypeError
+    return np.arctan(var), 1 / (1 + var ** 2)
 
 
+@primitive
 def sinh(var):
     """
         Sinh operator returns the sinh of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the sinh function
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the sinh function      
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = np.cosh(var.value) * var.for_deriv
-        back_deriv = {var.name: np.cosh(var.value)}
-        new_node = Node(new_name, np.sinh(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.sinh(var)
-    else:
-        raise TypeError
+    return np.sinh(var), np.cosh(var)
 
 
+@primitive
 def cosh(var):
     """
         Cosh operator returns the cosh of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the cosh function
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the cosh function      
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = np.sinh(var.value) * var.for_deriv
-        back_deriv = {var.name: np.sinh(var.value)}
-        new_node = Node(new_name, np.cosh(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.cosh(var)
-    else:
-        raise TypeError
+    return np.cosh(var), np.sinh(var)
 
 
+@primitive
 def tanh(var):
     """
         Tanh operator returns the tanh of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the tanh function
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the tanh function      
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = ((1 / np.cosh(var.value)) ** 2) * var.for_deriv
-        back_deriv = {var.name: ((1 / np.cosh(var.value)) ** 2)}
-        new_node = Node(new_name, np.tanh(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.tanh(var)
-    else:
-        raise TypeError
+    return np.tanh(var), (1 / np.cosh(var)) ** 2
 
 
+@primitive
 def sqrt(var):
     """
         Square Root operator returns the square root of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the square root function
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the square root function      
         """
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = ((1 / 2) * var.value ** (-1 / 2)) * var.for_deriv
-        back_deriv = {var.name: ((1 / 2) * var.value ** (-1 / 2))}
-        new_node = Node(new_name, np.sqrt(var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.sqrt(var)
-    else:
-        raise TypeError
+    return np.sqrt(var), (1 / 2) * var ** (-1 / 2)
 
 
+@primitive
 def exp(var, base=np.e):
     """
         Exponential operator returns the exponential of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the exponential function
         base: positive float, int
             The base of the exponential, default is set to e
 
         Returns
         -------
-        new_node: Node
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the exponential function
         """
-
     if base <= 0:
         raise TypeError
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = (np.log(base) * (base ** var.value)) * var.for_deriv
-        back_deriv = {var.name: (np.log(base) * (base ** var.value))}
-        new_node = Node(new_name, base ** (var.value), for_deriv=for_deriv, back_deriv=back_deriv, parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return base ** var
-    else:
-        raise TypeError
+    value = base ** var
+    return value, np.log(base) * value
 
 
+@primitive
 def log(var, base=np.e):
     """
         Logarithm operator returns the logarithm of var object.
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the logarithm function
         base: positive float, int
             The base of the logarithm, default is set to e
 
         Returns
         -------
-        new_node: Node, float, int
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the logarithm
         """
     if base <= 0:
         raise TypeError
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = (1 / (np.log(base) * var.value)) * var.for_deriv
-        back_deriv = {var.name: (1 / (np.log(base) * var.value))}
-        new_node = Node(new_name, np.log(var.value) / np.log(base), for_deriv=for_deriv, back_deriv=back_deriv,
-                        parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return np.log(var) / np.log(base)
-    else:
-        raise TypeError
+    log_base = np.log(base)
+    return np.log(var) / log_base, 1 / (log_base * var)
 
 
+@primitive
 def sigmoid(var):
     """
         Sigmoid operator returns the sigmoid (i.e 1/(1 + e^{-var})) of var object 
 
         Parameters
         ----------
-        var: Node, float, int
+        var: Node, TapeVar, TensorNode, float, int, np.ndarray
             Object to which to apply the sigmoid function
 
         Returns
         -------
-        new_node: Node, float, int
+        new_node: Node, TapeVar, TensorNode, float, int, np.ndarray
             New node resulting from the applying the sigmoid function   
         """
-
-    if isinstance(var, Node):
-        new_name = var._new_name()
-        for_deriv = ((np.exp(-var.value)) / ((np.exp(-var.value) + 1) ** 2)) * var.for_deriv
-        back_deriv = {var.name: ((np.exp(-var.value)) / ((np.exp(-var.value) + 1) ** 2))}
-        new_node = Node(new_name, 1 / (1 + np.exp(-var.value)), for_deriv=for_deriv, back_deriv=back_deriv,
-                        parents=[var])
-        var.child.append(new_node)
-        return new_node
-    elif isinstance(var, (int, float)):
-        return 1 / (1 + np.exp(-var))
-    else:
-        raise TypeError
+    exp_neg = np.exp(-var)
+    return 1 / (1 + exp_neg), exp_neg / ((exp_neg + 1) ** 2)
@@ -0,0 +1,114 @@
+import numpy as np
+from .tape import BINARY_RULES, UNARY_RULES
+
+
+# binary operation with a constant second operand, first operand -> unary operation
+CONST_OPERAND = {
+    'add': ('add_const', 'add_const'),
+    'sub': ('sub_const', 'rsub_const'),
+    'mul': ('mul_const', 'mul_const'),
+    'div': ('div_const', 'rdiv_const'),
+    'pow': ('pow_const', 'rpow_const'),
+}
+
+# unary operations returning their operand for the given constant
+IDENTITY = {'add_const': 0.0, 'sub_const': 0.0, 'mul_const': 1.0, 'div_const': 1.0, 'pow_const': 1.0}
+
+# pairs of operations inverse of each other for equal constants
+INVERSE = {('exp', 'log'), ('log', 'exp'), ('neg', 'neg')}
+
+
+def simplify(ops, arg1, arg2, const, outputs, x_dim):
+    """
+    Simplifies a recorded graph, given as lists of operation names, operand entry indices
+    and constants, in three steps:
+
+    - constant folding: operations on constants only become constants, binary operations
+      with one constant operand become unary operations on the other operand
+    - algebraic rewrites: identities (x + 0, x * 1, x ** 1, exp(log(x)), -(-x)) are
+      replaced by their operand, x * 0 and x ** 0 by constants, x + x by 2 * x, x ** 2 by
+      x * x, x ** 0.5 by sqrt(x) and x ** -1 by 1 / x
+    - dead entry elimination: entries no output depends on are dropped, inputs are kept
+
+    :return: operations, operand indices, constants and output indices of the simplified graph
+    """
+    new_ops, new_arg1, new_arg2, new_const = [], [], [], []
+
+    def emit(op, a=-1, b=-1, c=0.0):
+        new_ops.append(op)
+        new_arg1.append(a)
+        new_arg2.append(b)
+        new_const.append(c)
+        return len(new_ops) - 1
+
+    def unary(op, a, c):
+        """Index of the entry computing op on entry a and constant c, after rewriting"""
+        if new_ops[a] == 'const':
+            return emit('const', c=_fold(UNARY_RULES[op], new_const[a], c))
+        if IDENTITY.get(op) == c:
+            return a
+        if (op, new_ops[a]) in INVERSE and new_const[a] == c:
+            return new_arg1[a]
+        if op == 'mul_const' and c == 0:
+            return emit('const', c=0.0)
+        if op == 'pow_const' and c == 0:
+            return emit('const', c=1.0)
+        if op == 'pow_const' and c == 2:
+            return emit('mul', a, a)
+        if op == 'pow_const' and c == 0.5:
+            return emit('sqrt', a)
+        if op == 'pow_const' and c == -1:
+            return emit('rdiv_const', a, c=1.0)
+        return emit(op, a, c=c)
+
+    index = []
+    for i, op in enumerate(ops):
+        if op == 'input':
+            index.append(emit('input'))
+        elif op == 'const':
+            index.append(emit('const', c=const[i]))
+        elif op in BINARY_RULES:
+            a, b = index[arg1[i]], index[arg2[i]]
+            if new_ops[a] == 'const' and new_ops[b] == 'const':
+                index.append(emit('const', c=_fold(BINARY_RULES[op], new_const[a], new_const[b])))
+            elif op not in CONST_OPERAND:
+                index.append(emit(op, a, b))  # registered binary primitive
+            elif new_ops[b] == 'const':
+                index.append(unary(CONST_OPERAND[op][0], a, new_const[b]))
+            elif new_ops[a] == 'const':
+                index.append(unary(CONST_OPERAND[op][1], b, new_const[a]))
+            elif op == 'add' and a == b:
+                index.append(emit('mul_const', a, c=2.0))
+            else:
+                index.append(emit(op, a, b))
+        else:
+            index.append(unary(op, index[arg1[i]], const[i]))
+
+    # keep the inputs and the entries the outputs depend on
+    outputs = [index[output] for output in outputs]
+    live = set(range(x_dim)) | set(outputs)
+    for i in range(len(new_ops) - 1, -1, -1):
+        if i in live:
+            for j in (new_arg1[i], new_arg2[i]):
+                if j >= 0:
+                    live.add(j)
+    renumber = {}
+    result = ([], [], [], [])
+    for i in sorted(live):
+        renumber[i] = len(result[0])
+        result[0].append(new_ops[i])
+        result[1].append(renumber[new_arg1[i]] if new_arg1[i] >= 0 else -1)
+        result[2].append(renumber[new_arg2[i]] if new_arg2[i] >= 0 else -1)
+        result[3].append(new_const[i])
+    return result + ([renumber[output] for output in outputs],)
+
+
+def _fold(rule, *args):
+    """
+    Value of a rule applied to constants, computed as the replay computes it: on NumPy
+    floats, a constant subexpression dividing by zero folding to inf or nan
+
+    :return: folded constant
+    """
+    with np.errstate(all='ignore'):
+        return float(rule(*(np.float64(arg) for arg in args))[0])
@@ -0,0 +1,99 @@
+import os
+import pickle
+import warnings
+from multiprocessing import get_context
+import numpy as np
+
+
+# state of a pool worker, set once per worker by _init_worker
+_worker = {}
+
+
+def parallel_df(ad, points, workers=None, method="forward", chunk_size=None):
+    """
+    Computes the Jacobian of ad at every row of points, splitting the points across
+    a pool of worker processes. The AutoDiff instance is pickled once and shipped once
+    per worker; the points and the Jacobians are exchanged through shared memory, each
+    worker calling df_batch on contiguous blocks of points and writing the result in
+    place. If the functions cannot be pickled, shared memory is not available (Python 3.7)
+    or a worker fails, the Jacobians are computed in this process with a warning.
+
+    :return: stacked Jacobians of shape (N, f_dim, x_dim)
+    """
+    points = ad._batch_input(points)
+    n_points, x_dim = points.shape
+    if workers is None:
+        workers = os.cpu_count() or 1
+    assert isinstance(workers, int) and workers > 0, "The number of workers must be a positive integer"
+
+    workers = min(workers, n_points)
+    if workers > 1:
+        try:
+            # imported here, so the package still imports where shared memory is missing
+            from multiprocessing.shared_memory import SharedMemory
+            payload = pickle.dumps(ad)
+        except ImportError as error:
+            warnings.warn(f"Shared memory is not available ({error}), computing the Jacobians in this process",
+                          RuntimeWarning)
+            workers = 1
+        except (pickle.PicklingError, AttributeError, TypeError) as error:
+            warnings.warn(f"Functions cannot be pickled ({error}), computing the Jacobians in this process",
+                          RuntimeWarning)
+            workers = 1
+    # a single worker, or no points at all
+    if workers <= 1:
+        return ad.df_batch(points, method=method, chunk_size=chunk_size)
+
+    output_shape = (n_points, ad.f_dim, x_dim)
+    points_memory = SharedMemory(create=True, size=points.nbytes)
+    output_memory = SharedMemory(create=True, size=8 * int(np.prod(output_shape)))
+    try:
+        np.ndarray(points.shape, dtype=float, buffer=points_memory.buf)[:] = points
+        output = np.ndarray(output_shape, dtype=float, buffer=output_memory.buf)
+
+        # a few blocks per worker balance the load without a task per point
+        block = -(-n_points // (4 * workers))
+        blocks = [(start, min(start + block, n_points)) for start in range(0, n_points, block)]
+        initargs = (payload, points_memory.name, points.shape, output_memory.name, output_shape, method, chunk_size)
+        try:
+            with get_context().Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                pool.map(_compute_block, blocks)
+        except Exception as error:
+            warnings.warn(f"Parallel evaluation failed ({error!r}), computing the Jacobians in this process",
+                          RuntimeWarning)
+            return ad.df_batch(points, method=method, chunk_size=chunk_size)
+        result = output.copy()
+        del output
+        return result
+    finally:
+        for memory in (points_memory, output_memory):
+            memory.close()
+            memory.unlink()
+
+
+def _init_worker(payload, points_name, points_shape, output_name, output_shape, method, chunk_size):
+    """
+    Attaches a pool worker to the shared memory of the points and the Jacobians
+    """
+    from multiprocessing.shared_memory import SharedMemory
+    points_memory = SharedMemory(name=points_name)
+    output_memory = SharedMemory(name=output_name)
+    _worker.update(payload=payload, ad=None, memory=(points_memory, output_memory), method=method,
+                   chunk_size=chunk_size,
+                   points=np.ndarray(points_shape, dtype=float, buffer=points_memory.buf),
+                   output=np.ndarray(output_shape, dtype=float, buffer=output_memory.buf))
+
+
+def _compute_block(bounds):
+    """
+    Computes the Jacobians of a block of points in a pool worker, writing them to shared memory.
+    The AutoDiff instance is unpickled on the first block, so failures reach the parent process.
+
+    :return: number of points computed
+    """
+    if _worker['ad'] is None:
+        _worker['ad'] = pickle.loads(_worker['payload'])
+    start, stop = bounds
+    _worker['output'][start:stop] = _worker['ad'].df_batch(_worker['points'][start:stop], method=_worker['method'],
+                                                           chunk_size=_worker['chunk_size'])
+    return stop - start
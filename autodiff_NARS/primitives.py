@@ -0,0 +1,173 @@
+import functools
+import warnings
+import numpy as np
+from .autodiff import Node, hash_consed
+from .dual import Dual
+from .tape import BINARY_RULES, UNARY_RULES, OPS, OPCODES, TapeVar
+from .tensor import TensorNode
+
+
+# rule of each registered primitive, by name
+PRIMITIVES = {}
+
+# function returned for each registered primitive, by name
+PRIMITIVE_FUNCTIONS = {}
+
+
+def primitive(rule):
+    """
+        Registers a differentiable primitive defined by its rule.
+
+        The rule computes the value and the local partial derivatives of the primitive
+        together, so shared subexpressions are evaluated once. It is written with NumPy
+        operations, and is applied as is to Node values (reverse mode), to dual numbers
+        (forward mode), on single points or batches, to tape variables (compiled graphs,
+        whose generated code calls the rule) and to tensor nodes (elementwise). The
+        primitive is a single node of the graph, however expensive its rule.
+
+        The rule takes one of three signatures, like the recorded operations:
+
+        - rule(a) -> (value, partial)
+        - rule(a, c=default) -> (value, partial), c being a constant parameter
+        - rule(a, b) -> (value, partial wrt a, partial wrt b)
+
+        Parameters
+        ----------
+        rule: function
+            Rule of the primitive, registered under its name, which no other rule may have
+
+        Returns
+        -------
+        function: function
+            Primitive applying to Node, Dual, TapeVar, TensorNode, float, int and np.ndarray
+        """
+    name = rule.__name__
+    assert name not in OPCODES or name in PRIMITIVES, f"'{name}' is already a recorded operation"
+    # registering the same rule again (reloading its module) replaces it, another rule may not
+    assert name not in PRIMITIVES or _qualified_name(PRIMITIVES[name]) == _qualified_name(rule), \
+        f"'{name}' is already the primitive {_qualified_name(PRIMITIVES[name])}"
+    defaults = rule.__defaults__ or ()
+
+    if rule.__code__.co_argcount == 1:
+        UNARY_RULES[name] = lambda a, c: rule(a)
+        function = _unary(name, rule)
+    elif rule.__code__.co_argcount == 2 and len(defaults) == 1:
+        UNARY_RULES[name] = rule
+        function = _unary_with_constant(name, rule, defaults[0])
+    elif rule.__code__.co_argcount == 2 and not defaults:
+        BINARY_RULES[name] = rule
+        function = _binary(name, rule)
+    else:
+        raise TypeError("Rule must take an operand, an operand and a constant with a default, or two operands")
+
+    if name not in OPCODES:
+        OPCODES[name] = len(OPS)
+        OPS.append(name)
+    PRIMITIVES[name] = rule
+    PRIMITIVE_FUNCTIONS[name] = hash_consed(name)(functools.wraps(rule)(function))
+    return PRIMITIVE_FUNCTIONS[name]
+
+
+def _qualified_name(rule):
+    """
+    Module and qualified name of a rule
+    """
+    return f"{rule.__module__}.{rule.__qualname__}"
+
+
+def _value(rule, *args):
+    """
+    Value of a rule applied to numbers and arrays. The partial derivatives are dropped, so
+    they must not fail or warn where the value is defined (the derivative of sqrt at 0):
+    numbers are NumPy floats and floating point errors are ignored while the rule runs,
+    then reported, as np.geterr() asks, for values that are not finite at finite arguments
+    (sqrt(-1), log(0)).
+    """
+    args = [np.float64(arg) if isinstance(arg, (int, float)) else arg for arg in args]
+    errors = np.geterr()
+    with np.errstate(all='ignore'):
+        value = rule(*args)[0]
+    if not np.all(np.isfinite(value)) and all(np.all(np.isfinite(arg)) for arg in args):
+        if np.any(np.isnan(value)):
+            kind, message = 'invalid', f"invalid value encountered in {rule.__name__}"
+        else:
+            kind, message = 'divide', f"divide by zero or overflow encountered in {rule.__name__}"
+        if errors[kind] == 'raise':
+            raise FloatingPointError(message)
+        if errors[kind] != 'ignore':
+            warnings.warn(message, RuntimeWarning, stacklevel=4)
+    return value
+
+
+def _unary(name, rule):
+    """
+    Primitive of one operand
+    """
+    def function(var):
+        if isinstance(var, Node):
+            value, partial = rule(var.value)
+            return Node._make(var._new_name(), value, (var,), partial * var.for_deriv, (partial,))
+        elif isinstance(var, Dual):
+            value, partial = rule(var.value)
+            return Dual(value, partial * var.tangent)
+        elif isinstance(var, (TapeVar, TensorNode)):
+            return var._unary(name)
+        elif isinstance(var, (int, float, np.ndarray)):
+            return _value(rule, var)
+        else:
+            raise TypeError
+    return function
+
+
+def _unary_with_constant(name, rule, default):
+    """
+    Primitive of one operand and a constant parameter
+    """
+    def function(var, c=default):
+        if isinstance(var, Node):
+            value, partial = rule(var.value, c)
+            return Node._make(var._new_name(), value, (var,), partial * var.for_deriv, (partial,))
+        elif isinstance(var, Dual):
+            value, partial = rule(var.value, c)
+            return Dual(value, partial * var.tangent)
+        elif isinstance(var, (TapeVar, TensorNode)):
+            return var._unary(name, c)
+        elif isinstance(var, (int, float, np.ndarray)):
+            return _value(rule, var, c)
+        else:
+            raise TypeError
+    return function
+
+
+def _binary(name, rule):
+    """
+    Primitive of two operands, either of which may be a number
+    """
+    def function(a, b):
+        if isinstance(a, Node) or isinstance(b, Node):
+            value, partial_a, partial_b = rule(a.value if isinstance(a, Node) else a,
+                                               b.value if isinstance(b, Node) else b)
+            operands = [(operand, partial) for operand, partial in ((a, partial_a), (b, partial_b))
+                        if isinstance(operand, Node)]
+            for_deriv = sum(partial * operand.for_deriv for operand, partial in operands)
+            parents = tuple(operand for operand, _ in operands)
+            return Node._make(parents[0]._new_name(), value, parents, for_deriv,
+                              tuple(partial for _, partial in operands))
+        elif isinstance(a, Dual) or isinstance(b, Dual):
+            value, partial_a, partial_b = rule(a.value if isinstance(a, Dual) else a,
+                                               b.value if isinstance(b, Dual) else b)
+            return Dual(value, sum(partial * operand.tangent for operand, partial in ((a, partial_a), (b, partial_b))
+                                   if isinstance(operand, Dual)))
+        elif isinstance(a, TapeVar) or isinstance(b, TapeVar):
+            tape = a.tape if isinstance(a, TapeVar) else b.tape
+            a, b = (var if isinstance(var, TapeVar) else tape.constant(var) for var in (a, b))
+            return a._binary(name, b)
+        elif isinstance(a, TensorNode):
+            return a._binary(name, b if isinstance(b, TensorNode) else np.asarray(b, dtype=float))
+        elif isinstance(b, TensorNode):
+            return b._binary(name, np.asarray(a, dtype=float), reflected=True)
+        elif isinstance(a, (int, float, np.ndarray)) and isinstance(b, (int, float, np.ndarray)):
+            return _value(rule, a, b)
+        else:
+            raise TypeError
+    return function
@@ -0,0 +1,246 @@
+import contextlib
+import functools
+import time
+import tracemalloc
+from .autodiff import AutoDiff, Node
+from .dual import Dual
+from .primitives import PRIMITIVES, PRIMITIVE_FUNCTIONS
+from .tape import TapeVar
+from .tensor import TensorNode
+
+
+# operators timed on each class that defines them
+_OPERATORS = ('__add__', '__radd__', '__sub__', '__rsub__', '__mul__', '__rmul__', '__truediv__', '__rtruediv__',
+              '__pow__', '__rpow__', '__neg__', '__matmul__', '__rmatmul__', '__getitem__', 'dot', 'sum')
+_CLASSES = (Node, Dual, TensorNode, TapeVar)
+
+# AutoDiff methods timed as the phases of a call, by phase name
+_PHASES = {
+    'input_nodes': '_create_input_nodes',
+    'evaluate': '_evaluate',
+    'reverse_sweep': '_propagate_adjoints',
+    'forward': '_forward',
+    'tape_backward': '_tape_backward',
+    'tensor': '_tensor_jacobian',
+}
+
+
+class Profile:
+    """
+    Counters and timings collected by profile
+
+    ...
+
+    Times are cumulative: an operator or phase calling another one includes its time.
+
+    Attributes
+    ----------
+    operators: dict
+        calls and time in seconds of each operator called, e.g. 'Node.__mul__' or 'functions.sin'
+    phases: dict
+        calls and time in seconds of each phase of the AutoDiff calls, e.g. 'evaluate'
+        (building the graph) or 'reverse_sweep'
+    graph: dict
+        nodes, edges, depth and maximal fan-out of the last graph of Node objects built
+    memory: dict, None
+        peak and net bytes allocated within the context, None unless memory is True
+    time: float
+        wall time of the context in seconds
+
+    Methods
+    -------
+    report
+        returns the counters as a table
+    """
+
+    def __init__(self):
+        """
+        Create empty counters
+        """
+        self.operators = {}
+        self.phases = {}
+        self.graph = {}
+        self.memory = None
+        self.time = 0.0
+
+    def report(self, top=20):
+        """
+        Formats the counters as a table, the operators being sorted by decreasing time
+
+        Parameters
+        ----------
+        top: int
+            number of operators shown
+
+        Returns
+        -------
+        report: str
+        """
+        lines = [f"{'phase / operator':<32} {'calls':>10} {'time (ms)':>12} {'per call (us)':>14}"]
+        operators = sorted(self.operators.items(), key=lambda item: -item[1]['time'])[:top]
+        for name, entry in list(self.phases.items()) + operators:
+            lines.append(f"{name:<32} {entry['calls']:>10} {entry['time'] * 1e3:>12.3f} "
+                         f"{entry['time'] / entry['calls'] * 1e6:>14.3f}")
+        if self.graph:
+            lines.append("graph: " + ", ".join(f"{key} {value}" for key, value in self.graph.items()))
+        if self.memory is not None:
+            lines.append(f"memory: peak {self.memory['peak']} bytes, allocated {self.memory['allocated']} bytes")
+        lines.append(f"total: {self.time * 1e3:.3f} ms")
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profile(ad=None, memory=False):
+    """
+        Profiling context, counting the calls and the time of every operator and phase.
+
+        Within the context, the operators of Node, Dual, TensorNode and TapeVar and the
+        registered primitives are replaced by timed wrappers, as are the phases of the
+        calls of ad (creating the input nodes, building the graph, the reverse sweep,
+        forward mode, ...). The statistics of each graph of Node objects built by ad
+        are computed outside the timed phases. Nothing is wrapped outside the context,
+        so profiling costs nothing when it is off.
+
+        The operators are wrapped for the whole process, so operations of other AutoDiff
+        instances and threads are counted too.
+
+        Parameters
+        ----------
+        ad: AutoDiff, None
+            AutoDiff instance whose phases are timed, also holding the counters as ad.stats
+        memory: bool
+            whether to trace the memory allocated, with tracemalloc, which slows every
+            allocation down
+
+        Returns
+        -------
+        stats: Profile
+            Counters, filled in while the context runs
+        """
+    stats = Profile()
+    restore = []
+    try:
+        for cls in _CLASSES:
+            for name in _OPERATORS:
+                if name in vars(cls):
+                    original = vars(cls)[name]
+                    setattr(cls, name, _timed(stats.operators, f"{cls.__name__}.{name}", original))
+                    restore.append(functools.partial(setattr, cls, name, original))
+
+        for name, function in PRIMITIVE_FUNCTIONS.items():
+            # the implementation is swapped inside the returned function, which callers hold directly
+            cell = _implementation_cell(function)
+            original = cell.cell_contents
+            label = f"{PRIMITIVES[name].__module__.rsplit('.', 1)[-1]}.{name}"
+            cell.cell_contents = _timed(stats.operators, label, original)
+            restore.append(functools.partial(setattr, cell, 'cell_contents', original))
+
+        if ad is not None:
+            ad.stats = stats
+            for phase, method in _PHASES.items():
+                restore.append(_restore_attribute(ad, method))
+                setattr(ad, method, _timed(stats.phases, phase, getattr(ad, method)))
+            evaluate = ad._evaluate
+
+            def evaluate_and_measure(input_nodes):
+                output_nodes = evaluate(input_nodes)
+                stats.graph = graph_statistics(output_nodes)
+                return output_nodes
+            ad._evaluate = evaluate_and_measure
+
+        tracing = tracemalloc.is_tracing()
+        if memory:
+            if not tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.time = time.perf_counter() - start
+            if memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stats.memory = {"peak": peak - start_memory, "allocated": current - start_memory}
+                if not tracing:
+                    tracemalloc.stop()
+    finally:
+        for undo in reversed(restore):
+            undo()
+        for counters in (stats.operators, stats.phases):
+            for name in [name for name, entry in counters.items() if not entry['calls']]:
+                del counters[name]
+
+
+def graph_statistics(output_nodes):
+    """
+        Statistics of the graph of Node objects ending in output_nodes.
+
+        Parameters
+        ----------
+        output_nodes: list
+            Output nodes, sharing nodes or not
+
+        Returns
+        -------
+        statistics: dict
+            Numbers of nodes and edges, depth (longest path from an input node) and
+            maximal fan-out (number of edges leaving a node)
+        """
+    depth = {}
+    fan_out = {}
+    n_edges = 0
+    for output_node in output_nodes:
+        if not isinstance(output_node, Node):
+            continue
+        for node in AutoDiff._topological_order(output_node):
+            if id(node) in depth:
+                continue
+            depth[id(node)] = 1 + max((depth[id(parent)] for parent in node.parents), default=-1)
+            n_edges += len(node.parents)
+            for parent in node.parents:
+                fan_out[id(parent)] = fan_out.get(id(parent), 0) + 1
+    return {"nodes": len(depth), "edges": n_edges, "depth": max(depth.values(), default=0),
+            "max_fan_out": max(fan_out.values(), default=0)}
+
+
+def _timed(counters, name, function):
+    """
+    Wraps function to count its calls and accumulate its time in counters[name]
+
+    :return: wrapped function
+    """
+    entry = counters.setdefault(name, {"calls": 0, "time": 0.0})
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            entry["time"] += time.perf_counter() - start
+            entry["calls"] += 1
+    return wrapper
+
+
+def _implementation_cell(function):
+    """
+    Closure cell holding the implementation called by the function of a primitive,
+    the function being the hash consing wrapper returned by primitive
+
+    :return: cell
+    """
+    return function.__closure__[function.__code__.co_freevars.index('function')]
+
+
+def _restore_attribute(ad, method):
+    """
+    Undoes the wrapping of a method of ad, restoring what the instance held before
+
+    :return: function undoing the wrapping
+    """
+    if method in vars(ad):
+        return functools.partial(setattr, ad, method, vars(ad)[method])
+    return functools.partial(delattr, ad, method)
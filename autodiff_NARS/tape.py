@@ -0,0 +1,280 @@
+import numpy as np
+
+
+# rule(a, b) -> (value, partial derivative wrt a, partial derivative wrt b)
+BINARY_RULES = {
+    'add': lambda a, b: (a + b, 1.0, 1.0),
+    'sub': lambda a, b: (a - b, 1.0, -1.0),
+    'mul': lambda a, b: (a * b, b, a),
+    'div': lambda a, b: (a / b, 1 / b, -a / (b * b)),
+    'pow': lambda a, b: (a ** b, b * a ** (b - 1), np.log(a) * a ** b),
+}
+
+# rule(a, c) -> (value, partial derivative wrt a), c being a constant operand. The rules of
+# the elementary functions are registered by the primitives of functions.py
+UNARY_RULES = {
+    'add_const': lambda a, c: (a + c, 1.0),
+    'sub_const': lambda a, c: (a - c, 1.0),
+    'rsub_const': lambda a, c: (c - a, -1.0),
+    'mul_const': lambda a, c: (a * c, c),
+    'div_const': lambda a, c: (a / c, 1 / c),
+    'rdiv_const': lambda a, c: (c / a, -c / (a * a)),
+    'pow_const': lambda a, c: (a ** c, c * a ** (c - 1)),
+    'rpow_const': lambda a, c: (c ** a, np.log(c) * c ** a),
+    'neg': lambda a, c: (-a, -1.0),
+}
+
+OPS = ['input', 'const'] + list(BINARY_RULES) + list(UNARY_RULES)
+OPCODES = {op: code for code, op in enumerate(OPS)}
+
+
+class Tape:
+    """
+    Flat record (Wengert list) of a computation
+
+    ...
+
+    Every recorded operation is one entry of a set of parallel arrays, which
+    grow by doubling when full. Operands are referred to by their entry index,
+    -1 marking an absent operand.
+
+    Attributes
+    ----------
+    size: int
+        number of recorded entries
+    op: np.ndarray
+        opcode of each entry, indexing OPS
+    arg1, arg2: np.ndarray
+        entry indices of the operands
+    const: np.ndarray
+        constant operand of each entry
+    value: np.ndarray
+        value of each entry
+    partial1, partial2: np.ndarray
+        local partial derivatives wrt each operand
+    """
+
+    _fields = (('op', np.int16), ('arg1', np.int32), ('arg2', np.int32), ('const', np.float64),
+               ('value', np.float64), ('partial1', np.float64), ('partial2', np.float64))
+
+    def __init__(self, capacity=1024):
+        """
+        Create an empty tape with room for capacity entries
+        """
+        self.size = 0
+        for field, dtype in self._fields:
+            setattr(self, field, np.empty(capacity, dtype=dtype))
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        """
+        Doubles the capacity of the tape
+        """
+        for field, dtype in self._fields:
+            old = getattr(self, field)
+            new = np.empty(2 * len(old), dtype=dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, field, new)
+
+    def record(self, op, arg1, arg2, const, value, partial1, partial2):
+        """
+        Appends an entry to the tape
+
+        :return: variable referring to the new entry
+        """
+        i = self.size
+        if i == len(self.op):
+            self._grow()
+        self.op[i] = OPCODES[op]
+        self.arg1[i] = arg1
+        self.arg2[i] = arg2
+        self.const[i] = const
+        self.value[i] = value
+        self.partial1[i] = partial1
+        self.partial2[i] = partial2
+        self.size = i + 1
+        return TapeVar(self, i)
+
+    def input(self, value):
+        """
+        Records an independent variable
+
+        :return: variable referring to the new entry
+        """
+        return self.record('input', -1, -1, 0.0, value, 0.0, 0.0)
+
+    def constant(self, value):
+        """
+        Records a constant
+
+        :return: variable referring to the new entry
+        """
+        return self.record('const', -1, -1, value, value, 0.0, 0.0)
+
+    def gradient(self, output):
+        """
+        Computes the adjoints of all entries up to output by a single reverse sweep
+
+        :return: adjoint of every entry, as a list
+        """
+        n = output + 1
+        return reverse_sweep(self.arg1[:n].tolist(), self.arg2[:n].tolist(),
+                             self.partial1[:n].tolist(), self.partial2[:n].tolist(), output)
+
+
+def reverse_sweep(arg1, arg2, partial1, partial2, output, adjoint=None):
+    """
+    Propagates the adjoint of output back to all entries before it. If adjoint is given,
+    it holds the seeded adjoint of every entry, none after output, and is updated in place.
+
+    :return: adjoint of every entry, as a list
+    """
+    if adjoint is None:
+        adjoint = [0.0] * len(arg1)
+        adjoint[output] = 1.0
+    for i in range(output, -1, -1):
+        a = adjoint[i]
+        if a:
+            j = arg1[i]
+            if j >= 0:
+                adjoint[j] += a * partial1[i]
+                k = arg2[i]
+                if k >= 0:
+                    adjoint[k] += a * partial2[i]
+    return adjoint
+
+
+def forward_sweep(arg1, arg2, partial1, partial2, tangents):
+    """
+    Propagates the tangents of the inputs, the first len(tangents) entries, forward to
+    all entries. Tangents are numbers or arrays of several directions.
+
+    :return: tangent of every entry, as a list
+    """
+    x_dim = len(tangents)
+    tangent = list(tangents) + [0.0] * (len(arg1) - x_dim)
+    for i in range(x_dim, len(arg1)):
+        j = arg1[i]
+        if j >= 0:
+            tangent[i] = partial1[i] * tangent[j]
+            k = arg2[i]
+            if k >= 0:
+                tangent[i] = tangent[i] + partial2[i] * tangent[k]
+    return tangent
+
+
+def record_tape(functions, input_vector):
+    """
+    Records the functions evaluated at input_vector on a single tape, all functions sharing the inputs.
+    Outputs not depending on the inputs are recorded as constants.
+
+    :return: tape, list of input variables, list of output variables
+    """
+    tape = Tape()
+    inputs = [tape.input(x_i) for x_i in input_vector]
+    argument = inputs[0] if len(inputs) == 1 else inputs
+    outputs = [f_i(argument) for f_i in functions]
+    outputs = [output if isinstance(output, TapeVar) else tape.constant(output) for output in outputs]
+    return tape, inputs, outputs
+
+
+class TapeVar:
+    """
+    Handle to an entry of a tape, recording the operations applied to it
+
+    ...
+
+    Attributes
+    ----------
+    tape: Tape
+    index: int
+    """
+
+    __slots__ = ('tape', 'index')
+
+    def __init__(self, tape, index):
+        self.tape = tape
+        self.index = index
+
+    @property
+    def value(self):
+        return self.tape.value[self.index]
+
+    def _unary(self, op, const=0.0):
+        """
+        Records a function of this variable and a constant
+
+        :return: variable referring to the new entry
+        """
+        value, partial = UNARY_RULES[op](self.tape.value[self.index], const)
+        return self.tape.record(op, self.index, -1, const, value, partial, 0.0)
+
+    def _binary(self, op, other):
+        """
+        Records a function of this variable and another variable of the same tape
+
+        :return: variable referring to the new entry
+        """
+        value, partial1, partial2 = BINARY_RULES[op](self.tape.value[self.index], other.tape.value[other.index])
+        return self.tape.record(op, self.index, other.index, 0.0, value, partial1, partial2)
+
+    def __add__(self, other):
+        if isinstance(other, TapeVar):
+            return self._binary('add', other)
+        elif isinstance(other, (float, int)):
+            return self._unary('add_const', other)
+        raise TypeError
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        if isinstance(other, TapeVar):
+            return self._binary('sub', other)
+        elif isinstance(other, (float, int)):
+            return self._unary('sub_const', other)
+        raise TypeError
+
+    def __rsub__(self, other):
+        if isinstance(other, (float, int)):
+            return self._unary('rsub_const', other)
+        raise TypeError
+
+    def __mul__(self, other):
+        if isinstance(other, TapeVar):
+            return self._binary('mul', other)
+        elif isinstance(other, (float, int)):
+            return self._unary('mul_const', other)
+        raise TypeError
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        if isinstance(other, TapeVar):
+            return self._binary('div', other)
+        elif isinstance(other, (float, int)):
+            return self._unary('div_const', other)
+        raise TypeError
+
+    def __rtruediv__(self, other):
+        if isinstance(other, (float, int)):
+            return self._unary('rdiv_const', other)
+        raise TypeError
+
+    def __pow__(self, other):
+        if isinstance(other, TapeVar):
+            return self._binary('pow', other)
+        elif isinstance(other, (float, int)):
+            return self._unary('pow_const', other)
+        raise TypeError
+
+    def __rpow__(self, other):
+        if isinstance(other, (float, int)):
+            return self._unary('rpow_const', other)
+        raise TypeError
+
+    def __neg__(self):
+        return self._unary('neg')
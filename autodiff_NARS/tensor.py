@@ -0,0 +1,387 @@
+import numpy as np
+from .optimize import CONST_OPERAND
+from .tape import BINARY_RULES, UNARY_RULES
+
+
+class TensorNode:
+    """
+    Array-valued node, a whole vector or matrix being a single node of the graph
+
+    ...
+
+    Operations act on the whole array with NumPy kernels: elementwise operations
+    broadcast as NumPy does, and matmul (@), dot, sum and indexing have their own
+    forward and reverse rules. Arrays can be combined with tensor nodes on either
+    side of an operator.
+
+    Attributes
+    ----------
+    value: np.ndarray
+    tangent: np.ndarray, None
+        forward mode tangents, of shape (n_tangents,) + value.shape, None in reverse mode
+    parents: tuple
+    vjps: tuple
+        for each parent, function mapping the adjoint of this node to its contribution
+        to the adjoint of the parent
+    adjoint: int, np.ndarray
+
+    Methods
+    -------
+    sum
+        returns the sum of the entries, along an axis or all of them
+    dot
+        returns the dot product with another tensor node or array
+    """
+
+    __slots__ = ('value', 'tangent', 'parents', 'vjps', 'adjoint')
+
+    # NumPy operators defer to the reflected operators of tensor nodes, e.g. array @ node
+    __array_ufunc__ = None
+
+    def __init__(self, value, tangent=None):
+        """
+        Create an input tensor node, carrying the given forward mode tangents
+        """
+        if not isinstance(value, (np.ndarray, list, tuple, float, int)):
+            raise TypeError("Tensor node value must be an array of values")
+        self.value = np.asarray(value, dtype=float)
+
+        if tangent is not None:
+            if not isinstance(tangent, (np.ndarray, list, tuple)):
+                raise TypeError("Forward mode tangents must be an array of shape (n_tangents,) + value shape")
+            tangent = np.asarray(tangent, dtype=float)
+            assert tangent.shape[1:] == self.value.shape, "Provide tangents of shape (n_tangents,) + value shape"
+        self.tangent = tangent
+        self.parents = ()
+        self.vjps = ()
+        self.adjoint = 0
+
+    @classmethod
+    def _make(cls, value, tangent, parents, vjps):
+        """
+        Create a new tensor node resulting from an operation, skipping the validation of __init__
+
+        Returns
+        -------
+        new_node: TensorNode
+        """
+        new_node = object.__new__(cls)
+        new_node.value = value
+        new_node.tangent = tangent
+        new_node.parents = parents
+        new_node.vjps = vjps
+        new_node.adjoint = 0
+        return new_node
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    @property
+    def ndim(self):
+        return self.value.ndim
+
+    def __len__(self):
+        return len(self.value)
+
+    @property
+    def T(self):
+        """
+        Transpose of this node
+
+        Returns
+        -------
+        new_node: TensorNode
+        """
+        tangent = None
+        if self.tangent is not None:
+            tangent = np.transpose(self.tangent, (0,) + tuple(range(self.tangent.ndim - 1, 0, -1)))
+        return TensorNode._make(self.value.T, tangent, (self,), (lambda adjoint: np.transpose(adjoint),))
+
+    def release(self):
+        """
+        Detaches every node of the graph ending in this node from its parents
+
+        Returns
+        -------
+        None
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.parents)
+            node.parents = ()
+            node.vjps = ()
+
+    def _unary(self, op, const=0.0):
+        """
+        Applies an elementwise function of this node and a scalar constant
+
+        Parameters
+        ----------
+        op: str
+            name of the function in UNARY_RULES
+        const: int, float
+            constant operand
+
+        Returns
+        -------
+        new_node: TensorNode
+        """
+        value, partial = UNARY_RULES[op](self.value, const)
+        tangent = None if self.tangent is None else partial * self.tangent
+        return TensorNode._make(np.asarray(value), tangent, (self,), (_elementwise_vjp(partial, self.shape),))
+
+    def _binary(self, op, other, reflected=False):
+        """
+        Applies an elementwise binary operation, broadcasting its operands
+
+        Parameters
+        ----------
+        op: str
+            name of the operation in BINARY_RULES
+        other: TensorNode, np.ndarray, float, int
+            other operand
+        reflected: bool
+            whether other is the first operand
+
+        Returns
+        -------
+        new_node: TensorNode
+        """
+        if isinstance(other, (float, int)) and op in CONST_OPERAND:
+            return self._unary(CONST_OPERAND[op][reflected], other)
+        if isinstance(other, (float, int, list, tuple)):
+            other = np.asarray(other, dtype=float)
+        if not isinstance(other, (TensorNode, np.ndarray)):
+            return NotImplemented
+
+        a, b = (other, self) if reflected else (self, other)
+        value, partial_a, partial_b = BINARY_RULES[op](_value(a), _value(b))
+        value = np.asarray(value)
+
+        tangent = None
+        parents, vjps = [], []
+        for operand, partial in ((a, partial_a), (b, partial_b)):
+            if not isinstance(operand, TensorNode):
+                continue
+            if operand.tangent is not None:
+                term = partial * _lift(operand.tangent, value.ndim)
+                tangent = term if tangent is None else tangent + term
+            parents.append(operand)
+            vjps.append(_elementwise_vjp(partial, operand.shape))
+        if tangent is not None:
+            tangent = np.broadcast_to(tangent, tangent.shape[:1] + value.shape)
+        return TensorNode._make(value, tangent, tuple(parents), tuple(vjps))
+
+    def __add__(self, other):
+        return self._binary('add', other)
+
+    def __radd__(self, other):
+        return self._binary('add', other, reflected=True)
+
+    def __sub__(self, other):
+        return self._binary('sub', other)
+
+    def __rsub__(self, other):
+        return self._binary('sub', other, reflected=True)
+
+    def __mul__(self, other):
+        return self._binary('mul', other)
+
+    def __rmul__(self, other):
+        return self._binary('mul', other, reflected=True)
+
+    def __truediv__(self, other):
+        return self._binary('div', other)
+
+    def __rtruediv__(self, other):
+        return self._binary('div', other, reflected=True)
+
+    def __pow__(self, other):
+        return self._binary('pow', other)
+
+    def __rpow__(self, other):
+        return self._binary('pow', other, reflected=True)
+
+    def __neg__(self):
+        return self._unary('neg')
+
+    def __matmul__(self, other):
+        return _matmul(self, other)
+
+    def __rmatmul__(self, other):
+        return _matmul(other, self)
+
+    def dot(self, other):
+        """
+        Dot product of this node with other, as np.dot for vectors and matrices
+
+        Parameters
+        ----------
+        other: TensorNode, np.ndarray
+
+        Returns
+        -------
+        new_node: TensorNode
+        """
+        new_node = _matmul(self, other)
+        if new_node is NotImplemented:
+            raise TypeError
+        return new_node
+
+    def sum(self, axis=None):
+        """
+        Sum of the entries of this node along axis, or of all entries
+
+        Parameters
+        ----------
+        axis: int, None
+
+        Returns
+        -------
+        new_node: TensorNode
+        """
+        shape = self.shape
+        value = np.asarray(np.sum(self.value, axis=axis))
+        tangent = None
+        if self.tangent is not None:
+            tangent_axis = tuple(range(1, self.tangent.ndim)) if axis is None else axis % self.ndim + 1
+            tangent = np.sum(self.tangent, axis=tangent_axis)
+
+        def vjp(adjoint):
+            return np.broadcast_to(adjoint if axis is None else np.expand_dims(adjoint, axis), shape)
+
+        return TensorNode._make(value, tangent, (self,), (vjp,))
+
+    def __getitem__(self, key):
+        """
+        Entries of this node selected by key, as NumPy indexing. Repeated entries of
+        an integer array index accumulate their adjoints.
+
+        Returns
+        -------
+        new_node: TensorNode
+        """
+        shape = self.shape
+        value = np.asarray(self.value[key])
+        tangent = None
+        if self.tangent is not None:
+            tangent = self.tangent[(slice(None),) + (key if isinstance(key, tuple) else (key,))]
+
+        basic = all(isinstance(k, (int, np.integer, slice)) or k is None or k is Ellipsis
+                    for k in (key if isinstance(key, tuple) else (key,)))
+
+        def vjp(adjoint):
+            parent_adjoint = np.zeros(shape)
+            if basic:
+                parent_adjoint[key] = adjoint
+            else:
+                np.add.at(parent_adjoint, key, adjoint)
+            return parent_adjoint
+
+        return TensorNode._make(value, tangent, (self,), (vjp,))
+
+
+def dot(a, b):
+    """
+        Dot product of a and b, as np.dot for vectors and matrices.
+
+        Parameters
+        ----------
+        a, b: TensorNode, np.ndarray
+            Vectors or matrices to multiply
+
+        Returns
+        -------
+        new_node: TensorNode, np.ndarray
+            New node resulting from the dot product
+        """
+    if isinstance(a, TensorNode):
+        return a.dot(b)
+    elif isinstance(b, TensorNode):
+        new_node = _matmul(a, b)
+        if new_node is NotImplemented:
+            raise TypeError
+        return new_node
+    elif isinstance(a, (np.ndarray, list, tuple)) and isinstance(b, (np.ndarray, list, tuple)):
+        return np.dot(a, b)
+    else:
+        raise TypeError
+
+
+def _value(operand):
+    """
+    Value of a tensor node or array operand
+    """
+    return operand.value if isinstance(operand, TensorNode) else operand
+
+
+def _lift(tangent, ndim):
+    """
+    Inserts axes after the tangent axis, so tangents broadcast against values of ndim dimensions
+    """
+    missing = ndim - (tangent.ndim - 1)
+    if missing <= 0:
+        return tangent
+    return tangent.reshape(tangent.shape[:1] + (1,) * missing + tangent.shape[1:])
+
+
+def _unbroadcast(adjoint, shape):
+    """
+    Sums an adjoint over the axes an operand of the given shape was broadcast along
+    """
+    if adjoint.shape == shape:
+        return adjoint
+    adjoint = adjoint.sum(axis=tuple(range(adjoint.ndim - len(shape))))
+    axes = tuple(i for i, n in enumerate(shape) if n == 1 and adjoint.shape[i] != 1)
+    if axes:
+        adjoint = adjoint.sum(axis=axes, keepdims=True)
+    return np.broadcast_to(adjoint, shape)
+
+
+def _elementwise_vjp(partial, shape):
+    """
+    Reverse rule of an elementwise operation on an operand of the given shape
+    """
+    return lambda adjoint: _unbroadcast(np.asarray(adjoint * partial), shape)
+
+
+def _matmul(a, b):
+    """
+    Matrix product of two tensor nodes or arrays of at most two dimensions, vectors being
+    treated as a row (first operand) or a column (second operand), as np.matmul does
+
+    :return: TensorNode
+    """
+    if isinstance(a, (list, tuple)):
+        a = np.asarray(a, dtype=float)
+    if isinstance(b, (list, tuple)):
+        b = np.asarray(b, dtype=float)
+    if not isinstance(a, (TensorNode, np.ndarray)) or not isinstance(b, (TensorNode, np.ndarray)):
+        return NotImplemented
+    value_a, value_b = _value(a), _value(b)
+    assert value_a.ndim in (1, 2) and value_b.ndim in (1, 2), "Matrix product operands must be vectors or matrices"
+    value = np.asarray(value_a @ value_b)
+
+    # vectors as matrices, so every case follows the rules of the matrix product
+    matrix_a = value_a if value_a.ndim == 2 else value_a[None, :]
+    matrix_b = value_b if value_b.ndim == 2 else value_b[:, None]
+    matrix_shape = (matrix_a.shape[0], matrix_b.shape[1])
+
+    tangent = None
+    parents, vjps = [], []
+    if isinstance(a, TensorNode):
+        if a.tangent is not None:
+            tangent = a.tangent.reshape(a.tangent.shape[:1] + matrix_a.shape) @ matrix_b
+        parents.append(a)
+        vjps.append(lambda adjoint: (np.reshape(adjoint, matrix_shape) @ matrix_b.T).reshape(value_a.shape))
+    if isinstance(b, TensorNode):
+        if b.tangent is not None:
+            term = matrix_a @ b.tangent.reshape(b.tangent.shape[:1] + matrix_b.shape)
+            tangent = term if tangent is None else tangent + term
+        parents.append(b)
+        vjps.append(lambda adjoint: (matrix_a.T @ np.reshape(adjoint, matrix_shape)).reshape(value_b.shape))
+    if tangent is not None:
+        tangent = tangent.reshape(tangent.shape[:1] + value.shape)
+    return TensorNode._make(value, tangent, tuple(parents), tuple(vjps))
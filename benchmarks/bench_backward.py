@@ -0,0 +1,50 @@
+"""
+Benchmark of the reverse mode sweep on chained and diamond shaped graphs.
+
+Both graphs grow linearly in the number of nodes with their depth, so the time of
+one backward pass should grow linearly with the depth as well.
+
+Usage: python bench_backward.py
+"""
+import sys
+import time
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.functions import sin, cos
+
+
+def chain(depth):
+    """Chain of `depth` operations, each depending only on the previous one"""
+    def f(x):
+        for _ in range(depth):
+            x = sin(x) + 1
+        return x
+    return f
+
+
+def diamond(depth):
+    """Stack of `depth` diamonds, each node feeding both branches of the next diamond"""
+    def f(x):
+        for _ in range(depth):
+            x = sin(x) * cos(x)
+        return x
+    return f
+
+
+def time_backward(f, repeat=3):
+    """Best wall time of a backward pass of f at x=0.5"""
+    ad = AutoDiff(f)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ad.df(0.5, method="backward")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    print(f"{'depth':>8} {'chain [ms]':>12} {'diamond [ms]':>14} {'diamond/depth [us]':>20}")
+    for depth in [1000, 2000, 4000, 8000, 16000]:
+        t_chain = time_backward(chain(depth))
+        t_diamond = time_backward(diamond(depth))
+        print(f"{depth:>8} {t_chain * 1e3:>12.2f} {t_diamond * 1e3:>14.2f} {t_diamond / depth * 1e6:>20.2f}")
@@ -0,0 +1,52 @@
+"""
+Peak-memory regression benchmark of repeated derivative calls.
+
+Runs N_CALLS calls of df on a graph of about 12000 nodes with the cyclic garbage
+collector disabled, so graphs are only freed by reference counting. Reports the
+peak memory of a single call, the peak over all calls and the memory still held
+after the calls. Exits with status 1 if the peak over all calls exceeds twice the
+peak of a single call, i.e. if graphs outlive the call that built them.
+
+Usage: python bench_memory.py
+"""
+import gc
+import sys
+import tracemalloc
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.functions import sin
+
+N_CALLS = 20
+N_STEPS = 3000
+
+
+def f(x):
+    """Function whose graph has 4 nodes per step"""
+    z = x[0]
+    for _ in range(N_STEPS):
+        z = sin(z * x[1] + 1) - x[0]
+    return z
+
+
+def peak_memory(ad, method, n_calls):
+    """Peak and retained memory in KiB of n_calls calls of df"""
+    tracemalloc.start()
+    for _ in range(n_calls):
+        ad.df([0.5, 1.5], method=method)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024, current / 1024
+
+
+if __name__ == "__main__":
+    gc.disable()
+    ad = AutoDiff(f)
+    regression = False
+    for method in ["forward", "backward"]:
+        single = peak_memory(ad, method, 1)[0]
+        peak, retained = peak_memory(ad, method, N_CALLS)
+        print(f"{method}: peak of 1 call {single:.0f} KiB, peak of {N_CALLS} calls {peak:.0f} KiB, "
+              f"retained {retained:.0f} KiB")
+        regression = regression or peak > 2 * single
+    gc.enable()
+    sys.exit(1 if regression else 0)
@@ -0,0 +1,39 @@
+"""
+Benchmark of Node creation on a graph of one million nodes.
+
+Reports the memory allocated per node and the number of Node operations per second.
+
+Usage: python bench_node.py
+"""
+import sys
+import time
+import tracemalloc
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import Node
+from autodiff_NARS.functions import sin
+
+N_NODES = 1000000
+
+
+def build_graph():
+    """Graph of N_NODES nodes mixing binary, constant and unary operations"""
+    x = Node(0, 0.5)
+    y = Node(1, 1.5)
+    z = x
+    for _ in range(N_NODES // 4):
+        z = sin(z * y + 1) - x
+    return z
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    build_graph()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    graph = build_graph()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"bytes/node: {memory / N_NODES:.0f}")
+    print(f"ops/second: {N_NODES / elapsed:.0f}")
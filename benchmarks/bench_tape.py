@@ -0,0 +1,48 @@
+"""
+Benchmark of backward mode recording a graph of Node objects against recording a flat tape.
+
+Reports the memory allocated per recorded operation and the time of a backward pass.
+
+Usage: python bench_tape.py
+"""
+import sys
+import time
+import tracemalloc
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.functions import sin, cos
+
+N_OPS = 100000
+
+
+def f(x):
+    """Function of two inputs made of N_OPS elementary operations"""
+    y = x[0]
+    for _ in range(N_OPS // 4):
+        y = sin(y) * cos(x[1]) + 1
+    return y
+
+
+def peak_memory(ad):
+    """Peak memory allocated during a backward pass"""
+    tracemalloc.start()
+    ad.df([0.3, 0.7], method="backward")
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def best_time(ad, repeat=3):
+    """Best wall time of a backward pass"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ad.df([0.3, 0.7], method="backward")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    print(f"{'recording':>10} {'bytes/op':>10} {'backward [ms]':>15}")
+    for name, ad in [("nodes", AutoDiff(f)), ("tape", AutoDiff(f, tape=True))]:
+        print(f"{name:>10} {peak_memory(ad) / N_OPS:>10.0f} {best_time(ad) * 1e3:>15.1f}")
@@ -0,0 +1,27 @@
+import sys
+sys.path.insert(1, '../')
+from autodiff_NARS.functions import sin, cos, tan, arcsin, arccos, arctan, sinh, cosh, tanh, sqrt, exp, log, sigmoid
+
+
+# functions of three inputs using every elementary operation and function, and a constant function
+def f1(x):
+    return (sin(x[0]) * cos(x[1]) + tan(x[2]) - arctan(x[0] / x[1]) + sqrt(x[1]) ** 3
+            + 2 ** x[0] - 1 / x[2] + x[0] ** x[1] - 4 - x[2])
+
+
+def f2(x):
+    return (arcsin(x[0] / 2) + arccos(x[2] / 2) + sinh(x[0]) * cosh(x[1]) - tanh(-x[2])
+            + exp(x[0], 3) * log(x[1], 2) + sigmoid(x[2]) + 5 - x[0] * 2)
+
+
+def f3(x):
+    return 7.0
+
+
+# small functions of two inputs
+def g1(x):
+    return sin(x[0]) * exp(x[1]) + x[0] * x[1]
+
+
+def g2(x):
+    return x[0] ** 2 - x[1]
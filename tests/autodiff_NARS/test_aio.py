@@ -0,0 +1,78 @@
+import sys
+import asyncio
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.aio import GradientBatcher, batcher
+from autodiff_NARS.functions import sin
+from example_functions import g1, g2
+
+
+class TestAsync:
+    """Test class for the asynchronous derivative API"""
+
+    def test_adf(self):
+        """Test that concurrent requests are coalesced and resolved individually"""
+        ad = AutoDiff([g1, g2])
+        X = np.random.uniform(0.1, 1, size=(40, 2))
+
+        async def main():
+            return await asyncio.gather(*[ad.adf(x, max_delay=0.01) for x in X])
+
+        output = asyncio.run(main())
+        for x, output_i in zip(X, output):
+            assert np.allclose(output_i, ad.df(x))
+        stats = batcher(ad, max_delay=0.01).stats
+        assert stats["requests"] == 40
+        assert stats["batches"] < 40
+
+        ad.release()
+        assert batcher(ad, max_delay=0.01).stats["requests"] == 0
+
+    def test_batch_size(self):
+        """Test full batches, scalar functions and requests of different dimensions"""
+        ad = AutoDiff(lambda x: x ** 2)
+        gradient_batcher = GradientBatcher(ad, method="backward", max_delay=10, max_batch=4)
+
+        async def main():
+            return await asyncio.gather(*[gradient_batcher.df(float(x)) for x in range(8)])
+
+        # two full batches, without waiting for the latency window
+        assert np.allclose(asyncio.run(main()), 2 * np.arange(8))
+        assert gradient_batcher.stats["batches"] == 2
+
+        ad = AutoDiff(g2)
+
+        async def mixed():
+            return await asyncio.gather(ad.adf([1.0, 2.0]), ad.adf([3.0, 4.0, 5.0]))
+
+        output = asyncio.run(mixed())
+        assert np.allclose(output[0], [[2.0, -1.0]])
+        assert np.allclose(output[1], [[6.0, -1.0, 0.0]])
+
+        with pytest.raises(AssertionError):
+            GradientBatcher(ad, max_batch=0)
+
+    def test_mixed_methods(self):
+        """Test concurrent batches of different methods and input dimensions on the same instance"""
+        ad = AutoDiff(lambda x: sum(sin(x_i) * x_i for x_i in x))
+        rng = np.random.default_rng(0)
+        points = [rng.uniform(0.1, 1, size=2 if n % 2 else 5) for n in range(60)]
+
+        async def main():
+            return await asyncio.gather(*[ad.adf(x, method="forward" if len(x) == 2 else "backward",
+                                                 max_delay=0.0005, max_batch=3) for x in points])
+
+        # switch threads often, so batches running on separate threads would interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for _ in range(5):
+                output = asyncio.run(main())
+                for x, output_i in zip(points, output):
+                    assert np.allclose(output_i, [np.sin(x) + x * np.cos(x)])
+        finally:
+            sys.setswitchinterval(interval)
+        assert batcher(ad, method="forward", max_delay=0.0005, max_batch=3)._executor is \
+            batcher(ad, method="backward", max_delay=0.0005, max_batch=3)._executor
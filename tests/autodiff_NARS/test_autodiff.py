@@ -1,9 +1,11 @@
+import gc
 import sys
 import pytest
 import numpy as np
 sys.path.insert(1, '../')
 from autodiff_NARS.autodiff import AutoDiff
-from autodiff_NARS.autodiff import Node
+from autodiff_NARS.autodiff import Node, hash_consing
+from autodiff_NARS.functions import sin, sqrt, exp, log
 
 
 class TestAutoDiff:
@@ -94,6 +96,79 @@ class TestAutoDiff:
         assert all([all(ad_answer_df[i][x] == answer_df[i][x] for x in range(2)) for i in range(2)])
         assert all([all(ad_answer_df_bw[i][x] == answer_df[i][x] for x in range(2)) for i in range(2)])
 
+    def test_backward_shared_and_deep_graphs(self):
+        """Test that reverse mode handles shared subexpressions and graphs deeper than the recursion limit"""
+        # 60 stacked diamonds: 2**60 paths from the output to the input
+        def f(x):
+            for _ in range(60):
+                x = x * x / x
+            return x
+
+        ad = AutoDiff(f)
+        assert np.isclose(ad.df(1.5, method="backward"), 1)
+
+        def g(x):
+            for _ in range(sys.getrecursionlimit() + 100):
+                x = x + 1
+            return x
+
+        ad = AutoDiff(g)
+        assert ad.df(2.0, method="backward") == 1
+        assert ad.df(2.0, method="backward") == ad.df(2.0)
+
+    def test_forward_vector_tangents(self):
+        """Test that forward mode computes the whole Jacobian in one evaluation, or one per chunk"""
+        calls = []
+
+        def f1(x):
+            calls.append(1)
+            return x[0] * x[1] + x[2] ** 2 - x[3] / x[0]
+
+        def f2(x):
+            return 3 / x[1] - x[2] * x[3]
+
+        input = [1.0, 2.0, 3.0, 4.0]
+        answer_df = np.array([[2 + 4, 1, 6, -1], [0, -0.75, -4, -3]])
+        ad = AutoDiff([f1, f2])
+        assert np.allclose(ad.df(input), answer_df)
+        assert len(calls) == 1
+        assert np.allclose(ad.df(input, chunk_size=3), answer_df)
+        assert len(calls) == 3
+        assert np.allclose(ad.df(input, method="backward"), answer_df)
+
+        seed = [0, 1, 0, 1]
+        assert np.allclose(ad.df(input, seed=seed), answer_df @ seed)
+        assert np.allclose(ad.df(input, seed=seed), ad.df(input, method="backward", seed=seed))
+
+    def test_batch(self):
+        """Test batched function values and Jacobians over many input points"""
+        def f1(x):
+            return x[0] ** 2 * x[1] + 3
+
+        def f2(x):
+            return x[0] * 2 - 1 / x[1]
+
+        X = np.random.uniform(1, 2, size=(50, 2))
+        ad = AutoDiff([f1, f2])
+        f_batch = ad.f_batch(X)
+        df_batch = ad.df_batch(X)
+        assert f_batch.shape == (50, 2)
+        assert df_batch.shape == (50, 2, 2)
+        assert np.allclose(df_batch, ad.df_batch(X, method="backward"))
+        assert np.allclose(df_batch, ad.df_batch(X, chunk_size=1))
+        for i in [0, 17, 49]:
+            assert np.allclose(f_batch[i], ad.f(X[i]))
+            assert np.allclose(df_batch[i], ad.df(X[i]))
+
+        # batch of scalar inputs
+        ad = AutoDiff(lambda x: x ** 3)
+        assert np.allclose(ad.f_batch([1, 2, 3]), [1, 8, 27])
+        assert np.allclose(ad.df_batch([1, 2, 3]), np.array([3, 12, 27]).reshape(3, 1, 1))
+        assert np.allclose(ad.df_batch([1, 2, 3], method="backward"), ad.df_batch([1, 2, 3]))
+
+        with pytest.raises(AssertionError):
+            ad.df_batch(np.ones((2, 2, 2)))
+
     def test_function_value(self):
         """Test function value of AutoDiff class"""
 
@@ -119,6 +194,213 @@ class TestAutoDiff:
         with pytest.raises(TypeError):
             ad_answer, ad_answer_df = ad(input, "This is not forward or backward")
 
+    def test_value_and_jacobian(self):
+        """Test that the function value is read from the evaluation computing the derivative"""
+        calls = []
+
+        def f1(x):
+            calls.append(1)
+            return x[0] * x[1] + x[2]
+
+        def f2(x):
+            return x[0] - x[1] / x[2]
+
+        input = [2.0, 3.0, 4.0]
+        for ad in [AutoDiff([f1, f2]), AutoDiff([f1, f2], tape=True)]:
+            for method in ["forward", "backward"]:
+                calls.clear()
+                f, df = ad(input, method=method)
+                assert len(calls) == 1
+                assert np.allclose(f, ad.f(input))
+                assert np.allclose(df, ad.df(input))
+
+        ad = AutoDiff(lambda x: x ** 2)
+        assert ad.value_and_jacobian(3) == (9, 6)
+        assert ad.value_and_jacobian(3, method="backward") == (9, 6)
+
+    def test_hessian(self):
+        """Test Hessian and Hessian-vector products against analytic second derivatives"""
+        def f(x):
+            return x[0] ** 2 * x[1] + sin(x[0] * x[1]) + exp(x[1], 2) / x[0] + log(x[0], 3)
+
+        x, y = 1.3, 0.6
+        b = np.log(2)
+        H = np.array([
+            [2 * y - y ** 2 * np.sin(x * y) + 2 * 2 ** y / x ** 3 - 1 / (np.log(3) * x ** 2),
+             2 * x + np.cos(x * y) - x * y * np.sin(x * y) - b * 2 ** y / x ** 2],
+            [0.0, -x ** 2 * np.sin(x * y) + b ** 2 * 2 ** y / x]])
+        H[1, 0] = H[0, 1]
+
+        ad = AutoDiff(f)
+        assert np.allclose(ad.hessian([x, y]), H)
+        assert np.allclose(ad.hessian([x, y], chunk_size=1), H)
+        assert np.array_equal(ad.hessian([x, y]), ad.hessian([x, y]).T)
+        assert np.allclose(ad.hvp([x, y], [1.0, -2.0]), H @ [1.0, -2.0])
+
+        ad = AutoDiff([f, lambda x: x[0] * x[1] + 1])
+        H_all = ad.hessian([x, y])
+        assert H_all.shape == (2, 2, 2)
+        assert np.allclose(H_all[0], H)
+        assert np.allclose(H_all[1], [[0, 1], [1, 0]])
+        assert np.allclose(ad.hvp([x, y], [1.0, 0.0]), [H[:, 0], [0, 1]])
+
+        ad = AutoDiff(lambda x: x ** 3 + sqrt(x))
+        assert np.isclose(ad.hessian(4), 6 * 4 - 0.25 * 4 ** -1.5)
+        assert np.isclose(ad.hvp(4, 2), 2 * (6 * 4 - 0.25 * 4 ** -1.5))
+
+        # linear functions have a zero Hessian
+        assert np.allclose(AutoDiff(lambda x: 2 * x[0] - x[1]).hessian([1, 2]), np.zeros((2, 2)))
+
+    def test_constant_output(self):
+        """Test that outputs not depending on the input have zero derivatives in every mode"""
+        def f(x):
+            return 7.0
+
+        x = [0.5, 1.5]
+        jacobian = np.array([[np.cos(0.5), 0.0], [0.0, 0.0]])
+        for ad in (AutoDiff([lambda x: sin(x[0]), f]), AutoDiff([lambda x: sin(x[0]), f], hash_consing=True)):
+            for method in ("forward", "backward", "auto"):
+                assert np.allclose(ad.df(x, method=method), jacobian)
+            assert np.allclose(ad.f(x), [np.sin(0.5), 7.0])
+            assert np.allclose(ad.df_batch([x, x], method="backward"), [jacobian, jacobian])
+            assert np.allclose(ad.hessian(x)[1], np.zeros((2, 2)))
+            assert np.allclose(ad.hvp(x, [1.0, 1.0])[1], [0.0, 0.0])
+        assert AutoDiff(f).df(2.0, method="backward") == 0.0
+
+    def test_auto_method(self):
+        """Test that method='auto' picks a mode by the cost model, caches it and matches both modes"""
+        def f(x):
+            s = 0
+            for k in range(50):
+                s = s + sin(x[k % len(x)]) * x[(k + 1) % len(x)]
+            return s
+
+        # few inputs, or a single directional derivative: forward mode
+        ad = AutoDiff(f)
+        x = np.linspace(0.1, 1.0, 3)
+        assert np.allclose(ad.df(x, method="auto"), ad.df(x, method="backward"))
+        assert ad.diagnostics["method"] == "forward"
+        assert ad.diagnostics["n_ops"] == 150
+        assert ad.diagnostics["n_edges"] == 249  # 0 + x is unary
+
+        # many inputs, one output: backward mode
+        x = np.linspace(0.1, 1.0, 2000)
+        assert np.allclose(ad.df(x, method="auto"), ad.df(x, method="forward"))
+        assert ad.diagnostics["method"] == "backward"
+        assert ad.diagnostics["backward_cost"] < ad.diagnostics["forward_cost"]
+        assert ad.select_method(x, 1) == "forward"
+        assert np.isclose(ad.df(x, method="auto", seed=np.ones(2000)), np.sum(ad.df(x, method="backward")))
+
+        # the decision is cached per instance
+        assert ad.select_method(x, 2000) == "backward"
+        assert len(ad._methods) == 3
+        assert len(ad._graph_sizes) == 2
+
+        f_val, df_val = ad(np.linspace(0.1, 1.0, 3), method="auto")
+        assert np.isclose(f_val, ad.f(np.linspace(0.1, 1.0, 3)))
+        assert ad.df_batch(np.ones((4, 3)), method="auto").shape == (4, 1, 3)
+
+        with pytest.raises(TypeError):
+            ad(x, method="sideways")
+
+    def test_release(self):
+        """Test that graphs are freed by reference counting when a call returns"""
+        def f(x):
+            z = x[0]
+            for _ in range(100):
+                z = sin(z * x[1]) + x[0]
+            return z
+
+        def n_nodes():
+            return sum(isinstance(obj, Node) for obj in gc.get_objects())
+
+        ad = AutoDiff(f)
+        gc.collect()
+        gc.disable()
+        try:
+            before = n_nodes()
+            for method in ["forward", "backward", "auto"]:
+                ad.df([0.5, 1.5], method=method)
+            ad.hessian([0.5, 1.5])
+            assert n_nodes() == before
+        finally:
+            gc.enable()
+
+        assert ad.diagnostics
+        ad.release()
+        assert ad.diagnostics == {} and not ad._methods and not ad._graph_sizes
+
+    def test_cache(self):
+        """Test the LRU result cache of f, df and value_and_jacobian"""
+        calls = []
+
+        def f(x):
+            calls.append(1)
+            return x[0] * sin(x[1])
+
+        ad = AutoDiff(f, cache_size=2)
+        x = [1.0, 2.0]
+        df = ad.df(x)
+        assert len(calls) == 1
+        assert ad.f(x) == ad.f(np.array(x)) == np.sin(2.0)
+        assert np.array_equal(ad.df(x), df)
+        assert len(calls) == 1
+        assert ad.cache_info() == {"hits": 3, "misses": 1, "size": 2, "maxsize": 2}
+
+        # method and seed are part of the key, returned arrays are copies
+        ad.df(x, method="backward")
+        ad.df(x, seed=[1, 0])
+        assert len(calls) == 3
+        ad.df(x, seed=[1, 0])[...] = 0
+        assert np.isclose(ad.df(x, seed=[1, 0]), np.sin(2.0))
+
+        # least recently used results are evicted
+        assert ad.cache_info()["size"] == 2
+        ad.df(x)
+        assert len(calls) == 4
+
+        ad.cache_clear()
+        assert ad.cache_info() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 2}
+
+        # storing f does not evict the Jacobian of the same input
+        ad = AutoDiff(f, cache_size=1)
+        for _ in range(3):
+            assert np.array_equal(ad.df(x), df)
+        assert ad.cache_info() == {"hits": 2, "misses": 1, "size": 1, "maxsize": 1}
+        AutoDiff(f).f(x)
+        assert AutoDiff(f).cache_info()["maxsize"] == 0
+        with pytest.raises(AssertionError):
+            AutoDiff(f, cache_size=-1)
+
+    def test_hash_consing(self):
+        """Test that hash consing shares subexpressions within and across functions"""
+        def f1(x):
+            return x[0] * x[1] ** 3 + sin(x[1]) + exp(x[0] * x[1] ** 3)
+
+        def f2(x):
+            return sin(x[1]) * (x[1] ** 3 * x[0]) + log(x[0], 2)
+
+        def f3(x):
+            return x[1] * x[0] - log(x[0], 2)
+
+        input = [1.2, 0.7]
+        ad = AutoDiff([f1, f2, f3])
+        ad_consed = AutoDiff([f1, f2, f3], hash_consing=True)
+        for method in ["forward", "backward"]:
+            assert np.allclose(ad_consed.df(input, method=method), ad.df(input, method=method))
+        assert np.allclose(ad_consed.hessian(input), ad.hessian(input))
+        X = np.random.uniform(0.5, 1.5, size=(4, 2))
+        assert np.allclose(ad_consed.df_batch(X, method="backward"), ad.df_batch(X, method="backward"))
+
+        ad.select_method(input, 2)
+        ad_consed.select_method(input, 2)
+        assert ad_consed.diagnostics["n_ops"] == 11 < ad.diagnostics["n_ops"] == 17
+
+        # an output that is part of another output keeps its own adjoints
+        ad = AutoDiff([lambda x: x[0] * x[1], lambda x: sin(x[0] * x[1]) + x[0]], hash_consing=True)
+        assert np.allclose(ad.df([1.0, 2.0], method="backward"),
+                           [[2.0, 1.0], [2 * np.cos(2.0) + 1, np.cos(2.0)]])
+
 
 class TestNode:
     """Test class for Node class."""
@@ -127,17 +409,15 @@ class TestNode:
         """Test initialization of Node class"""
         name = 1
         value = 3
-        child = Node(300, 2)
-        parents = []
+        parents = [Node(2, 1), Node(4, 5)]
         for_deriv = 3
-        back_deriv = {2: 3, 4: 6}
-        node = Node(name, value, child, parents, for_deriv, back_deriv)
+        back_deriv = [3, 6]
+        node = Node(name, value, parents, for_deriv, back_deriv)
         assert node.name == name
         assert node.value == value
-        assert node.child == child
-        assert node.parents == parents
+        assert node.parents == tuple(parents)
         assert node.for_deriv == for_deriv
-        assert node.back_deriv == back_deriv
+        assert node.back_deriv == tuple(back_deriv)
         assert node.adjoint == 0
 
         name = 2
@@ -145,10 +425,10 @@ class TestNode:
         node = Node(name, value)
         assert node.name == name
         assert node.value == value
-        assert node.parents == []
-        assert node.child == []
+        assert node.parents == ()
+        assert not hasattr(node, 'child')  # nodes hold no references to their children
         assert node.for_deriv == 1
-        assert node.back_deriv == {}
+        assert node.back_deriv == ()
         assert node.adjoint == 0
 
         with pytest.raises(TypeError):
@@ -156,6 +436,61 @@ class TestNode:
             # Node(1.0, 3)
         with pytest.raises(TypeError):
             Node(1, ["Wrong value input for node"])
+        with pytest.raises(TypeError):
+            Node(1, 3, parents=[Node(2, 1)], back_deriv={2: 1})
+        with pytest.raises(AssertionError):
+            Node(1, 3, parents=[Node(2, 1)], back_deriv=[1, 2])
+
+    def test_make(self):
+        """Test the internal constructor of Node class"""
+        parent = Node(1, 2.0)
+        node = Node._make(2, 3.0, (parent,), 4.0, (5.0,))
+        assert node == Node(2, 3.0, parents=[parent], for_deriv=4.0, back_deriv=[5.0])
+        assert not hasattr(node, '__dict__')
+        with pytest.raises(AttributeError):
+            node.other_attribute = 1
+
+    def test_release(self):
+        """Test that releasing a node detaches its whole graph"""
+        node_1 = Node(1, 3.0)
+        node_2 = node_1 * node_1
+        node_3 = sin(node_2) + node_2
+        node_3.release()
+        for node in [node_1, node_2, node_3]:
+            assert node.parents == () and node.back_deriv == ()
+
+    def test_hash_consing(self):
+        """Test that operations on the same operands return the same node while hash consing"""
+        x, y = Node(1, 2.0), Node(2, 3.0)
+        with hash_consing():
+            assert x * y is y * x
+            assert x + 1 is 1 + x
+            assert x - y is x - y and x - y is not y - x
+            assert sin(x * y) is sin(y * x)
+            assert exp(x, 2) is exp(x, base=2) and exp(x, 2) is not exp(x)
+            assert -x is -x
+        assert x * y is not x * y
+        assert sin(2.0) == np.sin(2.0)
+
+    def test_names(self):
+        """Test that new nodes get sequential names and that edges to the same parent stay distinct"""
+        node_1 = Node(1, 3.0)
+        node_2 = node_1 * node_1
+        node_3 = node_1 / node_1
+        assert node_3.name == node_2.name + 1
+        assert node_2.parents == (node_1, node_1)
+        assert node_2.back_deriv == (3.0, 3.0)
+        assert node_3.back_deriv == (1 / 3.0, -1 / 3.0)
+
+        ad = AutoDiff(lambda x: x / x + x * x)
+        assert ad.df(3.0, method="backward") == ad.df(3.0) == 6
+
+    def test_vector_tangent(self):
+        """Test that nodes propagate a vector of tangents"""
+        node_1 = Node(1, 2.0, for_deriv=np.array([1.0, 0.0]))
+        node_2 = Node(2, 3.0, for_deriv=np.array([0.0, 1.0]))
+        node_3 = node_1 * node_2 + 1 / node_1
+        assert np.allclose(node_3.for_deriv, [3 - 1 / 4, 2])
 
     def test_equality(self):
         """Test equality dunder method of Node class"""
@@ -177,28 +512,24 @@ class TestNode:
         assert node_3.value == node_1.value + node_2.value
         assert node_3.name != node_1.name or node_3.name != node_2.name
         assert node_3.for_deriv == node_1.for_deriv + node_2.for_deriv
-        assert node_3.back_deriv == {node_1.name: 1, node_2.name: 1}
-        assert node_3 in node_1.child
-        assert node_3 in node_2.child
-        assert node_3.parents == [node_1, node_2]
+        assert node_3.back_deriv == (1, 1)
+        assert node_3.parents == (node_1, node_2)
 
         constant = 10
         node_4 = node_1 + constant
         assert node_4.name != node_1.name
         assert node_4.value == node_1.value + constant
         assert node_4.for_deriv == node_1.for_deriv
-        assert node_4.back_deriv == {node_1.name: 1}
-        assert node_4 in node_1.child
-        assert node_4.parents == [node_1]
+        assert node_4.back_deriv == (1,)
+        assert node_4.parents == (node_1,)
 
         constant = 12.0
         node_5 = constant + node_1
         assert node_5.name != node_1.name
         assert node_5.value == node_1.value + constant
         assert node_5.for_deriv == node_1.for_deriv
-        assert node_5.back_deriv == {node_1.name: 1}
-        assert node_5 in node_1.child
-        assert node_5.parents == [node_1]
+        assert node_5.back_deriv == (1,)
+        assert node_5.parents == (node_1,)
 
         with pytest.raises(TypeError):
             node_1 + '3'
@@ -214,28 +545,24 @@ class TestNode:
         assert node_3.value == node_1.value - node_2.value
         assert node_3.name != node_1.name or node_3.name != node_2.name
         assert node_3.for_deriv == node_1.for_deriv - node_2.for_deriv
-        assert node_3.back_deriv == {node_1.name: 1, node_2.name: -1}
-        assert node_3 in node_1.child
-        assert node_3 in node_2.child
-        assert node_3.parents == [node_1, node_2]
+        assert node_3.back_deriv == (1, -1)
+        assert node_3.parents == (node_1, node_2)
 
         constant = 10
         node_4 = node_1 - constant
         assert node_4.name != node_1.name
         assert node_4.value == node_1.value - constant
         assert node_4.for_deriv == node_1.for_deriv
-        assert node_4.back_deriv == {node_1.name: 1}
-        assert node_4 in node_1.child
-        assert node_4.parents == [node_1]
+        assert node_4.back_deriv == (1,)
+        assert node_4.parents == (node_1,)
 
         constant = 12.0
         node_5 = constant - node_1
         assert node_5.name != node_1.name
         assert node_5.value == constant - node_1.value
         assert node_5.for_deriv == -node_1.for_deriv
-        assert node_5.back_deriv == {node_1.name: -1}
-        assert node_5 in node_1.child
-        assert node_5.parents == [node_1]
+        assert node_5.back_deriv == (-1,)
+        assert node_5.parents == (node_1,)
 
         with pytest.raises(TypeError):
             node_1 - '4'
@@ -253,27 +580,23 @@ class TestNode:
         assert node_3.value == node_1.value * node_2.value
         assert node_3.name != node_1.name or node_3.name != node_2.name
         assert node_3.for_deriv == node_1.for_deriv * node_2.value + node_2.for_deriv * node_1.value
-        assert node_3.back_deriv == {node_1.name: node_2.value, node_2.name: node_1.value}
-        assert node_3 in node_1.child
-        assert node_3 in node_2.child
-        assert node_3.parents == [node_1, node_2]
+        assert node_3.back_deriv == (node_2.value, node_1.value)
+        assert node_3.parents == (node_1, node_2)
 
         constant = 10
         node_4 = node_1 * constant
         assert node_4.name != node_1.name
         assert node_4.value == node_1.value * constant
         assert node_4.for_deriv == constant * node_1.for_deriv
-        assert node_4.back_deriv == {node_1.name: constant}
-        assert node_4 in node_1.child
-        assert node_4.parents == [node_1]
+        assert node_4.back_deriv == (constant,)
+        assert node_4.parents == (node_1,)
 
         node_5 = constant * node_1
         assert node_5.name != node_1.name
         assert node_5.value == node_1.value * constant
         assert node_5.for_deriv == constant * node_1.for_deriv
-        assert node_5.back_deriv == {node_1.name: constant}
-        assert node_5 in node_1.child
-        assert node_5.parents == [node_1]
+        assert node_5.back_deriv == (constant,)
+        assert node_5.parents == (node_1,)
 
         with pytest.raises(TypeError):
             node_1 * '4'
@@ -290,29 +613,25 @@ class TestNode:
         assert node_3.name != node_1.name or node_3.name != node_2.name
         assert node_3.for_deriv == (node_1.for_deriv * node_2.value - node_1.value * node_2.for_deriv) / \
                (node_2.value * node_2.value)
-        assert node_3.back_deriv == {node_1.name: 1 / node_2.value, node_2.name: -node_1.value /
-                                                                                 (node_2.value * node_2.value)}
-        assert node_3 in node_1.child
-        assert node_3 in node_2.child
-        assert node_3.parents == [node_1, node_2]
+        assert node_3.back_deriv == (1 / node_2.value, -node_1.value /
+                                                                                 (node_2.value * node_2.value))
+        assert node_3.parents == (node_1, node_2)
 
         constant = 10
         node_4 = node_1 / constant
         assert node_4.name != node_1.name
         assert node_4.value == node_1.value / constant
         assert node_4.for_deriv == node_1.for_deriv / constant
-        assert node_4.back_deriv == {node_1.name: 1 / constant}
-        assert node_4 in node_1.child
-        assert node_4.parents == [node_1]
+        assert node_4.back_deriv == (1 / constant,)
+        assert node_4.parents == (node_1,)
 
         constant = -19
         node_5 = constant / node_1
         assert node_5.name != node_1.name
         assert node_5.value == constant / node_1.value
-        assert node_5.for_deriv == -constant / (node_1.value * node_1.value)
-        assert node_5.back_deriv == {node_1.name: -constant / (node_1.value * node_1.value)}
-        assert node_5 in node_1.child
-        assert node_5.parents == [node_1]
+        assert node_5.for_deriv == -constant / (node_1.value * node_1.value) * node_1.for_deriv
+        assert node_5.back_deriv == (-constant / (node_1.value * node_1.value),)
+        assert node_5.parents == (node_1,)
 
         with pytest.raises(TypeError):
             node_1 / '4'
@@ -330,9 +649,8 @@ class TestNode:
         assert node_3.value == -1 * node_1.value
         assert node_3.name != node_1.name
         assert node_3.for_deriv == (-1 * node_1.for_deriv)
-        assert node_3.back_deriv == {node_1.name: -1}
-        assert node_3 in node_1.child
-        assert node_3.parents == [node_1]
+        assert node_3.back_deriv == (-1,)
+        assert node_3.parents == (node_1,)
 
     def test_power(self):
         """Test division dunder method of Node class"""
@@ -346,11 +664,8 @@ class TestNode:
         assert node_3.name != node_1.name or node_3.name != node_2.name
         assert node_3.for_deriv == node_2.value * node_1.value ** (node_2.value - 1) * node_1.for_deriv + \
                np.log(node_1.value) * node_1.value ** node_2.value * node_2.for_deriv
-        assert node_3.back_deriv == {node_1.name: node_2.value * node_1.value ** (node_2.value - 1),
-                                     node_2.name: np.log(node_1.value) * node_1.value ** node_2.value}
-        assert node_3 in node_1.child
-        assert node_3 in node_2.child
-        assert node_3.parents == [node_1, node_2]
+        assert node_3.back_deriv == (node_2.value * node_1.value ** (node_2.value - 1), np.log(node_1.value) * node_1.value ** node_2.value)
+        assert node_3.parents == (node_1, node_2)
 
         node_1 = Node(name_1, value_1, for_deriv=for_deriv_1)
 
@@ -359,9 +674,8 @@ class TestNode:
         assert node_5.name != node_1.name
         assert node_5.value == constant ** node_1.value
         assert node_5.for_deriv == node_1.for_deriv * np.log(constant) * constant ** node_1.value
-        assert node_5.back_deriv == {node_1.name: np.log(constant) * constant ** node_1.value}
-        assert node_5 in node_1.child
-        assert node_5.parents == [node_1]
+        assert node_5.back_deriv == (np.log(constant) * constant ** node_1.value,)
+        assert node_5.parents == (node_1,)
 
         with pytest.raises(TypeError):
             node_1 ** '4'
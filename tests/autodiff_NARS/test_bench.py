@@ -0,0 +1,45 @@
+import sys
+import json
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS import bench
+
+
+class TestBench:
+    """Test class for the benchmark suite"""
+
+    def test_cases(self):
+        """Test that the cases cover both modes of every group, with unique names"""
+        cases = bench.cases()
+        names = [case["name"] for case in cases]
+        assert len(names) == len(set(names))
+        groups = {case["group"] for case in cases}
+        assert {"demo_scalar", "newton_system", "wide", "chain", "diamond", "system"} <= groups
+        for group in groups:
+            assert {case["method"] for case in cases if case["group"] == group} == {"forward", "backward"}
+        assert "wide/backward/x_dim=10000" in names and "wide/forward/x_dim=10000" not in names
+        assert all(case["setup"]() is not None for case in cases if case["quick"] and case["group"] != "wide_tensor")
+
+    def test_run_and_compare(self, tmp_path):
+        """Test the results of a run, their comparison to a baseline and the command line"""
+        results = bench.run(quick=True, pattern="demo_scalar", repeat=2, min_time=0.001)
+        assert set(results["results"]) == {"demo_scalar/forward", "demo_scalar/backward"}
+        for timing in results["results"].values():
+            assert 0 < timing["best"] <= timing["median"] and timing["repeat"] == 2
+        json.dumps(results)
+
+        baseline = json.loads(json.dumps(results))
+        baseline["results"]["demo_scalar/forward"]["best"] /= 10
+        baseline["results"]["missing"] = baseline["results"].pop("demo_scalar/backward")
+        ratios, regressions = bench.compare(results, baseline)
+        assert set(ratios) == {"demo_scalar/forward"} and np.isclose(ratios["demo_scalar/forward"], 10)
+        assert regressions == ["demo_scalar/forward"]
+        assert bench.compare(results, results) == ({name: 1.0 for name in results["results"]}, [])
+
+        output, baseline_file = tmp_path / "results.json", tmp_path / "baseline.json"
+        baseline_file.write_text(json.dumps(baseline))
+        args = ["--quick", "--filter", "demo_scalar", "--repeat", "2"]
+        assert bench.main(args + ["--output", str(output)]) == 0
+        assert set(json.loads(output.read_text())["results"]) == set(results["results"])
+        assert bench.main(args + ["--baseline", str(baseline_file)]) == 1
+        assert bench.main(args + ["--baseline", str(output), "--tolerance", "100"]) == 0
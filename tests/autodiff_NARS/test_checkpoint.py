@@ -0,0 +1,66 @@
+import sys
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.checkpoint import checkpoint, checkpoint_loop, CheckpointNode
+from autodiff_NARS.functions import sin, exp
+
+
+def step(state):
+    x, v = state
+    return [x + 0.01 * v, v - 0.01 * sin(x)]
+
+
+def unrolled(z, n_steps=60):
+    state = [z[0], z[1]]
+    for _ in range(n_steps):
+        state = step(state)
+    return state[0] * state[1]
+
+
+class TestCheckpoint:
+    """Test class for checkpointed reverse mode"""
+
+    def test_checkpoint(self):
+        """Test that a checkpointed function has the derivatives of the function"""
+        def f(x):
+            return checkpoint(lambda s: [s[0] * exp(s[1]), s[1] ** 2, 3.0])([x[0], x[1]])[0] + x[1]
+
+        input = [1.5, 0.5]
+        expected = [np.exp(0.5), 1.5 * np.exp(0.5) + 1]
+        for method in ["forward", "backward"]:
+            assert np.allclose(AutoDiff(f).df(input, method=method), expected)
+
+        # single node state, graph of the wrapped function is not kept
+        ad = AutoDiff(lambda x: checkpoint(lambda s: sin(s) * s)(x))
+        assert np.isclose(ad.df(2.0, method="backward"), np.cos(2) * 2 + np.sin(2))
+        output = checkpoint(lambda s: sin(s) * s)(ad._create_input_nodes([2.0])[0][0])
+        assert isinstance(output, CheckpointNode)
+        assert len(output.parents) == 1 and not output.parents[0].parents
+
+        # the recomputed Jacobian is released once every output used it
+        assert output.segment.jacobian is None
+        assert np.isclose(output.back_deriv[0], np.cos(2) * 2 + np.sin(2))
+        assert output.segment.jacobian is None
+        output.release()
+        assert output.parents == () and output.back_deriv == ()
+
+        assert checkpoint(lambda s: s * 2)(3.0) == 6.0
+
+    def test_checkpoint_loop(self):
+        """Test that checkpointed time stepping matches the unrolled loop for any budget"""
+        input = [0.3, 0.2]
+        expected = AutoDiff(unrolled).df(input, method="backward")
+        for checkpoints in [None, 1, 7, 60, 100]:
+            ad = AutoDiff(lambda z: (lambda s: s[0] * s[1])(checkpoint_loop(step, [z[0], z[1]], 60, checkpoints)))
+            assert np.isclose(ad.f(input), unrolled(input))
+            assert np.allclose(ad.df(input, method="backward"), expected)
+            assert np.allclose(ad.df(input, method="forward"), expected)
+
+        X = np.random.rand(4, 2)
+        ad = AutoDiff(lambda z: (lambda s: s[0] * s[1])(checkpoint_loop(step, (z[0], z[1]), 60)))
+        assert np.allclose(ad.df_batch(X, method="backward"), AutoDiff(unrolled).df_batch(X, method="backward"))
+
+        with pytest.raises(TypeError):
+            checkpoint_loop(step, [0.3, 0.2], 2.5)
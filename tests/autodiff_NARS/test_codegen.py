@@ -0,0 +1,60 @@
+import sys
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.codegen import GeneratedKernel, VALUE_SOURCE
+from example_functions import f1, f2, f3
+
+
+class TestGeneratedKernel:
+    """Test class for the generated kernels"""
+
+    def test_kernel(self):
+        """Test that generated functions match AutoDiff at single points and batches"""
+        compiled = AutoDiff([f1, f2, f3]).compile([0.5, 1.5, 0.8])
+        kernel = compiled.codegen()
+        assert isinstance(kernel, GeneratedKernel)
+        assert compiled.codegen() is kernel
+        assert 'Node' not in kernel.jacobian_source
+
+        ad = AutoDiff([f1, f2, f3])
+        X = np.random.uniform([0.1, 1.1, 0.1], [0.9, 2.5, 1.2], size=(100, 3))
+        assert np.allclose(kernel.f_batch(X), ad.f_batch(X))
+        assert np.allclose(kernel.df_batch(X), ad.df_batch(X))
+        for x in X[:3]:
+            assert np.allclose(kernel.f(x), ad.f(x))
+            assert np.allclose(kernel.df(x), ad.df(x))
+            f, df = kernel(x)
+            assert np.allclose(f, ad.f(x))
+            assert np.allclose(df, ad.df(x))
+
+        with pytest.raises(AssertionError):
+            kernel.gradient(X[0])
+
+    def test_scalar(self):
+        """Test the generated functions of a scalar function"""
+        kernel = AutoDiff(lambda x: x ** 2 + 3 * x).compile(1).codegen()
+        assert kernel.f(2) == 10
+        assert kernel.df(2) == 7
+        assert np.allclose(kernel.gradient(2), [7])
+        assert np.allclose(kernel.df_batch([1, 2]), np.array([5, 7]).reshape(2, 1, 1))
+
+    def test_negative_constants(self):
+        """Test that negative constants are generated as a whole, e.g. (-2.0) ** x and not -(2.0 ** x)"""
+        functions = [lambda x: x[0] + -2.0, lambda x: x[0] - -2.0, lambda x: -2.0 - x[0], lambda x: x[0] * -2.0,
+                     lambda x: x[0] / -2.0, lambda x: -2.0 / x[0], lambda x: x[0] ** -2.0, lambda x: (-2.0) ** x[1]]
+        with np.errstate(all='ignore'):  # the derivative of (-2.0) ** x is nan
+            graph = AutoDiff(functions).compile([2.0, 2.0])
+            assert {op for op in VALUE_SOURCE if op.endswith('_const')} <= set(graph._entries()[0])
+            kernel = graph.codegen()
+            for x in ([2.0, 2.0], [3.0, 4.0]):
+                assert np.allclose(kernel.f(x), graph.f(x))
+                assert np.allclose(kernel.df(x), graph.df(x, method="backward"), equal_nan=True)
+
+    def test_shared_source(self):
+        """Test that graphs with equal source share the generated function"""
+        kernel_1 = AutoDiff(lambda x: x[0] * x[1]).compile([1, 2]).codegen()
+        kernel_2 = AutoDiff(lambda x: x[0] * x[1]).compile([3, 4]).codegen()
+        assert kernel_1._kernel is kernel_2._kernel
+        assert np.allclose(kernel_1.gradient([3, 4]), [4, 3])
@@ -0,0 +1,191 @@
+import sys
+import json
+import os
+import subprocess
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.compiled import CompiledGraph, graph_key
+from autodiff_NARS.functions import sin, cos, exp, log
+from example_functions import f1, f2, f3
+
+
+def tridiagonal_system(n=9):
+    """Tridiagonal system of n - 2 residuals and two more functions, compiled at a point"""
+    def residual(i):
+        return lambda x: x[i - 1] - 2 * x[i] * sin(x[i]) + x[i + 1] ** 2
+
+    ad = AutoDiff([residual(i) for i in range(1, n - 1)] + [lambda x: exp(x[0]), f3])
+    x = np.linspace(0.1, 1.0, n)
+    graph = ad.compile(x)
+    return ad, x, graph, graph.df(x, method="backward")
+
+
+class TestCompiledGraph:
+    """Test class for the compiled graph"""
+
+    def test_replay(self):
+        """Test that replaying a compiled graph matches evaluating the functions"""
+        calls = []
+
+        def counted(x):
+            calls.append(1)
+            return f1(x)
+
+        ad = AutoDiff([counted, f2, f3])
+        compiled = ad.compile([0.5, 1.5, 0.8])
+        assert isinstance(compiled, CompiledGraph)
+        assert len(calls) == 1
+
+        for x in [[0.5, 1.5, 0.8], [0.2, 1.1, 0.3], [0.9, 2.5, 1.2]]:
+            assert np.allclose(compiled.f(x), AutoDiff([f1, f2, f3]).f(x))
+            jacobian = AutoDiff([f1, f2, f3]).df(x, method="backward")
+            assert np.allclose(compiled.df(x), jacobian)
+            assert np.allclose(compiled.df(x, method="backward"), jacobian)
+            assert np.allclose(compiled.df(x, seed=[1, 0, 2]), jacobian @ [1, 0, 2])
+            assert np.allclose(compiled.df(x, method="backward", seed=[1, 0, 2]), jacobian @ [1, 0, 2])
+            f, df = compiled(x, method="backward")
+            assert np.allclose(df, jacobian)
+        assert len(calls) == 1
+
+        with pytest.raises(AssertionError):
+            compiled.f([1, 2])
+
+        # the method is checked before the graph is replayed
+        def replay(input_vector):
+            raise AssertionError("replayed")
+        compiled._replay = replay
+        with pytest.raises(TypeError):
+            compiled.df([1, 2, 3], method="This is not forward or backward")
+
+    def test_scalar(self):
+        """Test a compiled graph of a scalar function"""
+        compiled = AutoDiff(lambda x: x ** 2 + 3 * x).compile(1)
+        assert compiled.f(2) == 10
+        assert compiled.df(2) == 7
+        assert compiled.df(2, method="backward") == 7
+
+    def test_sparsity(self):
+        """Test sparsity detection and coloring"""
+        ad, x, graph, jacobian = tridiagonal_system()
+        rows, cols = graph.sparsity()
+        pattern = np.zeros(jacobian.shape, dtype=bool)
+        pattern[rows, cols] = True
+        assert np.array_equal(pattern, jacobian != 0)
+
+        # tridiagonal rows: three column colors, three row colors
+        for method in ["forward", "backward"]:
+            assert graph.coloring(method)[1] == 3
+
+        # structurally orthogonal columns share a color
+        color = graph.coloring("forward")[0]
+        for i in range(len(pattern)):
+            assert len(set(color[pattern[i]])) == pattern[i].sum()
+        with pytest.raises(TypeError):
+            graph.coloring("sideways")
+
+    def test_sparse_jacobian(self):
+        """Test the compressed sparse Jacobian, returned as a scipy.sparse matrix"""
+        pytest.importorskip("scipy")
+        ad, x, graph, jacobian = tridiagonal_system()
+        for method in ["forward", "backward"]:
+            J = graph.sparse_jacobian(x, method=method)
+            assert J.format == ("csc" if method == "forward" else "csr")
+            assert J.nnz == len(graph.sparsity()[0])
+            assert np.allclose(J.toarray(), jacobian)
+            assert np.allclose(ad.sparse_jacobian(x, method=method).toarray(), jacobian)
+
+        assert np.isclose(AutoDiff(lambda x: x ** 2).sparse_jacobian(3.0).toarray()[0, 0], 6.0)
+        with pytest.raises(TypeError):
+            graph.sparse_jacobian(x, method="sideways")
+
+    def test_optimize(self):
+        """Test that an optimized graph is shorter and computes the same values and derivatives"""
+        def g1(x):
+            unused = sin(x[0]) * cos(x[1])
+            return ((x[0] + 0) * 1 + x[1] ** 1 + exp(log(x[0])) - (-(-x[1])) + x[1] ** 2 + x[0] ** 0.5
+                    + x[0] ** -1 + 0 * x[1] + x[2] / 1)
+
+        def g2(x):
+            return x[0] + x[0] + x[1] ** 0 + 2 ** x[1] + exp(log(x[1], 2), 2) - log(exp(x[0])) + (2 * 3 - 1) * x[2]
+
+        graph = AutoDiff([g1, g2, f3]).compile([1.3, 0.7, 0.4])
+        optimized = graph.optimize()
+        assert isinstance(optimized, CompiledGraph)
+        assert len(optimized) < len(graph)
+        assert 'pow_const' not in optimized._entries()[0]
+        assert optimized._entries()[0].count('input') == 3
+
+        for x in [[1.3, 0.7, 0.4], [2.0, 0.4, 1.5]]:
+            assert np.allclose(optimized.f(x), graph.f(x))
+            for method in ["forward", "backward"]:
+                assert np.allclose(optimized.df(x, method=method), graph.df(x, method=method))
+            assert np.allclose(optimized.codegen().df(x), graph.df(x))
+            assert np.allclose(optimized.optimize().f(x), graph.f(x))
+
+        # inputs are kept even if no output depends on them
+        assert np.allclose(AutoDiff(lambda x: x[0] * 1).compile([1.0, 2.0]).optimize().df([3.0, 4.0]), [[1, 0]])
+
+        # constants dividing by zero fold to what the replay computes
+        with np.errstate(all='ignore'):
+            for g in (lambda x: x[0] + 1 / (x[1] * 0), lambda x: x[0] + (x[1] * 0) ** -1.5):
+                graph = AutoDiff(g).compile([1.0, 2.0])
+                optimized = graph.optimize()
+                assert len(optimized) < len(graph) and optimized.f([1.0, 2.0]) == graph.f([1.0, 2.0]) == np.inf
+
+    def test_cache(self, tmp_path):
+        """Test saving, loading and caching compiled graphs on disk"""
+        def counted(x):
+            counted.calls += 1
+            return f1(x)
+        counted.calls = 0
+
+        x = [0.5, 1.5, 0.8]
+        ad = AutoDiff([counted, f2, f3])
+        graph = ad.compile(x, cache_dir=str(tmp_path))
+        assert counted.calls == 1 and len(os.listdir(tmp_path)) == 1
+        cached = ad.compile(x, cache_dir=str(tmp_path))
+        assert counted.calls == 1 and isinstance(cached.op, np.memmap)
+        # the memory-mapped arrays are only read once the graph is replayed
+        assert cached._entries_lists is None and len(cached) == len(graph)
+        for method in ["forward", "backward"]:
+            assert np.allclose(cached.df(x, method=method), ad.df(x))
+        assert np.allclose(cached.optimize().codegen().df(x), ad.df(x))
+
+        # graphs of other dimensions or closure values are cached under other keys
+        def scaled(c):
+            return lambda x: c * sin(x[0]) + x[1]
+        assert graph_key([scaled(2.0)], 2) == graph_key([scaled(2.0)], 2)
+        assert graph_key([scaled(2.0)], 2) != graph_key([scaled(3.0)], 2)
+        assert graph_key([scaled(2.0)], 2) != graph_key([scaled(2.0)], 3)
+        assert graph_key([f1, f2], 3) != graph_key([f2, f1], 3)
+
+        # opcodes are translated through the saved operation names
+        path = tmp_path / "graph"
+        graph.save(str(path))
+        meta = json.loads((path / "meta.json").read_text())
+        meta["ops"] = ["unknown"] + meta["ops"]
+        (path / "meta.json").write_text(json.dumps(meta))
+        np.save(path / "op.npy", graph.op + 1)
+        assert np.array_equal(CompiledGraph.load(str(path), mmap_mode=None).op, graph.op)
+        np.save(path / "op.npy", np.zeros_like(graph.op))
+        with pytest.raises(AssertionError):
+            CompiledGraph.load(str(path))
+
+    def test_cache_across_processes(self, tmp_path):
+        """Test that another process computes the same key and loads the cached graph"""
+        (tmp_path / "model.py").write_text("from autodiff_NARS.functions import sin, exp\n"
+                                          "SCALE = 2.0\n"
+                                          "def f(x):\n"
+                                          "    return SCALE * sin(x[0]) * exp(x[1])\n")
+        script = ("import sys; sys.path[:0] = [sys.argv[1], sys.argv[2]]\n"
+                  "from model import f\n"
+                  "from autodiff_NARS.autodiff import AutoDiff\n"
+                  "graph = AutoDiff(f).compile([0.5, 1.0], cache_dir=sys.argv[3])\n"
+                  "print(type(graph.op).__name__, graph.df([0.5, 1.0]).ravel()[1])\n")
+        package = os.path.dirname(os.path.dirname(os.path.abspath(__import__('autodiff_NARS').__file__)))
+        outputs = [subprocess.run([sys.executable, "-c", script, package, str(tmp_path), str(tmp_path / "cache")],
+                                  capture_output=True, text=True, check=True).stdout.split() for _ in range(2)]
+        assert outputs[0][0] == "ndarray" and outputs[1][0] == "memmap"
+        assert np.isclose(float(outputs[1][1]), 2 * np.sin(0.5) * np.exp(1.0))
@@ -0,0 +1,72 @@
+import sys
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.dual import Dual
+from autodiff_NARS.functions import sin, exp, log, sigmoid
+
+
+class TestDual:
+    """Test class for Dual class."""
+
+    def test_arithmetic(self):
+        """Test arithmetic on dual numbers"""
+        x = Dual(2.0, 1.0)
+        y = Dual(3.0, np.array([0.0, 1.0]))
+
+        z = x * y + x / y - y ** x + 2 ** x - 1 / x + 4 - x
+        value = 2 * 3 + 2 / 3 - 3 ** 2 + 2 ** 2 - 1 / 2 + 4 - 2
+        dx = 3 + 1 / 3 - np.log(3) * 9 + np.log(2) * 4 + 1 / 4 - 1
+        dy = 2 - 2 / 9 - 2 * 3
+        assert np.isclose(z.value, value)
+        assert np.allclose(z.tangent, [dx + dy * 0, dx + dy])
+        assert (-x).value == -2.0 and (-x).tangent == -1.0
+        assert (x ** 3).tangent == 12.0
+        assert (3 - x).tangent == -1.0
+
+        with pytest.raises(TypeError):
+            x + "a"
+
+    def test_ufuncs(self):
+        """Test that NumPy functions apply the chain rule to dual numbers"""
+        x = Dual(0.5, 2.0)
+        for function, derivative in [(np.sin, np.cos), (np.cos, lambda a: -np.sin(a)), (np.exp, np.exp),
+                                     (np.log, lambda a: 1 / a), (np.sqrt, lambda a: 0.5 / np.sqrt(a)),
+                                     (np.tanh, lambda a: 1 / np.cosh(a) ** 2),
+                                     (np.arcsin, lambda a: 1 / np.sqrt(1 - a ** 2))]:
+            y = function(x)
+            assert np.isclose(y.value, function(0.5))
+            assert np.isclose(y.tangent, 2 * derivative(0.5))
+
+        # NumPy scalars combine with duals like floats
+        y = np.float64(3.0) * x
+        assert isinstance(y, Dual)
+        assert y.value == 1.5 and y.tangent == 6.0
+
+    def test_primitives(self):
+        """Test that the elementary functions propagate the tangents of dual numbers"""
+        x = Dual(0.5, np.array([1.0, 2.0]))
+        for function, derivative in [(sin, np.cos), (lambda a: exp(a, 2), lambda a: np.log(2) * 2 ** a),
+                                     (lambda a: log(a, 3), lambda a: 1 / (a * np.log(3))),
+                                     (sigmoid, lambda a: np.exp(-a) / (1 + np.exp(-a)) ** 2)]:
+            y = function(x)
+            assert isinstance(y, Dual)
+            assert np.isclose(y.value, function(0.5))
+            assert np.allclose(y.tangent, derivative(0.5) * np.array([1.0, 2.0]))
+
+    def test_forward_mode(self):
+        """Test that forward mode evaluates the functions on dual numbers, recording no graph"""
+        inputs = []
+
+        def f1(x):
+            inputs.append(x)
+            return sin(x[0]) * x[1] ** 2 - 3 / x[0]
+
+        ad = AutoDiff([f1, lambda x: 7.0])
+        f, df = ad.value_and_jacobian([0.5, 2.0])
+        assert all(isinstance(x_i, Dual) for x_i in inputs[0])
+        assert np.allclose(f, [np.sin(0.5) * 4 - 6, 7])
+        assert np.allclose(df, [[np.cos(0.5) * 4 + 12, np.sin(0.5) * 4], [0, 0]])
+        assert np.allclose(ad.df_batch([[0.5, 2.0], [1.0, 1.0]])[0], df)
+        assert np.allclose(AutoDiff(lambda x: x * sin(x)).df(2.0), np.sin(2) + 2 * np.cos(2))
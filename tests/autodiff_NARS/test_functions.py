@@ -13,7 +13,7 @@ class TestFunction:
         value = np.random.choice([np.random.uniform(p1, p2), np.random.randint(p1, p2)])
         #value=np.random.randint(p1, p2)
         for_deriv = np.random.choice([np.random.normal(12, 10), np.random.randint(-200, 300)])
-        test_node = Node(np.random.randint(-1, 1000), value, [], [], for_deriv, {})
+        test_node = Node(np.random.randint(-1, 1000), value, [], for_deriv, [])
         return test_node
 
     def helper_test(self, fun, number_equivalent, derivative, input_range=[-100, 100], derivative_range=[-100, 100]):
@@ -26,15 +26,17 @@ class TestFunction:
 
         assert new_node.value == number_equivalent(test_node.value)
         deriv = np.round(derivative(test_node.value), 10)
-        assert np.round(new_node.back_deriv[test_node.name], 10) == deriv
-        assert type(new_node.back_deriv) == dict
+        assert np.round(new_node.back_deriv[0], 10) == deriv
+        assert type(new_node.back_deriv) == tuple
         assert new_node.for_deriv == derivative(test_node.value) * test_node.for_deriv
-        assert new_node.parents == [test_node]
-        assert test_node.child == [new_node]
+        assert new_node.parents == (test_node,)
 
         assert number_equivalent(test_number1) == fun(test_number1)
         assert number_equivalent(test_number2) == fun(test_number2)
 
+        test_array = np.random.uniform(p1, p2, size=5)
+        assert np.allclose(number_equivalent(test_array), fun(test_array))
+
         with pytest.raises(TypeError):
             non_cooperating_object = []
             fun(non_cooperating_object)
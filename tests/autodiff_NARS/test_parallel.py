@@ -0,0 +1,34 @@
+import sys
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from example_functions import g1, g2
+
+
+class TestParallel:
+    """Test class for the process pool driver"""
+
+    def test_map_df(self):
+        """Test that the Jacobians computed by the worker processes match df_batch"""
+        ad = AutoDiff([g1, g2])
+        X = np.random.uniform(0.1, 1, size=(50, 2))
+        expected = ad.df_batch(X)
+        for workers in [1, 2, 3]:
+            assert np.allclose(ad.map_df(X, workers=workers), expected)
+        assert np.allclose(ad.map_df(X, workers=2, method="backward"), expected)
+        assert np.allclose(AutoDiff(g1).map_df(X[:1], workers=2), AutoDiff(g1).df_batch(X[:1]))
+
+        # no points: nothing to split across workers
+        assert ad.map_df(np.zeros((0, 2)), workers=2).shape == ad.df_batch(np.zeros((0, 2))).shape == (0, 2, 2)
+
+        with pytest.raises(AssertionError):
+            ad.map_df(X, workers=0)
+
+    def test_unpicklable(self):
+        """Test that functions which cannot be pickled are evaluated in this process"""
+        ad = AutoDiff(lambda x: x[0] * x[1])
+        X = np.random.uniform(0.1, 1, size=(10, 2))
+        with pytest.warns(RuntimeWarning):
+            J = ad.map_df(X, workers=2)
+        assert np.allclose(J, ad.df_batch(X))
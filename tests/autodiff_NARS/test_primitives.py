@@ -0,0 +1,147 @@
+import sys
+import warnings
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff, Node, hash_consing
+from autodiff_NARS.primitives import primitive, PRIMITIVES
+from autodiff_NARS.functions import sin, sqrt, arccos, exp, log
+
+
+@primitive
+def softplus(var):
+    """Softplus log(1 + e^var), computed without overflow"""
+    exp_neg = np.exp(-np.abs(var))
+    return np.log1p(exp_neg) + np.maximum(var, 0), np.where(var >= 0, 1, exp_neg) / (1 + exp_neg)
+
+
+@primitive
+def scaled_tanh(var, scale=2.0):
+    """Hyperbolic tangent scaled by a constant"""
+    return scale * np.tanh(var), scale / np.cosh(var) ** 2
+
+
+@primitive
+def hypot(a, b):
+    """Euclidean norm of (a, b)"""
+    value = np.hypot(a, b)
+    return value, a / value, b / value
+
+
+def f1(x):
+    return softplus(x[0]) * scaled_tanh(x[1], 3.0) + hypot(x[0], x[1]) + hypot(2.0, x[1]) + hypot(x[0], 1.5)
+
+
+def f2(x):
+    return sin(scaled_tanh(x[0])) + exp(softplus(x[1]), 2)
+
+
+class TestPrimitive:
+    """Test class for registered primitives"""
+
+    def test_node(self):
+        """Test that a primitive is a single node carrying its rule's derivatives"""
+        x = Node(1, 0.5, for_deriv=2.0)
+        y = Node(2, -1.5, for_deriv=1.0)
+
+        z = hypot(x, y)
+        assert np.isclose(z.value, np.hypot(0.5, -1.5))
+        assert z.parents == (x, y)
+        assert np.allclose(z.back_deriv, (0.5 / z.value, -1.5 / z.value))
+        assert np.isclose(z.for_deriv, (2.0 * 0.5 - 1.5) / z.value)
+        assert hypot(x, 2.0).parents == (x,) and hypot(2.0, x).parents == (x,)
+        assert np.isclose(scaled_tanh(x).back_deriv[0], 2 / np.cosh(0.5) ** 2)
+        assert np.isclose(scaled_tanh(x, 3.0).value, 3 * np.tanh(0.5))
+
+        assert softplus(1000.0) == 1000.0 and hypot(3, 4) == 5.0
+        # the derivative is not needed for numbers, so it may be infinite, while invalid values still warn
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            assert sqrt(0) == 0.0 and arccos(1) == 0.0
+        with pytest.warns(RuntimeWarning, match="invalid value encountered in sqrt"):
+            assert np.isnan(sqrt(-1.0))
+        with pytest.warns(RuntimeWarning, match="encountered in log"):
+            assert log(np.array([0.0, 1.0]))[0] == -np.inf
+        with np.errstate(invalid='raise'), pytest.raises(FloatingPointError):
+            sqrt(-1)
+        assert np.allclose(softplus(np.array([0.0, 1.0])), np.log1p(np.exp([0.0, 1.0])))
+        assert softplus.__name__ == 'softplus' and softplus.__doc__ == PRIMITIVES['softplus'].__doc__
+        assert {'softplus', 'scaled_tanh', 'hypot', 'sin', 'sigmoid'} <= set(PRIMITIVES)
+
+        with pytest.raises(TypeError):
+            softplus([])
+        with pytest.raises(TypeError):
+            hypot("a", 1.0)
+        with pytest.raises(AssertionError):
+            @primitive
+            def add(a, b):
+                return a + b, 1.0, 1.0
+        with pytest.raises(TypeError):
+            @primitive
+            def ternary(a, b, c):
+                return a, 1.0, 1.0, 1.0
+
+        # another rule cannot take the name of a registered primitive
+        def rule(var):
+            return var, 1.0
+        rule.__name__ = 'softplus'
+        with pytest.raises(AssertionError):
+            primitive(rule)
+        assert PRIMITIVES['softplus'].__module__ == __name__ and softplus(0.0) == np.log(2.0)
+
+    def test_keyword_constant(self):
+        """Test that the constant of a primitive keeps the name of its parameter in the rule"""
+        x = Node(0, 0.5)
+        assert scaled_tanh(x, scale=3.0).value == scaled_tanh(x, 3.0).value == 3 * np.tanh(0.5)
+        assert scaled_tanh(0.5, scale=3.0) == 3 * np.tanh(0.5)
+        assert exp(2.0, base=2.0) == 4.0
+        ad = AutoDiff(lambda x: scaled_tanh(x[0], scale=3.0) * log(x[1], base=2.0), hash_consing=True)
+        assert np.allclose(ad.df([0.5, 4.0]), [6 / np.cosh(0.5) ** 2, 3 * np.tanh(0.5) / (4 * np.log(2))])
+
+    def test_array_constant(self):
+        """Test that hash consing keys array constants on their contents"""
+        x = Node(0, 0.5)
+        scale = np.array([2.0, 3.0])
+        with hash_consing():
+            assert scaled_tanh(x, scale) is scaled_tanh(x, scale=scale.copy())
+            assert scaled_tanh(x, scale) is not scaled_tanh(x, np.array([2.0, 4.0]))
+            assert scaled_tanh(x, scale) is not scaled_tanh(x, scale.astype(np.float32))
+        assert np.allclose(scaled_tanh(x, scale).value, scale * np.tanh(0.5))
+
+    def test_modes(self):
+        """Test primitives in forward, reverse, tape, compiled, generated, batched and tensor evaluation"""
+        x = [0.3, -0.7]
+        ad = AutoDiff([f1, f2])
+        eps = 1e-6
+        jacobian = np.array([(ad.f(np.add(x, eps * e)) - ad.f(np.subtract(x, eps * e))) / (2 * eps)
+                             for e in np.identity(2)]).T
+
+        assert np.allclose(ad.df(x), jacobian)
+        assert np.allclose(ad.df(x, method="backward"), jacobian)
+        assert np.allclose(AutoDiff([f1, f2], tape=True).df(x, method="backward"), jacobian)
+        assert np.allclose(AutoDiff([f1, f2], hash_consing=True).df(x, method="backward"), jacobian)
+
+        graph = ad.compile(x)
+        for method in ["forward", "backward"]:
+            assert np.allclose(graph.df(x, method=method), jacobian)
+        assert np.allclose(graph.optimize().df(x), jacobian)
+        assert np.allclose(graph.codegen().df(x), jacobian)
+        assert np.allclose(graph.codegen().f(x), ad.f(x))
+
+        X = np.random.default_rng(0).normal(size=(5, 2))
+        expected = np.array([ad.df(point) for point in X])
+        assert np.allclose(ad.df_batch(X), expected)
+        assert np.allclose(ad.df_batch(X, method="backward"), expected)
+        assert np.allclose(graph.codegen().df_batch(X), expected)
+
+        tensor = AutoDiff(lambda x: (softplus(x) * hypot(x, 2.0)).sum() + hypot(1.0, x[0]), tensor=True)
+        scalar = AutoDiff(lambda x: softplus(x[0]) * hypot(x[0], 2.0) + softplus(x[1]) * hypot(x[1], 2.0)
+                          + hypot(1.0, x[0]))
+        for method in ["forward", "backward"]:
+            assert np.allclose(tensor.df(x, method=method), scalar.df(x))
+
+        # rules built from NumPy functions of dual numbers give second derivatives
+        ad = AutoDiff(lambda x: scaled_tanh(x[0], 3.0) * scaled_tanh(x[1]))
+        hessian = np.array([(ad.df(np.add(x, eps * e)) - ad.df(np.subtract(x, eps * e)))[0] / (2 * eps)
+                            for e in np.identity(2)])
+        assert np.allclose(ad.hessian(x), hessian, atol=1e-5)
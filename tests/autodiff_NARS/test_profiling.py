@@ -0,0 +1,53 @@
+import sys
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff, Node
+from autodiff_NARS.dual import Dual
+from autodiff_NARS.functions import sin
+from autodiff_NARS.profiling import profile, graph_statistics
+from example_functions import g1, g2
+
+
+class TestProfile:
+    """Test class for the profiling context"""
+
+    def test_counters(self):
+        """Test the operator and phase counters of forward and backward mode"""
+        ad = AutoDiff([g1, g2])
+        x = [1.0, 2.0]
+        expected = ad.df(x)
+        operators = (Node.__mul__, Dual.__mul__, vars(Node)['__pow__'])
+
+        with ad.profile(memory=True) as stats:
+            assert np.allclose(ad.df(x, method="backward"), expected)
+        assert ad.stats is stats
+        assert stats.operators['Node.__mul__']['calls'] == 2
+        assert stats.operators['functions.sin']['calls'] == 1
+        assert stats.operators['Node.__pow__']['calls'] == 1 and 'Dual.__mul__' not in stats.operators
+        assert {'input_nodes', 'evaluate', 'reverse_sweep'} == set(stats.phases)
+        assert all(entry['time'] > 0 for entry in stats.phases.values())
+        assert stats.graph == {"nodes": 11, "edges": 11, "depth": 3, "max_fan_out": 2}
+        assert stats.memory['peak'] > 0 and stats.time >= stats.phases['evaluate']['time']
+        assert 'reverse_sweep' in stats.report() and 'graph: nodes 11' in stats.report()
+
+        with profile(ad) as stats:
+            assert np.allclose(ad.df(x), expected)
+        assert set(stats.phases) == {'forward'} and stats.operators['Dual.__mul__']['calls'] == 2
+        assert stats.operators['functions.exp']['calls'] == 1 and stats.memory is None
+
+        # nothing stays wrapped once the context exits
+        assert (Node.__mul__, Dual.__mul__, vars(Node)['__pow__']) == operators
+        assert '_evaluate' not in vars(ad)
+        with profile() as stats:
+            sin(Node(1, 0.5)) * 2
+        calls = {name: entry['calls'] for name, entry in stats.operators.items()}
+        assert calls == {'functions.sin': 1, 'Node.__mul__': 1}
+
+    def test_graph_statistics(self):
+        """Test the statistics of a graph sharing nodes"""
+        x = Node(0, 0.5)
+        y = sin(x)
+        z = y * y + x
+        assert graph_statistics([z]) == {"nodes": 4, "edges": 5, "depth": 3, "max_fan_out": 2}
+        assert graph_statistics([z, y, 1.0]) == graph_statistics([z])
+        assert graph_statistics([]) == {"nodes": 0, "edges": 0, "depth": 0, "max_fan_out": 0}
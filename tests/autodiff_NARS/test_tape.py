@@ -0,0 +1,49 @@
+import sys
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.tape import Tape, TapeVar, OPS, record_tape
+from example_functions import f1, f2, f3
+
+
+class TestTape:
+    """Test class for the tape recording"""
+
+    def test_record(self):
+        """Test that operations are recorded as flat entries"""
+        tape = Tape(capacity=2)
+        x = tape.input(2.0)
+        y = tape.input(3.0)
+        z = x * y + 1
+        assert isinstance(z, TapeVar)
+        assert len(tape) == 4
+        assert z.value == 7
+        assert [OPS[op] for op in tape.op[:4]] == ['input', 'input', 'mul', 'add_const']
+        assert list(tape.arg1[:4]) == [-1, -1, 0, 2]
+        assert list(tape.arg2[:4]) == [-1, -1, 1, -1]
+        assert list(tape.partial1[:4]) == [0, 0, 3, 1]
+        assert list(tape.partial2[:4]) == [0, 0, 2, 0]
+        assert tape.gradient(z.index)[:2] == [3, 2]
+
+        with pytest.raises(TypeError):
+            x + '3'
+        with pytest.raises(TypeError):
+            '3' - x
+
+    def test_shared_operand(self):
+        """Test that an operation applied to the same entry twice accumulates both partials"""
+        tape, inputs, outputs = record_tape([lambda x: x * x, lambda x: x / x], [3.0])
+        assert tape.gradient(outputs[0].index)[0] == 6
+        assert tape.gradient(outputs[1].index)[0] == 0
+
+    def test_backward(self):
+        """Test that tape backward mode matches Node backward mode"""
+        input = [0.5, 1.5, 0.8]
+        ad_tape = AutoDiff([f1, f2, f3], tape=True)
+        ad_nodes = AutoDiff([f1, f2, f3])
+        assert np.allclose(ad_tape.df(input, method="backward"), ad_nodes.df(input, method="backward"))
+        assert np.allclose(ad_tape.df(input, method="backward", seed=[1, 0, 1]), ad_nodes.df(input, seed=[1, 0, 1]))
+
+        ad = AutoDiff(lambda x: x ** 2 + 3 * x, tape=True)
+        assert ad.df(1, method="backward") == 5
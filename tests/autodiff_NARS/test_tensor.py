@@ -0,0 +1,88 @@
+import sys
+import pytest
+import numpy as np
+sys.path.insert(1, '../')
+from autodiff_NARS.autodiff import AutoDiff
+from autodiff_NARS.tensor import TensorNode, dot
+from autodiff_NARS.functions import sin, cos, exp, log, sqrt, sigmoid
+
+
+def numerical_jacobian(ad, x, eps=1e-6):
+    """Central differences of the functions of ad at x, shaped (f_dim, x_dim)"""
+    columns = [(np.atleast_1d(ad.f(x + eps * e)) - np.atleast_1d(ad.f(x - eps * e))) / (2 * eps)
+               for e in np.identity(len(x))]
+    return np.array(columns).T
+
+
+class TestTensorNode:
+    """Test class for tensor nodes"""
+
+    def test_operations(self):
+        """Test values and forward mode tangents of tensor operations"""
+        value = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        tangent = np.ones((1, 2, 3))
+        W = TensorNode(value, tangent)
+        v = np.array([1.0, -1.0, 2.0])
+
+        assert np.allclose((W @ v).value, value @ v)
+        assert np.allclose((W @ v).tangent, [np.ones((2, 3)) @ v])
+        assert np.allclose((v @ W.T).value, v @ value.T)
+        assert np.allclose(W.sum().value, 21) and np.allclose(W.sum().tangent, [6])
+        assert np.allclose(W.sum(axis=0).value, [5, 7, 9]) and np.allclose(W.sum(axis=-1).tangent, [[3, 3]])
+        assert np.allclose(W[1, 1:].value, [5, 6]) and W[1, 1:].tangent.shape == (1, 2)
+        assert np.allclose(dot(W[0], v).value, 5)
+        assert np.allclose((W * v).tangent, [np.broadcast_to(v, (2, 3))])
+        assert np.allclose((W[:, :1] + v).value, [[2, 0, 3], [5, 3, 6]])
+        assert (W[:, :1] + v).tangent.shape == (1, 2, 3)
+        assert np.allclose((2 ** W).value, 2 ** value)
+        assert np.allclose(sin(W).value, np.sin(value)) and np.allclose(sin(W).tangent, [np.cos(value)])
+        assert np.allclose(exp(W, 2).value, 2 ** value)
+        assert TensorNode(v).tangent is None and (TensorNode(v) * 2).tangent is None
+
+        with pytest.raises(TypeError):
+            TensorNode("This is not an array")
+        with pytest.raises(AssertionError):
+            TensorNode(v, np.ones((1, 2)))
+        with pytest.raises(TypeError):
+            W + "a"
+        with pytest.raises(TypeError):
+            dot(W, "a")
+
+    def test_jacobian(self):
+        """Test forward and reverse mode on tensor functions against central differences"""
+        rng = np.random.default_rng(0)
+        A = rng.normal(size=(7, 6))
+        y = rng.normal(size=7)
+
+        def least_squares(w):
+            return ((A @ w - y) ** 2).sum()
+
+        def matrix(x):
+            W = x[np.arange(6).reshape(2, 3)]
+            return ((W @ W.T).sum() + (W.T @ np.ones(2)).dot(W[0]) + (W.sum(axis=1) * W[:, :1].T).sum()
+                    - (1 / W).sum() + sqrt(W ** 2).sum() + dot(W[1], np.arange(3.0)))
+
+        def elementwise(x):
+            return (sin(x[:3]) * cos(x[3:]) + log(exp(x[[0, 0, 1]]), 3) / x[2] - sigmoid(x)[:3] ** x[3:]).sum()
+
+        x = rng.uniform(0.5, 1.0, 6)
+        ad = AutoDiff([least_squares, matrix, elementwise], tensor=True)
+        jacobian = numerical_jacobian(ad, x)
+        for method in ["forward", "backward", "auto"]:
+            f, df = ad.value_and_jacobian(x, method=method)
+            assert np.allclose(f, ad.f(x))
+            assert np.allclose(df, jacobian, atol=1e-5)
+        assert np.allclose(ad.df(x, chunk_size=4), jacobian, atol=1e-5)
+        assert np.allclose(ad.df(x, seed=np.ones(6)), jacobian.sum(axis=1), atol=1e-5)
+        assert np.allclose(AutoDiff(least_squares, tensor=True).df(x, method="backward"), 2 * A.T @ (A @ x - y))
+
+        X = np.stack([x, x + 0.1])
+        assert np.allclose(ad.f_batch(X), [ad.f(x) for x in X])
+        assert np.allclose(ad.df_batch(X), [ad.df(x) for x in X])
+
+        with pytest.raises(AssertionError):
+            AutoDiff(lambda x: x * 2, tensor=True).df(x)
+        with pytest.raises(TypeError):
+            ad.hessian(x)
+        with pytest.raises(TypeError):
+            ad.compile(x)